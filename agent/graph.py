@@ -3,11 +3,14 @@ import time
 import json
 import re
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from agent.replay import make_chat_model, make_genai_client
 from agent.state import AgentState
-from google import genai
+from tools.tracing import span, traced
 
 # --- NODE 1: THE ANALYST (Template Version) ---
+ANALYSIS_MODEL = "gemini-2.0-flash-exp"
+
+@traced("agent.analyst")
 def analyze_video(state: AgentState):
     print("--- 🧠 ANALYZING VIDEO ---")
     
@@ -219,32 +222,44 @@ def analyze_video(state: AgentState):
     """
     
     # [API Call - Keep Exactly the Same]
-    api_key = os.environ.get("GOOGLE_API_KEY")
-    client = genai.Client(api_key=api_key)
+    # Live client, or the record/replay layer (agent/replay.py, GEMINI_MODE)
+    client = make_genai_client()
     
-    video_file = client.files.upload(file=state['video_path'])
-    while video_file.state.name == "PROCESSING":
-        time.sleep(2)
-        video_file = client.files.get(name=video_file.name)
+    with span("gemini.upload", bytes=os.path.getsize(state['video_path'])):
+        video_file = client.files.upload(file=state['video_path'])
+    with span("gemini.processing_wait") as wait_span:
+        polls = 0
+        while video_file.state.name == "PROCESSING":
+            time.sleep(2)
+            video_file = client.files.get(name=video_file.name)
+            polls += 1
+        wait_span.set(polls=polls, state=video_file.state.name)
         
     if video_file.state.name == "FAILED":
         return {"analysis_text": "Error: Video processing failed."}
 
-    response = client.models.generate_content(
-        model="gemini-2.0-flash-exp", 
-        contents=[video_file, full_prompt]
-    )
+    with span("gemini.generate", model=ANALYSIS_MODEL, prompt_chars=len(full_prompt)) as gen_span:
+        response = client.models.generate_content(
+            model=ANALYSIS_MODEL, 
+            contents=[video_file, full_prompt]
+        )
+        usage = getattr(response, "usage_metadata", None)
+        gen_span.set(response_chars=len(response.text or ""),
+                     prompt_tokens=getattr(usage, "prompt_token_count", None),
+                     output_tokens=getattr(usage, "candidates_token_count", None))
     
     # [Parsing - Keep Exactly the Same]
-    raw_text = response.text
-    structured_data = {}
-    # Updated Regex to be more robust for JSON extraction
-    match_json = re.search(r"JSON_DATA:\s*({.*})", raw_text, re.DOTALL)
-    if match_json:
-        try:
-            structured_data = json.loads(match_json.group(1))
-        except: 
-            print("⚠️ JSON Parsing Failed. AI might have returned invalid format.")
+    with span("analysis.parse_json") as parse_span:
+        raw_text = response.text
+        structured_data = {}
+        # Updated Regex to be more robust for JSON extraction
+        match_json = re.search(r"JSON_DATA:\s*({.*})", raw_text, re.DOTALL)
+        if match_json:
+            try:
+                structured_data = json.loads(match_json.group(1))
+            except: 
+                print("⚠️ JSON Parsing Failed. AI might have returned invalid format.")
+        parse_span.set(found=bool(match_json), parsed=bool(structured_data))
 
     return {
         "analysis_text": raw_text,
@@ -252,14 +267,13 @@ def analyze_video(state: AgentState):
     }
 
 # --- NODE 2: THE EMAIL DRAFTER (Updated) ---
+EMAIL_MODEL = "gemini-2.0-flash-exp"
+
+@traced("agent.email_writer")
 def draft_email(state: AgentState):
     print("--- 📧 DRAFTING EMAIL ---")
     
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.0-flash-exp",
-        google_api_key=os.environ["GOOGLE_API_KEY"],
-        temperature=0.7 
-    )
+    llm = make_chat_model(EMAIL_MODEL, temperature=0.7)
     
     is_english = "English" in state['language']
     subject_line = "Tennis Analysis: Your Action Plan 🎾" if is_english else "Análise de Tênis: Seu Plano de Ação 🎾"
@@ -284,7 +298,9 @@ def draft_email(state: AgentState):
     LANGUAGE: {state['language']}
     """
     
-    response = llm.invoke(prompt)
+    with span("email.draft", model=EMAIL_MODEL, prompt_chars=len(prompt)) as email_span:
+        response = llm.invoke(prompt)
+        email_span.set(response_chars=len(response.content or ""))
     
     return {"email_draft": f"Subject: {subject_line}\n\n{response.content}"}
 
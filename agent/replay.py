@@ -0,0 +1,240 @@
+"""
+Record/replay layer for the Gemini calls in agent/graph.py.
+
+GEMINI_MODE picks what the factories below return:
+  live    the real genai.Client / ChatGoogleGenerativeAI (default)
+  record  the real clients, with every response and its timings appended to
+          the recorded cassette (GEMINI_CASSETTE, JSON Lines, outside the repo)
+  replay  offline fakes that answer from the cassettes and sleep like the API
+          did: upload time scales with file size, the file stays PROCESSING
+          for a recorded duration, generation takes a recorded latency. Each
+          delay is drawn from the recorded values with lognormal jitter.
+
+Replays are matched on the prompt hash when a cassette holds that exact
+prompt; otherwise on the report type and language read from the prompt, then
+on either one alone, and only then on any response of the same kind, so any
+input works offline. No API key or network is needed in replay mode.
+Replay reads the bundled seed cassette (agent/cassettes/gemini.jsonl, a few
+hand-written entries with typical timings, never written to) plus the
+recorded one.
+
+    GEMINI_MODE=record streamlit run app.py     # capture real sessions
+    GEMINI_MODE=replay python loadtest.py -n 50 -c 8
+"""
+import os
+import json
+import time
+import re
+import random
+import hashlib
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+from types import SimpleNamespace
+
+GEMINI_MODE = os.environ.get("GEMINI_MODE", "live").lower()
+SEED_CASSETTE = os.path.join(os.path.dirname(__file__), "cassettes", "gemini.jsonl")
+GEMINI_CASSETTE = os.environ.get("GEMINI_CASSETTE", os.path.join(os.path.expanduser("~"), ".courtlens", "gemini_cassette.jsonl"))
+REPLAY_LATENCY_SCALE = float(os.environ.get("REPLAY_LATENCY_SCALE", 1.0))  # 0 = no sleeps, 0.1 = 10x faster
+REPLAY_JITTER = float(os.environ.get("REPLAY_JITTER", 0.25))                # lognormal sigma around recorded values
+REPLAY_FAILURE_RATE = float(os.environ.get("REPLAY_FAILURE_RATE", 0.0))     # Share of uploads that end FAILED
+REPLAY_SEED = os.environ.get("REPLAY_SEED")
+
+# Used for a kind with no recorded timings (seconds; upload in MB/s)
+_DEFAULT_TIMINGS = {"upload_mbps": 8.0, "processing_sec": 6.0, "analysis_latency_sec": 25.0, "email_latency_sec": 3.0}
+
+_rng = random.Random(REPLAY_SEED)
+_rng_lock = threading.Lock()
+_record_lock = threading.Lock()
+
+def _prompt_sha(prompt):
+    return hashlib.sha256((prompt or "").encode("utf-8")).hexdigest()[:16]
+
+def _prompt_traits(kind, prompt):
+    """Report type ("full"/"quick", analyses only) and language the prompt asks for."""
+    prompt = prompt or ""
+    language = "Portuguese" if re.search(r"LANGUAGE:[^\n]*Portugu", prompt) else "English"
+    report_type = ("quick" if "Quick Fix Analysis" in prompt else "full") if kind == "analysis" else None
+    return {"report_type": report_type, "language": language}
+
+def _prompt_of(contents):
+    """The text part of a generate_content `contents` argument."""
+    if isinstance(contents, str):
+        return contents
+    return "\n".join(c for c in contents or [] if isinstance(c, str))
+
+# --- CASSETTE ---
+@lru_cache(maxsize=1)
+def load_cassette(paths=(SEED_CASSETTE, GEMINI_CASSETTE)):
+    """Seed and recorded entries grouped by kind ("analysis", "email")."""
+    entries = {}
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries.setdefault(entry["kind"], []).append(entry)
+        except FileNotFoundError:
+            continue
+    if not entries:
+        print(f"⚠️ No Gemini cassette at {' or '.join(paths)}: replaying without recorded responses")
+    return entries
+
+def record(kind, prompt, entry, path=GEMINI_CASSETTE):
+    entry = {"kind": kind, "prompt_sha": _prompt_sha(prompt), **_prompt_traits(kind, prompt), **entry, "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with _record_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    load_cassette.cache_clear()
+
+def _pick(kind, prompt):
+    entries = load_cassette().get(kind, [])
+    if not entries:
+        raise LookupError(f"Gemini cassette has no '{kind}' responses to replay ({SEED_CASSETTE}, {GEMINI_CASSETTE})")
+    sha = _prompt_sha(prompt)
+    traits = _prompt_traits(kind, prompt)
+    exact = [e for e in entries if e.get("prompt_sha") == sha]
+    same_report = [e for e in entries if e.get("report_type") == traits["report_type"] and e.get("language") == traits["language"]]
+    same_language = [e for e in entries if e.get("language") == traits["language"]]
+    same_type = [e for e in entries if traits["report_type"] and e.get("report_type") == traits["report_type"]]
+    with _rng_lock:
+        return _rng.choice(exact or same_report or same_language or same_type or entries)
+
+def _sample(kind, field, default):
+    """A delay drawn from the recorded values of `field` (seconds), jittered and scaled."""
+    values = [e[field] for e in load_cassette().get(kind, []) if e.get(field) is not None]
+    with _rng_lock:
+        base = _rng.choice(values) if values else default
+        return base * _rng.lognormvariate(0, REPLAY_JITTER) * REPLAY_LATENCY_SCALE
+
+# --- REPLAY FAKES ---
+class _ReplayFiles:
+    def __init__(self):
+        self._ready_at = {}   # file name -> (monotonic deadline, final state)
+        self._lock = threading.Lock()
+
+    def _file(self, name):
+        with self._lock:
+            ready_at, final_state = self._ready_at[name]
+        state = "PROCESSING" if time.monotonic() < ready_at else final_state
+        return SimpleNamespace(name=name, state=SimpleNamespace(name=state))
+
+    def upload(self, file):
+        size_mb = os.path.getsize(file) / 1e6
+        mbps = [e["upload_bytes"] / 1e6 / e["upload_sec"] for e in load_cassette().get("analysis", [])
+                if e.get("upload_sec") and e.get("upload_bytes")]
+        with _rng_lock:
+            rate = _rng.choice(mbps) if mbps else _DEFAULT_TIMINGS["upload_mbps"]
+            failed = _rng.random() < REPLAY_FAILURE_RATE
+        time.sleep(size_mb / rate * REPLAY_LATENCY_SCALE)
+        name = f"files/replay-{os.urandom(6).hex()}"
+        processing = _sample("analysis", "processing_sec", _DEFAULT_TIMINGS["processing_sec"])
+        with self._lock:
+            self._ready_at[name] = (time.monotonic() + processing, "FAILED" if failed else "ACTIVE")
+        return self._file(name)
+
+    def get(self, name):
+        return self._file(name)
+
+class _ReplayModels:
+    def generate_content(self, model, contents):
+        prompt = _prompt_of(contents)
+        entry = _pick("analysis", prompt)
+        time.sleep(_sample("analysis", "latency_sec", _DEFAULT_TIMINGS["analysis_latency_sec"]))
+        usage = SimpleNamespace(prompt_token_count=entry.get("prompt_tokens"), candidates_token_count=entry.get("output_tokens"))
+        return SimpleNamespace(text=entry["text"], usage_metadata=usage)
+
+class ReplayGenaiClient:
+    """Offline stand-in for genai.Client: files.upload/get and models.generate_content."""
+    def __init__(self):
+        self.files = _ReplayFiles()
+        self.models = _ReplayModels()
+
+class ReplayChatModel:
+    """Offline stand-in for ChatGoogleGenerativeAI: invoke(prompt) -> message with .content."""
+    def __init__(self, model=None, **kwargs):
+        self.model = model
+
+    def invoke(self, prompt):
+        entry = _pick("email", prompt)
+        time.sleep(_sample("email", "latency_sec", _DEFAULT_TIMINGS["email_latency_sec"]))
+        return SimpleNamespace(content=entry["text"])
+
+# --- RECORDERS ---
+class _RecordingFiles:
+    def __init__(self, files, uploads):
+        self._files = files
+        self._uploads = uploads
+
+    def upload(self, file):
+        t0 = time.perf_counter()
+        uploaded = self._files.upload(file=file)
+        self._uploads[uploaded.name] = {"upload_sec": time.perf_counter() - t0, "upload_bytes": os.path.getsize(file),
+                                        "uploaded_at": time.perf_counter()}
+        return uploaded
+
+    def get(self, name):
+        uploaded = self._files.get(name=name)
+        timing = self._uploads.get(name)
+        if timing and uploaded.state.name != "PROCESSING" and "processing_sec" not in timing:
+            timing["processing_sec"] = time.perf_counter() - timing["uploaded_at"]
+        return uploaded
+
+class _RecordingModels:
+    def __init__(self, models, uploads):
+        self._models = models
+        self._uploads = uploads
+
+    def generate_content(self, model, contents):
+        prompt = _prompt_of(contents)
+        t0 = time.perf_counter()
+        response = self._models.generate_content(model=model, contents=contents)
+        latency = time.perf_counter() - t0
+        files = [] if isinstance(contents, str) else [c for c in contents if not isinstance(c, str)]
+        timing = self._uploads.pop(getattr(files[0], "name", None), {}) if files else {}
+        usage = getattr(response, "usage_metadata", None)
+        record("analysis", prompt, {
+            "model": model, "text": response.text,
+            "latency_sec": round(latency, 3),
+            "upload_sec": round(timing["upload_sec"], 3) if "upload_sec" in timing else None,
+            "upload_bytes": timing.get("upload_bytes"),
+            "processing_sec": round(timing.get("processing_sec", 0.0), 3) if timing else None,
+            "prompt_tokens": getattr(usage, "prompt_token_count", None),
+            "output_tokens": getattr(usage, "candidates_token_count", None),
+        })
+        return response
+
+class RecordingGenaiClient:
+    """Wraps a real genai.Client and appends every analysis response (with its timings) to the cassette."""
+    def __init__(self, client):
+        uploads = {}
+        self.files = _RecordingFiles(client.files, uploads)
+        self.models = _RecordingModels(client.models, uploads)
+
+class RecordingChatModel:
+    """Wraps a real chat model and appends every email response to the cassette."""
+    def __init__(self, llm):
+        self._llm = llm
+        self.model = getattr(llm, "model", None)
+
+    def invoke(self, prompt):
+        t0 = time.perf_counter()
+        response = self._llm.invoke(prompt)
+        record("email", prompt, {"model": self.model, "text": response.content, "latency_sec": round(time.perf_counter() - t0, 3)})
+        return response
+
+# --- FACTORIES (used by agent/graph.py) ---
+def make_genai_client():
+    if GEMINI_MODE == "replay":
+        return ReplayGenaiClient()
+    from google import genai
+    client = genai.Client(api_key=os.environ.get("GOOGLE_API_KEY"))
+    return RecordingGenaiClient(client) if GEMINI_MODE == "record" else client
+
+def make_chat_model(model, temperature=0.7):
+    if GEMINI_MODE == "replay":
+        return ReplayChatModel(model=model, temperature=temperature)
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    llm = ChatGoogleGenerativeAI(model=model, google_api_key=os.environ["GOOGLE_API_KEY"], temperature=temperature)
+    return RecordingChatModel(llm) if GEMINI_MODE == "record" else llm
@@ -1,14 +1,19 @@
 import streamlit as st
 import os
 import time
-import tempfile
 import re
 import json
 import base64
 from dotenv import load_dotenv
 from tools.report_generator import create_pdf, TRANSLATIONS
-from tools.video_editor import create_viral_clip, extract_frame, normalize_input_video
-from tools.database import save_analysis_to_db, fetch_history
+from tools.video_editor import add_audio_track, extract_audio_track, extract_frame, normalize_input_video
+from tools.clip_cache import get_clip_cache
+from tools.ffmpeg_governor import governor
+from tools.ffmpeg_progress import read_perf_log
+from tools.workspace import get_workspace_manager
+from tools.search_index import get_search_index
+from tools.tracing import read_traces, span
+from tools.database import save_analysis_to_db, fetch_history_page, fetch_analysis, get_player_progress, get_write_queue
 
 # --- KEEPING THE MODULAR ARCHITECTURE ---
 from agent.state import AgentState
@@ -23,6 +28,9 @@ except ImportError:
 # 1. Load Environment Variables
 load_dotenv(override=True)
 
+# Start the DB write-behind flusher now, so saves journaled by a previous run are sent on boot
+get_write_queue()
+
 
 # Initialize Session State
 if "analysis_result" not in st.session_state:
@@ -197,9 +205,36 @@ with st.sidebar:
         creator_mode = st.checkbox("Enable Social Media Pack", value=True)
         if creator_mode:
             st.caption("✅ Viral Hooks, Captions & Reel Edits enabled.")
+        track_player = st.checkbox("🎯 Smart Crop (Follow Player)", value=False,
+                                   help="Vertical clips follow the moving player instead of a fixed center crop.")
     else:
         # Standard users never see this, and it defaults to False
         creator_mode = False
+        track_player = False
+    clip_profile = "viral-track" if track_player else "viral"
+
+    if st.session_state.dev_mode:
+        st.divider()
+        with st.expander("🛠️ FFmpeg Queue"):
+            ffmpeg_stats = governor.metrics()
+            st.caption(f"Running {ffmpeg_stats['running']}/{ffmpeg_stats['max_jobs']} · Queued {ffmpeg_stats['queue_depth']} · {ffmpeg_stats['threads_per_job']} threads/job")
+            st.json(ffmpeg_stats["classes"])
+            recent_encodes = read_perf_log(limit=10)
+            if recent_encodes:
+                st.caption("Recent encodes (x realtime)")
+                st.dataframe([{k: r.get(k) for k in ("ts", "label", "input", "duration_s", "wall_s", "realtime_x")} for r in reversed(recent_encodes)])
+        with st.expander("🗄️ Workspaces & Disk"):
+            ws_stats = get_workspace_manager().metrics()
+            st.caption(f"{ws_stats['workspaces']} workspaces ({ws_stats['held']} held) · {ws_stats['used_mb']}/{ws_stats['cap_mb']} MB · Disk free {ws_stats['disk_free_mb']:.0f} MB")
+            st.json(ws_stats["by_kind"])
+        write_queue = get_write_queue()
+        if write_queue:
+            with st.expander("💾 DB Write Queue"):
+                st.json(write_queue.metrics())
+        show_timings = st.checkbox("⏱️ Show pipeline timings", value=False,
+                                   help="Per-stage timings of the latest uploads, analyses and reports.")
+    else:
+        show_timings = False
 
 # UPDATE: Hardcoded Brand Header (Overrides translation file for now)
 st.title("COURT LENS AI")
@@ -212,6 +247,7 @@ uploaded_file = st.file_uploader(t["ui_upload_label"], type=["mp4", "mov"])
 if uploaded_file:
     # 1. Check if we already processed THIS file to avoid re-running optimization
     # We use the filename and size as a unique signature
+    # (toggling creator mode later only adds the soundtrack, see step 2)
     file_signature = f"{uploaded_file.name}_{uploaded_file.size}"
     
     if st.session_state.get("last_processed_file") != file_signature:
@@ -222,26 +258,58 @@ if uploaded_file:
         if file_ext not in [".mp4", ".mov"]:
             file_ext = ".mp4"
             
-        # B. Save Raw File
-        tfile = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext)
-        tfile.write(uploaded_file.read())
-        raw_video_path = tfile.name
-        tfile.close()
+        # B. Save Raw File into this upload's own workspace
+        # The previous upload's workspace is released: it's deleted as soon as
+        # no background clip render is still reading from it.
+        workspaces = get_workspace_manager()
+        previous_ws = workspaces.get(st.session_state.get("upload_workspace"))
+        if previous_ws: previous_ws.release()
+        upload_ws = workspaces.create("upload")
+        st.session_state["upload_workspace"] = upload_ws.job_id
+
+        with span("upload", file=uploaded_file.name, bytes=uploaded_file.size, keep_audio=creator_mode):
+            raw_video_path = upload_ws.path(f"raw{file_ext}")
+            with open(raw_video_path, "wb") as f, span("upload.copy", bytes=uploaded_file.size):
+                f.write(uploaded_file.read())
         
-        # C. Normalize (Compress & Fix Codec)
-        with st.spinner("🔄 Optimizing video for AI (Compressing)..."):
-            processed_path = normalize_input_video(raw_video_path)
+            # C. Normalize (Compress & Fix Codec)
+            progress_bar = st.progress(0.0, text="🔄 Optimizing video for AI (Compressing)...")
+
+            def show_encode_progress(update):
+                if update.percent is None:
+                    progress_bar.progress(0.0, text=f"🔄 Optimizing video for AI... {update.frame} frames @ {update.fps:.0f} fps")
+                    return
+                eta = f" · ~{update.eta:.0f}s left" if update.eta is not None else ""
+                speed = f" · {update.speed:.1f}x realtime" if update.speed else ""
+                progress_bar.progress(update.percent, text=f"🔄 Optimizing video for AI... {update.percent:.0%}{speed}{eta}")
+
+            processed_path = normalize_input_video(raw_video_path, on_progress=show_encode_progress, keep_audio=creator_mode)
+            progress_bar.empty()
+            # Without creator mode the soundtrack is dropped: keep a stream copy in case it's switched on later
+            source_audio = None
+            if processed_path != raw_video_path:
+                if not creator_mode:
+                    source_audio = extract_audio_track(raw_video_path, upload_ws.path("source_audio.mka"))
+                upload_ws.remove(os.path.basename(raw_video_path))  # Only the normalized copy is used from here on
             
         # D. Save to Session State
         st.session_state["video_path"] = processed_path
+        st.session_state["source_audio"] = source_audio
         st.session_state["last_processed_file"] = file_signature
         
         # Clear previous analysis results since it's a new video
         st.session_state["analysis_result"] = None
         st.session_state["email_draft"] = None
 
-    # 2. Use the cached path
+    # 2. Use the cached path (and renew the workspace lease so the janitor keeps it)
+    # Creator mode switched on after normalization: mux the soundtrack back in (video stream copied)
+    if creator_mode and st.session_state.get("source_audio"):
+        with st.spinner("🔊 Adding the soundtrack for the Social Media Pack..."):
+            st.session_state["video_path"] = add_audio_track(st.session_state["video_path"], st.session_state["source_audio"])
+        st.session_state["source_audio"] = None
     video_content = st.session_state["video_path"]
+    upload_ws = get_workspace_manager().get(st.session_state.get("upload_workspace"))
+    if upload_ws: upload_ws.touch()
     
     # 3. Show the video (Using Custom HTML Player)
     if video_content:
@@ -305,42 +373,45 @@ if st.button(t["ui_btn_analyze"], type="primary", use_container_width=True):
         print(f"\n🚀 SENDING TO AGENT -> Dev Mode: {st.session_state.dev_mode}")
 
         # 3. RUN THE AGENT
-        with st.spinner("🤖 Agent is working... (Uploading & Analyzing)"):
-            result_state = app_graph.invoke(agent_inputs)
+        with span("analysis", report_type=report_type, stroke_type=stroke_type, dev_mode=st.session_state.dev_mode):
+            with st.spinner("🤖 Agent is working... (Uploading & Analyzing)"):
+                result_state = app_graph.invoke(agent_inputs)
             
-        # 4. Extract Results
-        final_text = result_state.get("analysis_text", "")
-        final_email = result_state.get("email_draft", "")  # <--- NEW: Get Email
+            # 4. Extract Results
+            final_text = result_state.get("analysis_text", "")
+            final_email = result_state.get("email_draft", "")  # <--- NEW: Get Email
         
-        # --- CRITICAL FIX: Extract JSON *BEFORE* Saving ---
-        # We use the robust extractor here to ensure we get the scores
-        structured_data = extract_clean_json(final_text)
+            # --- CRITICAL FIX: Extract JSON *BEFORE* Saving ---
+            # We use the robust extractor here to ensure we get the scores
+            structured_data = extract_clean_json(final_text)
 
-        if not final_text:
-            st.error("Agent finished but returned no text.")
-            st.stop()
+            if not final_text:
+                st.error("Agent finished but returned no text.")
+                st.stop()
             
-        if "Error:" in final_text:
-            st.error(final_text)
-            st.stop()
-
-        # 5. Save to Session State
-        st.session_state["analysis_result"] = final_text
-        st.session_state["email_draft"] = final_email      # <--- NEW: Save Email
-        st.session_state["video_path"] = video_content
+            if "Error:" in final_text:
+                st.error(final_text)
+                st.stop()
+
+            # 5. Save to Session State
+            st.session_state["analysis_result"] = final_text
+            st.session_state["email_draft"] = final_email      # <--- NEW: Save Email
+            st.session_state["video_path"] = video_content
         
-        # 6. Save to Database (With Correct Data)
-        if user_email:
-            with st.spinner("💾 Saving to History..."):
+            # 6. Save to Database (With Correct Data)
+            if user_email:
+                # Journaled locally and written in the background: no spinner needed
                 saved = save_analysis_to_db(
                     user_email, 
                     player_description, 
                     uploaded_file.name, 
                     final_text, 
                     structured_data, # <--- Passing the CLEANED data
-                    report_type      # <--- Passing the Report Type
+                    report_type,     # <--- Passing the Report Type
+                    stroke_type,     # <--- Feeds the per-stroke confidence trend
+                    player_level     # <--- Printed on batch-exported PDFs
                 )
-                if saved: st.toast("✅ Analysis Saved to Cloud!", icon="☁️")
+                if saved: st.toast("✅ Analysis Saved to History!", icon="☁️")
 
         st.rerun()
 
@@ -374,11 +445,12 @@ if st.session_state["analysis_result"]:
     
     # --- IMAGE EXTRACTION ---
     image_assets = {}
+    pdf_ws = get_workspace_manager().create("pdf")  # Per-render frame dir: sessions never overwrite each other's images
         
     if saved_video_path and os.path.exists(saved_video_path):
-        with st.spinner("📸 Extracting frames for PDF..."):
+        with st.spinner("📸 Extracting frames for PDF..."), span("frames.extract_pdf"):
             # 1. Cover
-            cover_path = extract_frame(saved_video_path, 1.0, "temp_cover.jpg")
+            cover_path = extract_frame(saved_video_path, 1.0, pdf_ws.path("cover.jpg"))
             if cover_path: image_assets["cover"] = cover_path
             
            # 2. Best Shot (Smart Extraction)
@@ -389,7 +461,7 @@ if st.session_state["analysis_result"]:
                 
                 # FALLBACK: If AI didn't give a key_moment, DO NOT SHOW IMAGE (Cleaner Report)
                 if capture_point is not None:
-                    path = extract_frame(saved_video_path, int(capture_point), "temp_best.jpg")
+                    path = extract_frame(saved_video_path, int(capture_point), pdf_ws.path("best.jpg"))
                     if path: 
                         image_assets["best"] = path
                         image_assets["best_reason"] = shot.get("reason", "Good execution")
@@ -401,7 +473,7 @@ if st.session_state["analysis_result"]:
                 
                 # FALLBACK: If AI didn't give a key_moment, DO NOT SHOW IMAGE
                 if capture_point is not None:
-                    path = extract_frame(saved_video_path, int(capture_point), "temp_fix.jpg")
+                    path = extract_frame(saved_video_path, int(capture_point), pdf_ws.path("fix.jpg"))
                     if path: 
                         image_assets["fix"] = path
                         image_assets["fix_reason"] = shot.get("reason", "Needs correction")
@@ -425,13 +497,11 @@ if st.session_state["analysis_result"]:
             file_name="CourtLens_Analysis.pdf", 
             mime="application/pdf"
         )
-        
-        # Cleanup temp images
-        for key in ["cover", "best", "fix"]:
-            if key in image_assets and os.path.exists(image_assets[key]):
-                os.remove(image_assets[key])
     except Exception as e:
         st.error(f"PDF Error: {e}")
+    finally:
+        # Cleanup temp images
+        pdf_ws.release()
 
     # 📧 EMAIL ASSISTANT (Now restricted to Creator Role)
     if st.session_state.get("email_draft") and st.session_state.user_role == "creator":
@@ -450,6 +520,18 @@ if st.session_state["analysis_result"]:
     if json_data and st.session_state.user_role == "creator":
         st.divider()
         st.subheader("🎬 Smart Video Analysis")
+
+        # Speculative render: start encoding both clips in the background right away,
+        # so the buttons below usually just pick up a finished file from the cache.
+        clip_cache = get_clip_cache()
+        if saved_video_path and os.path.exists(saved_video_path):
+            for shot_key in ["best_shot", "fix_shot"]:
+                shot = json_data.get(shot_key)
+                if not shot: continue
+                try:
+                    clip_cache.prefetch(saved_video_path, shot['start'], shot['end'], profile=clip_profile)
+                except (KeyError, TypeError, ValueError) as e:
+                    print(f"⚠️ Skipping clip pre-render for {shot_key}: {e}")
         
         col1, col2 = st.columns(2)
         
@@ -459,8 +541,12 @@ if st.session_state["analysis_result"]:
                 st.success(f"✅ **Best Shot:** {shot.get('reason', 'N/A')}")
                 if st.button("✂️ Create Highlight Reel"):
                     if saved_video_path:
-                        path = create_viral_clip(saved_video_path, shot['start'], shot['end'])
-                        if path: st.video(path)
+                        try:
+                            with st.spinner("🎬 Rendering clip..."):
+                                path = clip_cache.get(saved_video_path, shot['start'], shot['end'], profile=clip_profile)
+                            st.video(path)
+                        except Exception as e:
+                            st.error(f"Clip Error: {e}")
 
         with col2:
             if "fix_shot" in json_data:
@@ -468,8 +554,12 @@ if st.session_state["analysis_result"]:
                 st.error(f"⚠️ **Needs Work:** {shot.get('reason', 'N/A')}")
                 if st.button("✂️ Create Analysis Clip"):
                     if saved_video_path:
-                        path = create_viral_clip(saved_video_path, shot['start'], shot['end'])
-                        if path: st.video(path)
+                        try:
+                            with st.spinner("🎬 Rendering clip..."):
+                                path = clip_cache.get(saved_video_path, shot['start'], shot['end'], profile=clip_profile)
+                            st.video(path)
+                        except Exception as e:
+                            st.error(f"Clip Error: {e}")
 
     # 3. AI CONFIDENCE AUDIT (New Feature)
     if "confidence_log" in json_data:
@@ -494,24 +584,121 @@ if st.session_state["analysis_result"]:
                     st.markdown(f":{color}[**{score}/10**]")
                 st.divider()
 
+if show_timings:
+    st.markdown("---")
+    st.subheader("⏱️ Pipeline Timings")
+    traces = read_traces(limit=5)
+    if not traces:
+        st.info("No traces recorded yet.")
+    for trace in traces:
+        failed = any(s["error"] for s in trace["spans"])
+        with st.expander(f"{'❌' if failed else '✅'} {trace['name']} · {trace['duration_ms'] / 1000:.2f}s · {len(trace['spans'])} spans"):
+            st.dataframe([{
+                "stage": "  " * s["depth"] + s["name"],
+                "start_ms": round(s["offset_ms"], 1),
+                "duration_ms": round(s["duration_ms"], 1),
+                "attributes": ", ".join(f"{k}={v}" for k, v in s["attributes"].items()),
+                "error": s["error"] or "",
+            } for s in trace["spans"]], use_container_width=True)
+            stages = [s for s in trace["spans"] if s["depth"] == 1] or trace["spans"]
+            st.bar_chart({"stage": [s["name"] for s in stages], "duration_ms": [s["duration_ms"] for s in stages]},
+                         x="stage", y="duration_ms")
+
 if user_email:
     st.markdown("---")
+    if st.checkbox(f"📈 Progress Dashboard for {user_email}"):
+        # Precomputed per-player aggregates: no analysis text is scanned here
+        progress = get_player_progress(user_email)
+        if not progress["analyses"]:
+            st.info("No history found yet.")
+        else:
+            st.caption(f"Based on {progress['analyses']} analyses")
+            col_level, col_conf = st.columns(2)
+            with col_level:
+                st.markdown("**🎯 Observed Level (NTRP)**")
+                if progress["ntrp_timeline"]:
+                    st.line_chart(progress["ntrp_timeline"], x="date", y="ntrp")
+                else:
+                    st.caption("No NTRP ratings yet.")
+            with col_conf:
+                st.markdown("**🤖 AI Confidence**")
+                if progress["confidence_timeline"]:
+                    st.line_chart(progress["confidence_timeline"], x="date", y="confidence")
+            col_flaws, col_strokes = st.columns(2)
+            with col_flaws:
+                st.markdown("**⚠️ Recurring Flaws**")
+                if progress["top_flaws"]:
+                    st.bar_chart({"flaw": [f for f, _ in progress["top_flaws"]], "analyses": [n for _, n in progress["top_flaws"]]},
+                                 x="flaw", y="analyses")
+            with col_strokes:
+                st.markdown("**🎾 Confidence by Stroke**")
+                if progress["confidence_by_stroke"]:
+                    st.bar_chart({"stroke": list(progress["confidence_by_stroke"]),
+                                  "confidence": list(progress["confidence_by_stroke"].values())}, x="stroke", y="confidence")
+
+    if st.checkbox("🔎 Search Analyses"):
+        # Creators search across every client; players only within their own history
+        scope = None if st.session_state.user_role == "creator" else user_email
+        search_index = get_search_index()
+        search_text = st.text_input("Search", placeholder='e.g. late "unit turn"', key="search_text")
+        facets = search_index.facets(search_text, {"player_email": scope})
+        col_r, col_s, col_f = st.columns(3)
+        picked = {
+            "report_type": col_r.selectbox("Report", ["All"] + list(facets["report_type"]), key="search_report"),
+            "stroke_type": col_s.selectbox("Stroke", ["All"] + list(facets["stroke_type"]), key="search_stroke"),
+            "flaw": col_f.selectbox("Flaw", ["All"] + list(facets["flaw"]), key="search_flaw"),
+        }
+        filters = {k: v for k, v in picked.items() if v != "All"}
+        if scope:
+            filters["player_email"] = scope
+        elif facets["player_email"]:
+            player = st.selectbox("Player", ["All"] + list(facets["player_email"]), key="search_player")
+            if player != "All": filters["player_email"] = player
+
+        results = search_index.search(search_text, filters, limit=20)
+        st.caption(f"{results['total']} matching analyses")
+        for hit in results["hits"]:
+            date = (hit["created_at"] or "").split("T")[0]
+            st.markdown(f"**📅 {date} | 🏷️ {hit['report_type'] or 'Analysis'} | 🎾 {hit['stroke_type'] or '-'} | 📹 {hit['video_name']}**"
+                        + ("" if scope else f" · {hit['player_email']}"))
+            st.caption(hit["snippet"])
+
     if st.checkbox(f"📜 View History for {user_email}"):
-        history = fetch_history(user_email)
+        # Light listing, one cached page at a time; "Load older" follows the keyset cursor
+        history, cursor = [], None
+        for _ in range(st.session_state.get("history_pages", 1)):
+            page = fetch_history_page(user_email, cursor)
+            history += page["items"]
+            cursor = page["next_cursor"]
+            if not cursor:
+                break
+
         if not history:
             st.info("No history found yet.")
         else:
-            for item in history:
+            for i, item in enumerate(history):
                 date = item['created_at'].split('T')[0]
                 
                 # Extract Metadata
-                meta = item.get("structured_data", {}) or {}
-                r_type = meta.get("report_type", "Analysis") # Get Report Type
-                score = item.get('confidence_score', 0)
+                r_type = item.get("report_type") or "Analysis" # Get Report Type
+                score = item.get('confidence_score') or 0
                 
                 # Format the Title: [Date] | [Type] | [Video] | [Score]
                 title = f"📅 {date} | 🏷️ {r_type} | 📹 {item['video_name']} | ⭐ Confidence Score: {score:.1f}/10"
                 
                 with st.expander(title):
-                    st.markdown(clean_text_for_display(item['analysis_text']))
-                    st.caption("Raw Data Saved in Cloud ☁️")
\ No newline at end of file
+                    # The full report is only fetched once the user asks for it
+                    if item.get("analysis_text"):
+                        st.markdown(clean_text_for_display(item['analysis_text']))
+                        st.caption("Saving to Cloud... ⏳")
+                    elif st.toggle("Show report", key=f"history_open_{item.get('id', i)}"):
+                        full = fetch_analysis(item["id"])
+                        if full:
+                            st.markdown(clean_text_for_display(full['analysis_text']))
+                            st.caption("Raw Data Saved in Cloud ☁️")
+                        else:
+                            st.warning("Could not load this report.")
+
+            if cursor and st.button("⬇️ Load older"):
+                st.session_state["history_pages"] = st.session_state.get("history_pages", 1) + 1
+                st.rerun()
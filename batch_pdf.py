@@ -0,0 +1,240 @@
+"""
+Batch PDF renderer for historical analyses.
+
+Converts a whole folder of markdown reports (ReportLab, same output as the MCP
+`generate_branded_pdf` tool) or a DB export of `tennis_analyses` rows (FPDF,
+same output as the Streamlit download button) using a process pool.
+Outputs whose source hash did not change since the last run are skipped.
+A manifest with per-file timings is written next to the PDFs.
+
+Usage:
+    python batch_pdf.py analyses/ --out reports/
+    python batch_pdf.py export.jsonl --out reports/clients/ --workers 16
+    python batch_pdf.py analyses/ --force
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from tools.player_progress import parse_observed_ntrp
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+DEFAULT_DRILL_LINK = "https://www.youtube.com/results?search_query=tennis+drills"
+
+# --- JOB COLLECTION ---
+def _slug(text, max_len=40):
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", text or "").strip("_").lower()
+    return slug[:max_len] or "player"
+
+def _hash_job(engine, payload):
+    """Source hash: engine + everything the renderer reads. Changing any of it re-renders."""
+    blob = json.dumps({"engine": engine, "payload": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+def _player_level(meta, text):
+    """Declared level saved with the analysis; rows saved before it was stored fall back to the observed NTRP."""
+    if meta.get("player_level"):
+        return meta["player_level"]
+    ntrp = parse_observed_ntrp(text)
+    return f"NTRP {ntrp:.1f} (observed)" if ntrp is not None else "-"
+
+def collect_markdown_jobs(input_dir, output_dir):
+    """One ReportLab job per *.md file in `input_dir` (non-recursive)."""
+    jobs = []
+    for name in sorted(os.listdir(input_dir)):
+        if not name.lower().endswith(".md"):
+            continue
+        source = os.path.join(input_dir, name)
+        with open(source, "r", encoding="utf-8") as f:
+            md_content = f.read()
+        payload = {"markdown": md_content}
+        jobs.append({
+            "source": source,
+            "output": os.path.join(output_dir, os.path.splitext(name)[0] + ".pdf"),
+            "engine": "reportlab",
+            "payload": payload,
+            "source_hash": _hash_job("reportlab", payload),
+        })
+    return jobs
+
+def _load_export_rows(export_path):
+    """Reads a `tennis_analyses` export: a JSON list, {"data": [...]}, or JSON Lines."""
+    with open(export_path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    if export_path.lower().endswith(".jsonl"):
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    data = json.loads(raw)
+    if isinstance(data, dict):
+        data = data.get("data", [])
+    return data
+
+def collect_export_jobs(export_path, output_dir, lang="English"):
+    """One FPDF job per analysis row of a DB export."""
+    jobs = []
+    for idx, row in enumerate(_load_export_rows(export_path)):
+        text = row.get("analysis_text") or ""
+        if not text.strip():
+            continue
+        meta = row.get("structured_data") or {}
+        date = (row.get("created_at") or "").split("T")[0] or "undated"
+        row_id = row.get("id", idx)
+
+        video_link = DEFAULT_DRILL_LINK
+        match = re.search(r"SEARCH_QUERY:\s*(.*)", text, re.IGNORECASE)
+        if match:
+            video_link = "https://www.youtube.com/results?search_query=" + match.group(1).strip().replace(" ", "+")
+
+        payload = {
+            "text": text,
+            "name": row.get("player_name") or "Player",
+            "level": _player_level(meta, text),
+            "lang": lang,
+            "report_type": meta.get("report_type", "Full Audit"),
+            "video_link": video_link,
+            "confidence_data": meta.get("confidence_log", []),
+        }
+        jobs.append({
+            "source": f"{export_path}#{row_id}",
+            "output": os.path.join(output_dir, f"{date}_{_slug(payload['name'])}_{row_id}.pdf"),
+            "engine": "fpdf",
+            "payload": payload,
+            "source_hash": _hash_job("fpdf", payload),
+        })
+    return jobs
+
+# --- WORKER (Runs in a child process) ---
+def render_job(job):
+    """Renders one job. Returns a manifest entry (never raises)."""
+    t0 = time.perf_counter()
+    payload = job["payload"]
+    try:
+        if job["engine"] == "reportlab":
+            from pdf_generator import build_pdf_from_markdown
+            build_pdf_from_markdown(payload["markdown"], job["output"])
+        else:
+            from tools.report_generator import create_pdf
+            pdf_bytes = create_pdf(
+                payload["text"], payload["name"], payload["level"], payload["lang"],
+                payload["report_type"], payload["video_link"],
+                images={}, confidence_data=payload["confidence_data"]
+            )
+            with open(job["output"], "wb") as f:
+                f.write(bytes(pdf_bytes))
+        status, error = "rendered", None
+    except Exception as e:
+        status, error = "failed", str(e)
+
+    entry = {
+        "source": job["source"],
+        "engine": job["engine"],
+        "source_hash": job["source_hash"],
+        "status": status,
+        "seconds": round(time.perf_counter() - t0, 4),
+        "bytes": os.path.getsize(job["output"]) if status == "rendered" else 0,
+    }
+    if error:
+        entry["error"] = error
+    return entry
+
+# --- MANIFEST ---
+def load_manifest(output_dir):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "entries": {}}
+
+def write_manifest(output_dir, manifest):
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)  # Atomic: a crash never leaves a half-written manifest
+
+# --- BATCH ---
+def run_batch(jobs, output_dir, workers=None, force=False, on_result=None):
+    """
+    Renders `jobs` with a process pool, skipping unchanged outputs.
+    Returns the updated manifest.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = load_manifest(output_dir)
+    entries = manifest["entries"]
+
+    pending, skipped = [], 0
+    for job in jobs:
+        key = os.path.relpath(job["output"], output_dir)
+        previous = entries.get(key)
+        if (not force and previous and previous.get("status") in ("rendered", "skipped")
+                and previous.get("source_hash") == job["source_hash"]
+                and os.path.exists(job["output"])):
+            previous["status"] = "skipped"
+            skipped += 1
+            continue
+        pending.append((key, job))
+
+    t0 = time.perf_counter()
+    rendered = failed = 0
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=min(workers, len(pending))) as pool:
+            futures = {pool.submit(render_job, job): key for key, job in pending}
+            for future in as_completed(futures):
+                key = futures[future]
+                entry = future.result()
+                entries[key] = entry
+                if entry["status"] == "rendered": rendered += 1
+                else: failed += 1
+                if on_result: on_result(key, entry)
+
+    wall = time.perf_counter() - t0
+    manifest["last_run"] = {
+        "finished_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "jobs": len(jobs),
+        "rendered": rendered,
+        "skipped": skipped,
+        "failed": failed,
+        "wall_seconds": round(wall, 3),
+        "cpu_seconds": round(sum(entries[k]["seconds"] for k, _ in pending), 3),
+        "workers": workers if pending else 0,
+    }
+    write_manifest(output_dir, manifest)
+    return manifest
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch-render branded PDFs from markdown analyses or a DB export.")
+    parser.add_argument("source", help="Folder of .md reports, or a tennis_analyses export (.json / .jsonl)")
+    parser.add_argument("--out", default="reports", help="Output folder (manifest.json is written here)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--lang", default="English", choices=["English", "Portuguese"], help="Report language for DB exports")
+    parser.add_argument("--force", action="store_true", help="Re-render even if the source hash is unchanged")
+    args = parser.parse_args()
+
+    if os.path.isdir(args.source):
+        jobs = collect_markdown_jobs(args.source, args.out)
+    else:
+        jobs = collect_export_jobs(args.source, args.out, lang=args.lang)
+
+    print(f"📄 {len(jobs)} reports found in {args.source}")
+
+    def report(key, entry):
+        icon = "✅" if entry["status"] == "rendered" else "❌"
+        print(f"   {icon} {key} ({entry['seconds']:.2f}s){' - ' + entry['error'] if 'error' in entry else ''}")
+
+    manifest = run_batch(jobs, args.out, workers=args.workers, force=args.force, on_result=report)
+    run = manifest["last_run"]
+    print(f"🏁 Rendered {run['rendered']}, skipped {run['skipped']} (unchanged), failed {run['failed']} "
+          f"in {run['wall_seconds']:.1f}s wall / {run['cpu_seconds']:.1f}s CPU")
+    print(f"📒 Manifest: {os.path.join(args.out, MANIFEST_NAME)}")
+
+if __name__ == "__main__":
+    main()
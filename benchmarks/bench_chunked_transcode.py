@@ -0,0 +1,97 @@
+"""
+Benchmark: upload normalization in one ffmpeg process vs parallel keyframe chunks.
+
+Also verifies the chunked output is frame-exact: same frame count and timestamps
+as the single-pass output, and no frame shifted at a chunk boundary (every
+decoded frame matches its single-pass counterpart at thumbnail resolution).
+
+Run from the repo root:
+    python -m benchmarks.bench_chunked_transcode
+    python -m benchmarks.bench_chunked_transcode --workers 8 --chunk 20
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.synthetic import make_test_video
+from tools import chunked_transcode
+from tools.ffmpeg_governor import governor
+from tools.video_editor import FFMPEG_BINARY, normalize_input_video
+
+THUMB_SIZE = (64, 36)
+MAX_MEAN_ABS_DIFF = 6.0  # Gray levels: encoder noise passes, a shifted frame of a moving pattern does not
+
+def frame_timestamps(video_path):
+    """Presentation timestamps of every decoded video frame (framemd5 listing)."""
+    result = subprocess.run([FFMPEG_BINARY, "-v", "error", "-i", video_path, "-map", "0:v:0", "-f", "framemd5", "-"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, check=True)
+    return [int(line.split(",")[2]) for line in result.stdout.splitlines() if line and not line.startswith("#")]
+
+def thumbnails(video_path):
+    w, h = THUMB_SIZE
+    result = subprocess.run([FFMPEG_BINARY, "-v", "error", "-i", video_path, "-map", "0:v:0",
+                             "-vf", f"scale={w}:{h}:flags=area,format=gray", "-f", "rawvideo", "-"],
+                            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return np.frombuffer(result.stdout, dtype=np.uint8).reshape(-1, h, w)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare single-pass vs chunked normalization.")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seconds", type=int, default=120)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--chunk", type=float, default=chunked_transcode.CHUNK_SECONDS, help="Chunk length in seconds")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Concurrent ffmpeg jobs")
+    args = parser.parse_args()
+
+    # The governor admits the chunk encodes: size it to the requested parallelism
+    governor.max_jobs = args.workers
+    governor.threads = max(1, (os.cpu_count() or 1) // args.workers)
+    chunked_transcode.CHUNK_SECONDS = args.chunk
+
+    cache_dir = os.path.join(tempfile.gettempdir(), "courtlens_bench")
+    fps_tag = "" if args.fps == 30 else f"_{args.fps}fps"
+    source = make_test_video(
+        os.path.join(cache_dir, f"src_{args.width}x{args.height}_{args.seconds}s{fps_tag}.mp4"),
+        args.width, args.height, args.seconds, fps=args.fps
+    )
+    print(f"Source: {source} | {args.workers} workers x {governor.threads} threads, {args.chunk:.0f}s chunks")
+
+    work_dir = tempfile.mkdtemp(prefix="courtlens_bench_chunks_")
+    try:
+        outputs, timings = {}, {}
+        for mode, chunked in (("single", False), ("chunked", True)):
+            src_copy = shutil.copy(source, os.path.join(work_dir, f"{mode}.mp4"))
+            t0 = time.perf_counter()
+            outputs[mode] = normalize_input_video(src_copy, chunked=chunked)
+            timings[mode] = time.perf_counter() - t0
+            if outputs[mode] == src_copy:
+                sys.exit(f"❌ {mode} normalization failed")
+            print(f"{mode:8s} {timings[mode]:6.2f}s ({args.seconds / timings[mode]:.1f}x realtime)")
+        print(f"Speedup: {timings['single'] / timings['chunked']:.2f}x")
+
+        # --- FRAME-EXACTNESS ---
+        pts_single, pts_chunked = frame_timestamps(outputs["single"]), frame_timestamps(outputs["chunked"])
+        same_pts = pts_single == pts_chunked
+        print(f"Frames: single {len(pts_single)} | chunked {len(pts_chunked)} | timestamps identical: {same_pts}")
+
+        thumbs_single, thumbs_chunked = thumbnails(outputs["single"]), thumbnails(outputs["chunked"])
+        n = min(len(thumbs_single), len(thumbs_chunked))
+        diffs = np.abs(thumbs_single[:n].astype(np.int16) - thumbs_chunked[:n]).mean(axis=(1, 2))
+        worst = int(diffs.argmax()) if n else 0
+        print(f"Per-frame mean abs diff vs single pass: max {diffs.max() if n else 0:.2f} (frame {worst}), mean {diffs.mean() if n else 0:.2f}")
+
+        if not same_pts or len(thumbs_single) != len(thumbs_chunked) or (n and diffs.max() > MAX_MEAN_ABS_DIFF):
+            sys.exit("❌ Chunked output is NOT frame-exact")
+        print("✅ Chunked output is frame-exact")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
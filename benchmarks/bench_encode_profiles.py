@@ -0,0 +1,69 @@
+"""
+Benchmark: upload normalization, legacy fixed settings (720p, crf 28, veryfast, 128k AAC)
+vs the adaptive encode profiles. Reports the chosen profile, output size and encode time.
+
+Run from the repo root:
+    python -m benchmarks.bench_encode_profiles
+    python -m benchmarks.bench_encode_profiles --long-seconds 180
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from benchmarks.synthetic import make_test_video
+from tools.encode_profiles import probe_video, select_profile
+from tools.video_editor import FFMPEG_BINARY, normalize_input_video
+
+LEGACY_ARGS = [
+    "-c:v", "libx264", "-preset", "veryfast", "-crf", "28", "-pix_fmt", "yuv420p",
+    "-vf", "scale='if(gt(iw,ih),-2,720)':'if(gt(iw,ih),720,-2)'",
+    "-c:a", "aac", "-b:a", "128k",
+]
+
+def legacy_normalize(source, output_path):
+    subprocess.run([FFMPEG_BINARY, "-y", "-i", source] + LEGACY_ARGS + [output_path],
+                   stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return output_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fixed vs adaptive upload encodes.")
+    parser.add_argument("--short-seconds", type=int, default=10, help="Serve clip length (1080p60 source)")
+    parser.add_argument("--long-seconds", type=int, default=120, help="Match clip length (720p30 source)")
+    args = parser.parse_args()
+
+    cache_dir = os.path.join(tempfile.gettempdir(), "courtlens_bench")
+    cases = [
+        ("serve", make_test_video(os.path.join(cache_dir, f"src_1920x1080_{args.short_seconds}s_60fps.mp4"),
+                                  1920, 1080, args.short_seconds, fps=60)),
+        ("match", make_test_video(os.path.join(cache_dir, f"src_1280x720_{args.long_seconds}s.mp4"),
+                                  1280, 720, args.long_seconds)),
+    ]
+
+    work_dir = tempfile.mkdtemp(prefix="courtlens_bench_profiles_")
+    try:
+        for name, source in cases:
+            info = probe_video(source)
+            profile = select_profile(info)
+            print(f"\n{name}: {info.width}x{info.height}@{info.fps:.0f} {info.duration:.0f}s -> {profile}")
+
+            t0 = time.perf_counter()
+            legacy = legacy_normalize(source, os.path.join(work_dir, f"{name}_legacy.mp4"))
+            legacy_time = time.perf_counter() - t0
+
+            # normalize_input_video writes next to its input: work on a copy
+            adaptive_src = shutil.copy(source, os.path.join(work_dir, f"{name}.mp4"))
+            t0 = time.perf_counter()
+            adaptive = normalize_input_video(adaptive_src)
+            adaptive_time = time.perf_counter() - t0
+
+            for label, path, seconds in (("legacy", legacy, legacy_time), ("adaptive", adaptive, adaptive_time)):
+                size_mb = os.path.getsize(path) / (1024 * 1024)
+                print(f"  {label:8s} {size_mb:6.2f} MB  {seconds:6.2f}s encode  ({info.duration / seconds:.1f}x realtime)")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark for the shared markdown parser (tools/markdown_layout.py) and both renderers.
+
+Run from the repo root:
+    python -m benchmarks.bench_markdown
+    python -m benchmarks.bench_markdown --corpus analyses/report_forehand_2025_12_22.md --runs 200
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from tools.markdown_layout import clear_block_cache, parse_markdown
+
+def timeit(fn, runs):
+    t0 = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - t0) / runs
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the shared markdown-to-layout engine.")
+    parser.add_argument("--corpus", default="analyses/report_forehand_2025_12_22.md")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    def parse_cold():
+        clear_block_cache()
+        parse_markdown(text)
+
+    cold = timeit(parse_cold, args.runs)
+    parse_markdown(text)
+    warm = timeit(lambda: parse_markdown(text), args.runs)
+    blocks = parse_markdown(text)
+
+    print(f"Corpus: {args.corpus} ({len(text)} chars, {len(blocks)} blocks)")
+    print(f"Parse (cold):    {cold * 1e6:8.1f} us")
+    print(f"Parse (cached):  {warm * 1e6:8.1f} us")
+
+    # End-to-end through both renderers (each is optional: skip if its backend is missing)
+    render_runs = max(1, args.runs // 20)
+    try:
+        from tools.report_generator import create_pdf
+        fpdf_t = timeit(lambda: create_pdf(text, "Bench", "N/A", "English", "Full Audit", None), render_runs)
+        print(f"FPDF render:     {fpdf_t * 1000:8.1f} ms")
+    except ImportError as e:
+        print(f"FPDF render:     skipped ({e})")
+
+    try:
+        from pdf_generator import convert_md_to_pdf
+        with tempfile.TemporaryDirectory() as tmp:
+            out = os.path.join(tmp, "bench.pdf")
+            rl_t = timeit(lambda: convert_md_to_pdf(args.corpus, out), render_runs)
+        print(f"ReportLab render:{rl_t * 1000:8.1f} ms")
+    except ImportError as e:
+        print(f"ReportLab render: skipped ({e})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Micro-benchmark: FPDF reports per second on a fixed markdown corpus.
+
+Run from the repo root:
+    python -m benchmarks.bench_reports
+    python -m benchmarks.bench_reports --corpus analyses/report_forehand_2025_12_22.md --runs 50
+"""
+import argparse
+import time
+
+from tools.report_generator import create_pdf
+
+DEFAULT_CORPUS = "analyses/report_forehand_2025_12_22.md"
+DRILL_LINK = "https://www.youtube.com/results?search_query=Tennis+Unit+Turn+Drills"
+CONFIDENCE_LOG = [
+    {"claim": "Left arm drops too early", "evidence": "Frame at 0:09 shows distinct drop before contact.", "confidence_score": 9.2},
+    {"claim": "Stance is too open", "evidence": "Feet position clearly visible at 0:10.", "confidence_score": 8.5},
+]
+
+def render_once(text):
+    return create_pdf(
+        text, "Red Shirt", "Intermediate (NTRP 3.0-4.0)", "English",
+        "📋 Full Professional Audit (Deep Dive)", DRILL_LINK,
+        images={}, confidence_data=CONFIDENCE_LOG
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark create_pdf throughput.")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Markdown file used as report body")
+    parser.add_argument("--runs", type=int, default=30, help="Timed iterations")
+    parser.add_argument("--warmup", type=int, default=3, help="Untimed iterations (fills the asset caches)")
+    args = parser.parse_args()
+
+    with open(args.corpus, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    # Cold: first report in this process pays for building the static assets
+    t0 = time.perf_counter()
+    size = len(render_once(text))
+    cold_ms = (time.perf_counter() - t0) * 1000
+
+    for _ in range(args.warmup):
+        render_once(text)
+
+    timings = []
+    for _ in range(args.runs):
+        t0 = time.perf_counter()
+        render_once(text)
+        timings.append(time.perf_counter() - t0)
+
+    timings.sort()
+    mean = sum(timings) / len(timings)
+    print(f"Corpus: {args.corpus} ({len(text)} chars) -> {size} bytes PDF")
+    print(f"Cold report:  {cold_ms:.1f} ms")
+    print(f"Warm mean:    {mean * 1000:.1f} ms | median {timings[len(timings) // 2] * 1000:.1f} ms")
+    print(f"Throughput:   {1 / mean:.1f} reports/s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark: multi-format social export (one decode + split) vs one create_viral_clip-style
+encode per format.
+
+Run from the repo root:
+    python -m benchmarks.bench_social_export
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from benchmarks.synthetic import make_test_video
+from tools.social_export import DEFAULT_FORMATS, export_social_formats
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark export_social_formats.")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--start", type=float, default=4.0)
+    parser.add_argument("--clip", type=float, default=4.0)
+    args = parser.parse_args()
+
+    cache_dir = os.path.join(tempfile.gettempdir(), "courtlens_bench")
+    source = make_test_video(os.path.join(cache_dir, f"src_{args.width}x{args.height}_20s.mp4"), args.width, args.height, 20)
+    end = args.start + args.clip
+
+    out_dir = tempfile.mkdtemp(prefix="bench_social_")
+    try:
+        # Baseline: one full decode + encode per format
+        t0 = time.perf_counter()
+        for fmt in DEFAULT_FORMATS:
+            export_social_formats(source, args.start, end, formats=[fmt], output_dir=os.path.join(out_dir, "separate", fmt))
+        separate = time.perf_counter() - t0
+
+        # Single format only: the floor we want the fan-out to approach
+        t0 = time.perf_counter()
+        export_social_formats(source, args.start, end, formats=["9:16"], output_dir=os.path.join(out_dir, "single"))
+        single = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        paths = export_social_formats(source, args.start, end, output_dir=os.path.join(out_dir, "fanout"))
+        fanout = time.perf_counter() - t0
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+    print(f"Source: {source} | {len(paths)} formats: {', '.join(paths)}")
+    print(f"Single format (9:16):        {single:.2f}s")
+    print(f"One encode per format:       {separate:.2f}s")
+    print(f"Single decode + split:       {fanout:.2f}s ({separate / fanout:.2f}x faster, {fanout / single:.2f}x a single encode)")
+
+if __name__ == "__main__":
+    main()
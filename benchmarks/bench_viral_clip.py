@@ -0,0 +1,47 @@
+"""
+Benchmark: viral clip rendering, ffmpeg filtergraph engine vs legacy MoviePy compositing.
+
+Run from the repo root:
+    python -m benchmarks.bench_viral_clip
+    python -m benchmarks.bench_viral_clip --width 1920 --height 1080 --clip 5
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic import make_test_video
+from tools.video_editor import create_viral_clip
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare create_viral_clip engines.")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--seconds", type=int, default=20, help="Source video length")
+    parser.add_argument("--start", type=float, default=6.0)
+    parser.add_argument("--clip", type=float, default=4.0, help="Clip length in seconds")
+    parser.add_argument("--runs", type=int, default=2)
+    args = parser.parse_args()
+
+    cache_dir = os.path.join(tempfile.gettempdir(), "courtlens_bench")
+    source = make_test_video(
+        os.path.join(cache_dir, f"src_{args.width}x{args.height}_{args.seconds}s.mp4"),
+        args.width, args.height, args.seconds
+    )
+    print(f"Source: {source} | window {args.start:.1f}s + {args.clip:.1f}s")
+
+    results = {}
+    for engine in ("ffmpeg", "moviepy"):
+        timings = []
+        for _ in range(args.runs):
+            t0 = time.perf_counter()
+            out = create_viral_clip(source, args.start, args.start + args.clip, engine=engine)
+            timings.append(time.perf_counter() - t0)
+            os.remove(out)
+        results[engine] = min(timings)
+        print(f"{engine:8s} best of {args.runs}: {results[engine]:.2f}s ({args.clip / results[engine]:.2f}x realtime)")
+
+    print(f"Speedup (ffmpeg vs moviepy): {results['moviepy'] / results['ffmpeg']:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Benchmark: per-frame watermark blending, cropped overlay vs full-frame alpha composite.
+
+Run from the repo root:
+    python -m benchmarks.bench_watermark
+"""
+import argparse
+import time
+
+import numpy as np
+
+from tools.watermark import WATERMARK_TEXT, blend_watermark, get_watermark_overlay, render_watermark
+
+def full_frame_blend(frame, rgba):
+    """What a full-canvas RGBA composite costs (the old MoviePy ImageClip path)."""
+    alpha = rgba[:, :, 3:4] / 255.0
+    return (frame * (1 - alpha) + rgba[:, :, :3] * alpha).astype(np.uint8)
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare watermark blending strategies.")
+    parser.add_argument("--width", type=int, default=1080)
+    parser.add_argument("--height", type=int, default=1920)
+    parser.add_argument("--frames", type=int, default=100)
+    args = parser.parse_args()
+
+    frame = np.random.default_rng(0).integers(0, 256, (args.height, args.width, 3), dtype=np.uint8)
+    full_rgba = np.array(render_watermark(WATERMARK_TEXT, args.width, args.height)).astype(np.float32)
+    overlay = get_watermark_overlay(WATERMARK_TEXT, args.width, args.height)
+
+    timings = {}
+    for name, fn in [("full-frame", lambda: full_frame_blend(frame, full_rgba)),
+                     ("cropped", lambda: blend_watermark(frame, overlay))]:
+        t0 = time.perf_counter()
+        for _ in range(args.frames):
+            fn()
+        timings[name] = (time.perf_counter() - t0) / args.frames
+        print(f"{name:10s}: {timings[name] * 1000:7.2f} ms/frame")
+
+    oh, ow = overlay.rgba.shape[:2]
+    print(f"Overlay box: {ow}x{oh} px ({100 * ow * oh / (args.width * args.height):.2f}% of frame)")
+    print(f"Speedup: {timings['full-frame'] / timings['cropped']:.1f}x")
+
+if __name__ == "__main__":
+    main()
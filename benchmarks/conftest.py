@@ -0,0 +1,59 @@
+"""
+pytest-benchmark suite for the media and report hot paths.
+
+    pip install pytest pytest-benchmark
+    pytest                                   # quick matrix, results saved under .benchmarks/
+    pytest -m "not slow"                     # skip the long 1080p clips
+    pytest --benchmark-compare --benchmark-compare-fail=mean:15%   # vs. the last saved run
+
+Every run is autosaved (named after the commit), so `pytest-benchmark compare`
+shows regressions across commits. Inputs are synthetic (ffmpeg testsrc2, see
+benchmarks/synthetic.py) and cached in BENCH_VIDEO_DIR between runs.
+
+test_progress.py, test_storage.py and test_write_behind.py are plain
+correctness tests for the persistence layer (no timings, no videos).
+"""
+import os
+import shutil
+import tempfile
+
+import pytest
+
+os.environ.setdefault("TRACING_ENABLED", "0")  # Keep the trace sink out of the timings
+
+from benchmarks.synthetic import make_test_video
+
+BENCH_VIDEO_DIR = os.environ.get("BENCH_VIDEO_DIR", os.path.join(tempfile.gettempdir(), "courtlens_bench_videos"))
+
+# (id, width, height, seconds, rotation): landscape camcorder, phone portrait, phone with a rotation flag, long clips
+VIDEO_MATRIX = [
+    ("480p-5s", 854, 480, 5, 0),
+    ("720p-10s", 1280, 720, 10, 0),
+    ("1080p-portrait-10s", 1080, 1920, 10, 0),
+    ("1080p-rot90-10s", 1920, 1080, 10, 90),
+    pytest.param(("1080p-60s", 1920, 1080, 60, 0), marks=pytest.mark.slow, id="1080p-60s"),
+]
+
+def pytest_configure(config):
+    if config.pluginmanager.hasplugin("benchmark") and not config.getoption("benchmark_autosave"):
+        config.option.benchmark_autosave = True
+
+def _video_id(spec):
+    return spec[0] if isinstance(spec, tuple) else None
+
+@pytest.fixture(scope="session", params=VIDEO_MATRIX, ids=_video_id)
+def synthetic_video(request):
+    """Path to a cached synthetic clip (audio on, 30 fps) for each matrix entry."""
+    name, width, height, seconds, rotation = request.param
+    return make_test_video(os.path.join(BENCH_VIDEO_DIR, f"{name}.mp4"), width, height, seconds, rotation=rotation)
+
+@pytest.fixture(scope="session")
+def short_video():
+    """One 720p clip for benchmarks that don't depend on the input size."""
+    return make_test_video(os.path.join(BENCH_VIDEO_DIR, "720p-10s.mp4"), 1280, 720, 10)
+
+@pytest.fixture
+def scratch_dir():
+    path = tempfile.mkdtemp(prefix="courtlens_bench_")
+    yield path
+    shutil.rmtree(path, ignore_errors=True)
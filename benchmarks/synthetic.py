@@ -0,0 +1,54 @@
+"""
+Synthetic inputs, no fixtures needed: test videos for the media benchmarks
+(ffmpeg `testsrc2` + `sine`) and saved-analysis rows for the storage tests.
+"""
+import os
+import subprocess
+
+from tools.video_editor import FFMPEG_BINARY
+
+def make_test_video(output_path, width=1280, height=720, seconds=10, fps=30, rotation=0, audio=True):
+    """
+    Encodes a moving test pattern (H.264/AAC) to `output_path` and returns it.
+    `rotation` writes a display-matrix rotation flag like phone footage does.
+    Existing files are reused, so repeated benchmark runs skip generation.
+    """
+    if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        return output_path
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+
+    cmd = [FFMPEG_BINARY, "-y", "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}"]
+    if audio:
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={seconds}"]
+    cmd += ["-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p", "-g", str(fps * 2)]
+    if audio:
+        cmd += ["-c:a", "aac", "-shortest"]
+
+    if rotation:
+        # Encode to a temp file, then stream-copy with the rotation flag set
+        tmp_path = output_path + ".norot.mp4"
+        subprocess.run(cmd + [tmp_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+        subprocess.run(
+            [FFMPEG_BINARY, "-y", "-display_rotation", str(rotation), "-i", tmp_path, "-c", "copy", output_path],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True
+        )
+        os.remove(tmp_path)
+    else:
+        subprocess.run(cmd + [output_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    return output_path
+
+def make_analysis_row(email="player@example.com", video="serve.mp4", ntrp="3.5", flaws=("Left arm drops too early.",),
+                      stroke="Forehand", report_type="full", confidence=8.0, created_at=None):
+    """One row as save_analysis_to_db builds it (report text in the app's full-audit layout)."""
+    bullets = "".join(f"* {flaw}\n" for flaw in flaws)
+    row = {
+        "player_email": email, "player_name": "Red Shirt", "video_name": video,
+        "analysis_text": f"## 🎯 Reality Check & Level\n**Observed Level:** Intermediate (NTRP {ntrp})\n\n"
+                         f"## 🧬 Biomechanical Audit\n**The Bad (Major Flaws):**\n{bullets}",
+        "structured_data": {"stroke_type": stroke, "report_type": report_type,
+                            "confidence_log": [{"claim": flaws[0] if flaws else "Solid contact", "confidence_score": confidence}]},
+        "confidence_score": confidence,
+    }
+    if created_at:
+        row["created_at"] = created_at
+    return row
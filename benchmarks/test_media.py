@@ -0,0 +1,49 @@
+"""
+Media hot paths: upload normalization, frame grabs, analysis frame slicing and
+vertical clip rendering, over the synthetic video matrix (see conftest.py).
+"""
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from tools.video_editor import create_viral_clip, extract_frame, normalize_input_video
+from video_tools import extract_analysis_frames
+
+# Encodes take seconds: a few rounds, no calibration loops
+ENCODE_ROUNDS = int(os.environ.get("BENCH_ENCODE_ROUNDS", 3))
+
+def test_normalize_input_video(benchmark, synthetic_video, scratch_dir):
+    # normalize_input_video writes next to its input: work on a copy
+    upload = shutil.copy(synthetic_video, os.path.join(scratch_dir, "upload.mp4"))
+    output = benchmark.pedantic(normalize_input_video, args=(upload,), rounds=ENCODE_ROUNDS, iterations=1)
+    assert output.endswith("_fixed.mp4") and os.path.getsize(output) > 0
+    benchmark.extra_info["output_mb"] = round(os.path.getsize(output) / 1e6, 2)
+
+def test_extract_frame(benchmark, synthetic_video, scratch_dir):
+    output = benchmark(extract_frame, synthetic_video, 3.0, os.path.join(scratch_dir, "frame.jpg"))
+    assert output and os.path.exists(output)
+
+def test_extract_analysis_frames(benchmark, synthetic_video, scratch_dir):
+    result = benchmark.pedantic(extract_analysis_frames, args=(synthetic_video, scratch_dir), rounds=ENCODE_ROUNDS, iterations=1)
+    assert result["status"] == "success"
+    benchmark.extra_info["frames"] = result["frame_count"]
+
+def test_create_viral_clip(benchmark, synthetic_video, scratch_dir):
+    output = os.path.join(scratch_dir, "viral.mp4")
+    result = benchmark.pedantic(create_viral_clip, args=(synthetic_video, 1, 4),
+                                kwargs={"output_path": output}, rounds=ENCODE_ROUNDS, iterations=1)
+    assert result == output and os.path.getsize(output) > 0
+
+@pytest.mark.parametrize("engine,crop_mode", [
+    ("ffmpeg", "track"),
+    pytest.param("moviepy", "center", marks=pytest.mark.slow),
+])
+def test_create_viral_clip_variants(benchmark, short_video, scratch_dir, engine, crop_mode):
+    output = os.path.join(scratch_dir, "viral.mp4")
+    result = benchmark.pedantic(create_viral_clip, args=(short_video, 1, 4),
+                                kwargs={"engine": engine, "crop_mode": crop_mode, "output_path": output},
+                                rounds=ENCODE_ROUNDS, iterations=1)
+    assert result == output and os.path.getsize(output) > 0
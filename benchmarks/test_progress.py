@@ -0,0 +1,52 @@
+"""
+Per-player progress aggregates (tools/player_progress.py): merges are
+idempotent per analysis, including rows re-delivered after a backfill.
+"""
+import pytest
+
+pytest.importorskip("streamlit")  # tools.database reads Streamlit secrets
+
+from benchmarks.synthetic import make_analysis_row
+from tools import database
+from tools.player_progress import analysis_delta, build_progress, empty_progress, merge_progress, summarize_progress
+from tools.storage import SQLiteStore
+
+EMAIL = "player@example.com"
+FLAWS = ("Left arm drops too early.", "Late unit turn.")
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteStore(str(tmp_path / "analyses.db"))
+    monkeypatch.setattr(database, "get_store", lambda: store)
+    return store
+
+def test_merge_skips_repeated_delta():
+    delta = analysis_delta(make_analysis_row(flaws=FLAWS))
+    once = merge_progress(empty_progress(), delta)
+    twice = merge_progress(once, delta)
+    assert twice == once
+    assert twice["analyses"] == 1
+    assert twice["flaw_counts"] == {"Non-dominant arm": 1, "Preparation / unit turn": 1}
+
+def test_build_progress_deduplicates_rows():
+    row = make_analysis_row()
+    assert build_progress([row, row, make_analysis_row(video="rally.mp4")])["analyses"] == 2
+
+def test_redelivery_after_backfill_is_ignored(store):
+    row = make_analysis_row(flaws=FLAWS, created_at="2026-01-01T10:00:00.000000+00:00")
+    store.insert([row])
+    # First aggregate for the player: backfilled from the stored history
+    database._apply_progress(row)
+    backfilled = store.get_progress(EMAIL)
+    assert backfilled["analyses"] == 1
+
+    # The write-behind queue delivers the same row again (at-least-once)
+    database._apply_progress(row)
+    assert store.get_progress(EMAIL) == backfilled
+
+    database._apply_progress(make_analysis_row(video="rally.mp4", ntrp="4.0", created_at="2026-02-01T10:00:00.000000+00:00"))
+    summary = summarize_progress(store.get_progress(EMAIL))
+    assert summary["analyses"] == 2
+    assert [p["ntrp"] for p in summary["ntrp_timeline"]] == [3.5, 4.0]
+    assert summary["top_flaws"][0] == ("Non-dominant arm", 2)
+    assert summary["confidence_by_stroke"] == {"Forehand": 8.0}
@@ -0,0 +1,54 @@
+"""
+Report hot paths: the in-app FPDF report (create_pdf, with and without frame
+images) and the ReportLab markdown converter (convert_md_to_pdf).
+"""
+import os
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from pdf_generator import convert_md_to_pdf
+from tools.report_generator import create_pdf
+from tools.video_editor import extract_frame
+
+CORPUS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "analyses", "report_forehand_2025_12_22.md")
+DRILL_LINK = "https://www.youtube.com/results?search_query=Tennis+Unit+Turn+Drills"
+CONFIDENCE_LOG = [
+    {"claim": "Left arm drops too early", "evidence": "Frame at 0:09 shows distinct drop before contact.", "confidence_score": 9.2},
+    {"claim": "Stance is too open", "evidence": "Feet position clearly visible at 0:10.", "confidence_score": 8.5},
+]
+
+@pytest.fixture(scope="module")
+def corpus():
+    with open(CORPUS, "r", encoding="utf-8") as f:
+        return f.read()
+
+@pytest.fixture
+def frame_images(short_video, scratch_dir):
+    return {
+        "cover": extract_frame(short_video, 1.0, os.path.join(scratch_dir, "cover.jpg")),
+        "best": extract_frame(short_video, 3.0, os.path.join(scratch_dir, "best.jpg")),
+        "best_reason": "Good execution",
+        "fix": extract_frame(short_video, 6.0, os.path.join(scratch_dir, "fix.jpg")),
+        "fix_reason": "Needs correction",
+    }
+
+def render(text, images):
+    return create_pdf(text, "Red Shirt", "Intermediate (NTRP 3.0-4.0)", "English",
+                      "📋 Full Professional Audit (Deep Dive)", DRILL_LINK,
+                      images=images, confidence_data=CONFIDENCE_LOG)
+
+def test_create_pdf(benchmark, corpus):
+    pdf = benchmark(render, corpus, {})
+    assert bytes(pdf).startswith(b"%PDF")
+
+def test_create_pdf_with_frames(benchmark, corpus, frame_images):
+    pdf = benchmark(render, corpus, frame_images)
+    assert bytes(pdf).startswith(b"%PDF")
+    benchmark.extra_info["bytes"] = len(pdf)
+
+def test_convert_md_to_pdf(benchmark, scratch_dir):
+    output = os.path.join(scratch_dir, "report.pdf")
+    benchmark(convert_md_to_pdf, CORPUS, output)
+    assert os.path.getsize(output) > 0
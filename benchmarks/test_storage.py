@@ -0,0 +1,96 @@
+"""
+Local analysis store (tools/storage.py SQLiteStore) and search index
+(tools/search_index.py): round trips, keyset pagination and facets.
+"""
+import pytest
+
+from benchmarks.synthetic import make_analysis_row
+from tools.search_index import SearchIndex
+from tools.storage import SQLiteStore
+
+EMAIL = "player@example.com"
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteStore(str(tmp_path / "analyses.db"))
+
+@pytest.fixture
+def index(tmp_path):
+    return SearchIndex(str(tmp_path / "search.db"))
+
+def _stamp(day):
+    return f"2026-01-{day:02d}T10:00:00.000000+00:00"
+
+def test_store_round_trip(store):
+    store.insert([make_analysis_row(created_at=_stamp(1))])
+    (item,) = store.list_history(EMAIL)["items"]
+    assert item["video_name"] == "serve.mp4"
+    assert item["report_type"] == "full"
+    assert item["confidence_score"] == 8.0
+
+    stored = store.get_analysis(item["id"])
+    assert stored["structured_data"]["stroke_type"] == "Forehand"
+    assert "NTRP 3.5" in stored["analysis_text"]
+
+    (row,) = store.iter_analyses(EMAIL)
+    assert (row["player_email"], row["video_name"]) == (EMAIL, "serve.mp4")  # analysis_key() needs both
+
+def test_history_pages_cover_every_row_once(store):
+    # Two rows share each timestamp: the cursor must break ties on id
+    rows = [make_analysis_row(video=f"clip_{i}.mp4", created_at=_stamp(1 + i // 2)) for i in range(7)]
+    store.insert(rows)
+    store.insert([make_analysis_row(email="other@example.com", created_at=_stamp(9))])
+
+    seen, cursor = [], None
+    while True:
+        page = store.list_history(EMAIL, cursor=cursor, limit=3)
+        seen += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == 7
+    assert len({item["id"] for item in seen}) == 7
+    keys = [(item["created_at"], item["id"]) for item in seen]
+    assert keys == sorted(keys, reverse=True)
+    assert [r["video_name"] for r in store.iter_analyses(EMAIL)] == [f"clip_{i}.mp4" for i in range(7)]
+
+def test_history_filters_by_report_type(store):
+    store.insert([make_analysis_row(video="a.mp4", report_type="full"),
+                  make_analysis_row(video="b.mp4", report_type="quick")])
+    items = store.list_history(EMAIL, report_type="quick")["items"]
+    assert [item["video_name"] for item in items] == ["b.mp4"]
+
+def test_update_progress_creates_then_updates(store):
+    assert store.get_progress(EMAIL) is None
+    store.update_progress(EMAIL, lambda current: {"analyses": 1})
+    store.update_progress(EMAIL, lambda current: {"analyses": current["analyses"] + 1})
+    assert store.get_progress(EMAIL) == {"analyses": 2}
+
+def test_search_index_skips_duplicates(index):
+    row = make_analysis_row()
+    assert index.add(row) is True
+    assert index.add(dict(row)) is False
+    assert index.stats()["documents"] == 1
+
+def test_search_ranks_and_counts_facets(index):
+    index.add(make_analysis_row(video="a.mp4", flaws=("Late unit turn on faster balls.",), stroke="Forehand"))
+    index.add(make_analysis_row(video="b.mp4", flaws=("Left arm drops too early.",), stroke="Backhand", report_type="quick"))
+    index.add(make_analysis_row(email="other@example.com", flaws=("Late unit turn.", "Poor split step."), stroke="Forehand"))
+
+    result = index.search("unit turn")
+    assert result["total"] == 2
+    assert {hit["video_name"] for hit in result["hits"]} == {"a.mp4", "serve.mp4"}
+    assert all(hit["score"] is not None for hit in result["hits"])
+    assert result["facets"]["player_email"] == {EMAIL: 1, "other@example.com": 1}
+
+    # Each facet is counted with the other filters applied, not its own
+    result = index.search(filters={"stroke_type": "Forehand"})
+    assert result["total"] == 2
+    assert result["facets"]["stroke_type"] == {"Forehand": 2, "Backhand": 1}
+    assert result["facets"]["flaw"] == {"Preparation / unit turn": 2, "Footwork / stance": 1}
+
+    result = index.search(filters={"flaw": "Non-dominant arm"})
+    assert [hit["video_name"] for hit in result["hits"]] == ["b.mp4"]
+    assert result["hits"][0]["report_type"] == "quick"
+    with pytest.raises(ValueError):
+        index.search(filters={"colour": "red"})
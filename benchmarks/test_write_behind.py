@@ -0,0 +1,84 @@
+"""
+Write-behind journal (tools/write_behind.py): batching, retry with backoff,
+dead rows after max_attempts, and rows surviving a restart.
+"""
+import pytest
+
+from tools import write_behind
+from tools.write_behind import WriteBehindQueue
+
+class FlakySink:
+    """Records every insert; the first `failures` calls raise."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.calls = []
+        self.rows = []
+
+    def __call__(self, table, rows):
+        self.calls.append((table, len(rows)))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("upstream unavailable")
+        self.rows += rows
+
+@pytest.fixture
+def journal(tmp_path):
+    return str(tmp_path / "write_queue.db")
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(write_behind, "backoff_delay", lambda attempts, base=None, cap=None: 0.0)
+
+def test_flush_sends_rows_in_order_and_batches(journal):
+    sink, flushed = FlakySink(), []
+    queue = WriteBehindQueue(sink, path=journal, batch_size=2, on_flush=lambda table, rows: flushed.extend(rows))
+    for i in range(5):
+        queue.enqueue("tennis_analyses", {"n": i})
+
+    assert queue.flush() == 5
+    assert [row["n"] for row in sink.rows] == [0, 1, 2, 3, 4]
+    assert sink.calls == [("tennis_analyses", 2), ("tennis_analyses", 2), ("tennis_analyses", 1)]
+    assert flushed == sink.rows
+    assert queue.metrics()["pending"] == 0
+    assert queue.flush() == 0
+
+def test_rows_keep_their_enqueue_time(journal, no_backoff):
+    sink = FlakySink(failures=1)
+    queue = WriteBehindQueue(sink, path=journal)
+    queue.enqueue("tennis_analyses", {"n": 1})
+    stamped = queue.pending_rows("tennis_analyses")[0]["created_at"]
+
+    assert queue.flush() == 0  # First attempt fails, the retry sends the same row
+    assert queue.flush() == 1
+    assert sink.rows[0]["created_at"] == stamped
+
+def test_failed_batch_waits_for_backoff(journal, monkeypatch):
+    monkeypatch.setattr(write_behind, "backoff_delay", lambda attempts, base=None, cap=None: 3600.0)
+    sink = FlakySink(failures=1)
+    queue = WriteBehindQueue(sink, path=journal)
+    queue.enqueue("tennis_analyses", {"n": 1})
+
+    assert queue.flush() == 0
+    assert queue.flush() == 0  # Not due yet: the sink isn't called again
+    assert len(sink.calls) == 1
+    metrics = queue.metrics()
+    assert (metrics["pending"], metrics["dead"], metrics["failed_batches"]) == (1, 0, 1)
+    assert "upstream unavailable" in metrics["last_error"]
+
+def test_row_goes_dead_after_max_attempts(journal, no_backoff):
+    sink = FlakySink(failures=99)
+    queue = WriteBehindQueue(sink, path=journal, max_attempts=3)
+    queue.enqueue("tennis_analyses", {"n": 1})
+
+    for _ in range(5):
+        queue.flush()
+    assert len(sink.calls) == 3
+    assert queue.metrics()["dead"] == 1
+    assert queue.metrics()["pending"] == 0
+    assert queue.pending_rows("tennis_analyses") == []
+
+def test_journal_survives_restart(journal):
+    WriteBehindQueue(FlakySink(failures=99), path=journal).enqueue("tennis_analyses", {"n": 7})
+    sink = FlakySink()  # Next process: the same journal drains on its first flush
+    assert WriteBehindQueue(sink, path=journal).flush() == 1
+    assert sink.rows[0]["n"] == 7
@@ -0,0 +1,196 @@
+"""
+Offline load generator for the analysis pipeline.
+
+Drives N `app_graph.invoke` runs (upload -> PROCESSING wait -> generation ->
+JSON parse -> email) through a pool of C workers against the replayed Gemini
+API (agent/replay.py), and reports throughput, queue wait, end-to-end and
+per-stage latency (from the pipeline traces) and process memory.
+
+Usage:
+    python loadtest.py -n 40 -c 8
+    python loadtest.py -n 200 -c 32 --latency-scale 0.1 --save
+    python loadtest.py -n 100 -c 8 --rate 0.5            # open model: Poisson arrivals, 0.5 runs/s
+    python loadtest.py --video my_rally.mp4 --failure-rate 0.05 --json results.json
+
+--mode live/record hits the real API (needs GOOGLE_API_KEY and costs quota).
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+REPORT_TYPES = {
+    "full": "📋 Full Professional Audit (Deep Dive)",
+    "quick": "⚡ Quick Fix (1 Issue + Drill)",
+}
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def _fmt(values, unit="s", scale=1.0):
+    if not values:
+        return "-"
+    p50, p95, p99 = (percentile(values, p) * scale for p in (50, 95, 99))
+    return f"p50 {p50:8.2f}{unit} | p95 {p95:8.2f}{unit} | p99 {p99:8.2f}{unit} | max {max(values) * scale:8.2f}{unit}"
+
+class MemorySampler:
+    """Samples this process's RSS (Linux /proc; falls back to the ru_maxrss high-water mark)."""
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def rss_mb():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+        except (OSError, ValueError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1e3
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.samples.append(self.rss_mb())
+
+    def __enter__(self):
+        self.samples.append(self.rss_mb())
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.samples.append(self.rss_mb())
+
+def _default_video():
+    from benchmarks.synthetic import make_test_video
+    return make_test_video(os.path.join(tempfile.gettempdir(), "courtlens_bench_videos", "720p-10s.mp4"), 1280, 720, 10)
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent app_graph.invoke load test (replayed Gemini by default).")
+    parser.add_argument("-n", "--runs", type=int, default=20, help="Total pipeline runs")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Concurrent workers")
+    parser.add_argument("--rate", type=float, default=None, help="Arrival rate in runs/s (default: all submitted at once)")
+    parser.add_argument("--video", default=None, help="Input video (default: a synthetic 720p 10s clip)")
+    parser.add_argument("--report-type", choices=sorted(REPORT_TYPES), default="full")
+    parser.add_argument("--language", default="English")
+    parser.add_argument("--mode", choices=("replay", "record", "live"), default="replay")
+    parser.add_argument("--latency-scale", type=float, default=None, help="Replay delays x this factor (0 = no sleeps)")
+    parser.add_argument("--jitter", type=float, default=None, help="Replay lognormal sigma")
+    parser.add_argument("--failure-rate", type=float, default=None, help="Replay share of uploads ending FAILED")
+    parser.add_argument("--seed", default=None, help="Replay RNG seed (reproducible latencies)")
+    parser.add_argument("--save", action="store_true", help="Also save each analysis (SQLite store + search index in a temp dir)")
+    parser.add_argument("--json", default=None, help="Write the summary to this file")
+    args = parser.parse_args()
+
+    # The pipeline modules read their configuration at import time
+    work_dir = tempfile.mkdtemp(prefix="courtlens_loadtest_")
+    os.environ["GEMINI_MODE"] = args.mode
+    for name, value in (("REPLAY_LATENCY_SCALE", args.latency_scale), ("REPLAY_JITTER", args.jitter),
+                        ("REPLAY_FAILURE_RATE", args.failure_rate), ("REPLAY_SEED", args.seed)):
+        if value is not None:
+            os.environ[name] = str(value)
+    os.environ["TRACING_ENABLED"] = "1"
+    os.environ["TRACE_LOG_PATH"] = os.path.join(work_dir, "traces.jsonl")
+    if args.save:
+        os.environ["ANALYSIS_STORE"] = "sqlite"
+        os.environ["ANALYSIS_DB_PATH"] = os.path.join(work_dir, "analyses.db")
+        os.environ["SEARCH_INDEX_PATH"] = os.path.join(work_dir, "search.db")
+
+    from agent.graph import app_graph
+    from tools.tracing import read_traces, span
+    save_analysis_to_db = None
+    if args.save:
+        from tools.database import save_analysis_to_db
+
+    video = args.video or _default_video()
+    inputs = {
+        "video_path": video,
+        "player_description": "Red Shirt",
+        "player_level": "Intermediate (NTRP 3.0-4.0)",
+        "player_notes": "",
+        "focus_areas": [],
+        "handedness": "Right",
+        "stroke_type": "Forehand",
+        "report_type": REPORT_TYPES[args.report_type],
+        "language": args.language,
+        "creator_mode": False,
+        "dev_mode": False,
+    }
+
+    def run(i, submitted_at):
+        started_at = time.perf_counter()
+        outcome = {"run": i, "queue_wait": started_at - submitted_at}
+        try:
+            with span("loadtest.run", run=i, mode=args.mode):
+                state = app_graph.invoke(dict(inputs))
+                text = state.get("analysis_text") or ""
+                outcome["ok"] = bool(text) and not text.startswith("Error:")
+                outcome["error"] = None if outcome["ok"] else (text[:80] or "empty response")
+                if outcome["ok"] and save_analysis_to_db:
+                    save_analysis_to_db(f"loadtest{i % 10}@example.com", inputs["player_description"], os.path.basename(video),
+                                        text, state.get("structured_data"), inputs["report_type"], inputs["stroke_type"])
+        except Exception as e:
+            outcome["ok"], outcome["error"] = False, f"{type(e).__name__}: {e}"
+        outcome["latency"] = time.perf_counter() - started_at
+        return outcome
+
+    print(f"🚦 {args.runs} runs x {args.concurrency} workers · mode {args.mode} · {os.path.basename(video)} "
+          f"({os.path.getsize(video) / 1e6:.1f} MB) · {'rate ' + str(args.rate) + '/s' if args.rate else 'burst'}")
+    arrivals = random.Random(args.seed)
+    with MemorySampler() as memory, ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        t0 = time.perf_counter()
+        futures = []
+        for i in range(args.runs):
+            if args.rate and i:
+                time.sleep(arrivals.expovariate(args.rate))
+            futures.append(pool.submit(run, i, time.perf_counter()))
+        outcomes = [f.result() for f in futures]
+        wall = time.perf_counter() - t0
+
+    ok = [o for o in outcomes if o["ok"]]
+    stages = {}
+    for trace in read_traces(limit=args.runs * 2):
+        if trace["name"] != "loadtest.run":
+            continue
+        for s in trace["spans"]:
+            if s["depth"]:
+                stages.setdefault(s["name"], []).append(s["duration_ms"] / 1000)
+
+    summary = {
+        "runs": args.runs, "concurrency": args.concurrency, "rate": args.rate, "mode": args.mode,
+        "ok": len(ok), "failed": len(outcomes) - len(ok), "wall_sec": round(wall, 3),
+        "throughput_per_min": round(len(ok) / wall * 60, 2) if wall else None,
+        "latency_sec": {f"p{p}": round(percentile([o["latency"] for o in ok], p) or 0, 3) for p in (50, 95, 99)},
+        "queue_wait_sec": {f"p{p}": round(percentile([o["queue_wait"] for o in outcomes], p) or 0, 3) for p in (50, 95, 99)},
+        "stages_p50_sec": {name: round(percentile(v, 50), 3) for name, v in stages.items()},
+        "stages_p95_sec": {name: round(percentile(v, 95), 3) for name, v in stages.items()},
+        "rss_mb": {"start": round(memory.samples[0], 1), "peak": round(max(memory.samples), 1), "end": round(memory.samples[-1], 1)},
+        "errors": sorted({o["error"] for o in outcomes if o["error"]}),
+    }
+
+    print(f"🏁 {summary['ok']}/{args.runs} ok in {wall:.1f}s · {summary['throughput_per_min']} runs/min")
+    print(f"   End-to-end  {_fmt([o['latency'] for o in ok])}")
+    print(f"   Queue wait  {_fmt([o['queue_wait'] for o in outcomes])}")
+    for name, values in sorted(stages.items(), key=lambda kv: -percentile(kv[1], 50)):
+        print(f"   {name:<22}{_fmt(values)}")
+    print(f"🧠 RSS {summary['rss_mb']['start']} MB -> peak {summary['rss_mb']['peak']} MB -> {summary['rss_mb']['end']} MB")
+    for error in summary["errors"]:
+        print(f"   ❌ {error}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"📒 Summary: {args.json}")
+    print(f"📂 Traces: {os.environ['TRACE_LOG_PATH']}")
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,324 @@
-from mcp.server.fastmcp import FastMCP
-from pdf_generator import convert_md_to_pdf
-from video_tools import extract_analysis_frames
+from mcp.server.fastmcp import FastMCP, Context
+from mcp.server.fastmcp.exceptions import ToolError
+from pydantic import BaseModel
+from pdf_generator import build_pdf_from_markdown
+from video_tools import MANIFEST_FILE, build_extraction_result, extract_segment, plan_analysis_segments
+from tools.workspace import get_workspace_manager
+from tools.search_index import get_search_index
+from tools.tracing import remote_parent, span, trace_context
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional
+import multiprocessing
+import hashlib
+import asyncio
+import queue
+import time
 import os
+import json
+import base64
 
 # Initialize Server
 mcp = FastMCP("Tennis-AI-Tools")
 
+# --- RESULT TYPES ---
+# Tools return these models: clients get JSON (and a schema) instead of str(dict) / prose.
+class FrameInfo(BaseModel):
+    seq: int
+    path: str                  # Relative to the workspace folder
+    frame_number: int
+    timestamp_sec: float
+    width: int
+    height: int
+    bytes: int
+    sha256: str
+
+class SegmentInfo(BaseModel):
+    id: int
+    folder: str
+    start_sec: float
+    end_sec: float
+    start_frame: int
+    end_frame: int
+    summary: str
+    frames: List[FrameInfo]
+
+class VideoInfo(BaseModel):
+    path: str
+    fps: float
+    total_frames: int
+    duration_sec: float
+    width: int
+    height: int
+
+class FrameData(BaseModel):
+    path: str
+    sha256: str
+    mime_type: str = "image/jpeg"
+    data: str                  # Base64
+
+class FrameBatch(BaseModel):
+    workspace_id: str
+    frames: List[FrameData]
+    missing: List[str] = []    # Requested paths that don't exist in the workspace
+    truncated: bool = False    # Stopped at MCP_INLINE_MAX_MB
+
+class ExtractionResult(BaseModel):
+    status: str
+    message: str
+    workspace_id: str
+    output_dir: str
+    expires_at: Optional[float]
+    video: VideoInfo
+    frame_count: int
+    segments: List[SegmentInfo]
+    inline_frames: Optional[FrameBatch] = None
+
+class PdfResult(BaseModel):
+    status: str
+    output_path: str
+    pages: int
+    bytes: int
+    sha256: str
+    elapsed_sec: float
+
+class ReleaseResult(BaseModel):
+    workspace_id: str
+    released: bool
+
+class SearchHit(BaseModel):
+    player_email: Optional[str]
+    player_name: Optional[str]
+    video_name: Optional[str]
+    created_at: Optional[str]
+    report_type: Optional[str]
+    stroke_type: Optional[str]
+    confidence: Optional[float]
+    ntrp: Optional[float]
+    flaws: List[str]
+    score: Optional[float]     # bm25 relevance (higher is better); None when browsing without a query
+    snippet: str
+
+class SearchResult(BaseModel):
+    total: int
+    hits: List[SearchHit]
+    facets: dict               # facet -> {value: count}
+
+# --- CONCURRENCY ---
+# Tools are async: CPU work (frame extraction, PDF layout) runs in a process pool,
+# so the event loop keeps serving other clients while a long video is processed.
+MCP_WORKERS = int(os.environ.get("MCP_WORKERS", os.cpu_count() or 1))
+MCP_MAX_CONCURRENT_TOOLS = int(os.environ.get("MCP_MAX_CONCURRENT_TOOLS", MCP_WORKERS))
+
+_tool_slots = asyncio.Semaphore(MCP_MAX_CONCURRENT_TOOLS)
+
+@lru_cache(maxsize=1)
+def get_process_pool():
+    return ProcessPoolExecutor(max_workers=MCP_WORKERS)
+
+@lru_cache(maxsize=1)
+def get_progress_manager():
+    """Manager process hosting the queues that carry page progress out of the pool workers."""
+    return multiprocessing.Manager()
+
+def _extract_segment_worker(trace_ctx, *args):
+    """Pool worker: extract_segment with its span parented to the caller's (pool processes don't share context)."""
+    with remote_parent(trace_ctx):
+        return extract_segment(*args)
+
+async def _report(ctx, progress, total=None):
+    if ctx is not None:
+        await ctx.report_progress(progress, total)
+
 # --- TOOL 1: Video Extraction ONLY ---
+# Every call extracts into its own workspace (tools/workspace.py), so parallel
+# clients never touch each other's frames. Workspaces expire after the TTL.
+MCP_WORKSPACE_TTL_SEC = float(os.environ.get("MCP_WORKSPACE_TTL_SEC", 1800))
+MCP_INLINE_MAX_MB = float(os.environ.get("MCP_INLINE_MAX_MB", 8))  # Cap on base64 frames returned inline
+
+def _mcp_workspace(workspace_id):
+    workspace = get_workspace_manager().get(workspace_id)
+    if workspace is None or workspace.kind != "mcp":
+        raise ToolError(f"Unknown or expired workspace: {workspace_id}")
+    return workspace
+
+def _load_manifest(workspace):
+    with open(os.path.join(workspace.root, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+def _select_frames(workspace, paths=None, segments=None, max_bytes=MCP_INLINE_MAX_MB * 1024 * 1024):
+    """
+    Reads the requested frames (by relative path and/or segment id; all if neither)
+    into one FrameBatch. Only paths listed in the manifest are served.
+    """
+    manifest = _load_manifest(workspace)
+    known = {frame["path"]: (seg["id"], frame) for seg in manifest["segments"] for frame in seg["frames"]}
+    if paths is None and segments is None:
+        wanted = list(known)
+    else:
+        wanted = list(paths or [])
+        wanted += [p for p, (seg_id, _) in known.items() if segments and seg_id in segments and p not in wanted]
+
+    batch = FrameBatch(workspace_id=workspace.job_id, frames=[])
+    total = 0
+    for path in wanted:
+        if path not in known:
+            batch.missing.append(path)
+            continue
+        with open(os.path.join(workspace.root, path), "rb") as f:
+            data = f.read()
+        total += len(data)
+        if total > max_bytes:
+            batch.truncated = True
+            break
+        batch.frames.append(FrameData(path=path, sha256=known[path][1]["sha256"], data=base64.b64encode(data).decode("ascii")))
+    return batch
+
 @mcp.tool()
-def prepare_video_for_analysis(video_filename: str) -> str:
+async def prepare_video_for_analysis(video_filename: str, include_frames: bool = False, ctx: Context = None) -> ExtractionResult:
     """
-    Extracts frames from a video file into the 'temp_frames' folder.
-    Returns the paths of the images extracted.
+    Extracts frames from a video file into a fresh per-call workspace folder.
+    Returns the workspace (deleted after the TTL or via release_workspace), the
+    video info and every segment with its timing and frames (path, timestamp,
+    dimensions, sha256). include_frames=True also inlines all frames as base64;
+    use get_frames to fetch just the ones you need. Reports progress per segment.
     """
     base_dir = os.getcwd()
     full_path = os.path.join(base_dir, video_filename)
-    
-    # Use the smart extractor we built earlier
-    result = extract_analysis_frames(full_path, output_dir="temp_frames")
-    return str(result)
+    if not os.path.exists(full_path):
+        raise ToolError(f"Video not found at {video_filename}")
+
+    async with _tool_slots:
+        with span("mcp.prepare_video", video=video_filename, bytes=os.path.getsize(full_path)):
+            loop = asyncio.get_running_loop()
+            pool = get_process_pool()
+            plan = await loop.run_in_executor(pool, plan_analysis_segments, full_path)
+            if "error" in plan:
+                raise ToolError(plan["error"])
+
+            # Held while the pool writes into it (release_workspace refuses until then), then left to the TTL
+            workspace = get_workspace_manager().create("mcp", ttl=MCP_WORKSPACE_TTL_SEC)
+            try:
+                total = len(plan["segments"])
+                await _report(ctx, 0, total)
+
+                # One task per segment: they spread across the pool and report as they finish
+                futures = [
+                    loop.run_in_executor(pool, _extract_segment_worker, trace_context(), full_path, workspace.root, segment, plan["fps"])
+                    for segment in plan["segments"]
+                ]
+                try:
+                    done = 0
+                    for finished in asyncio.as_completed(futures):
+                        await finished
+                        done += 1
+                        await _report(ctx, done, total)
+                finally:
+                    await asyncio.gather(*futures, return_exceptions=True)  # No worker still writing on failure
+                segments = [f.result() for f in futures]  # Keep segment order
+
+                result = build_extraction_result(video_filename, workspace.root, plan, segments)
+                inline = await asyncio.to_thread(_select_frames, workspace) if include_frames else None
+            finally:
+                workspace.release(keep=True)
+    return ExtractionResult(**result, workspace_id=workspace.job_id, expires_at=workspace.expires_at, inline_frames=inline)
+
+@mcp.tool()
+async def get_frames(workspace_id: str, paths: Optional[List[str]] = None, segments: Optional[List[int]] = None) -> FrameBatch:
+    """
+    Fetches frames from a prepare_video_for_analysis workspace in one call:
+    by relative path (e.g. "segment_3/seq_2.jpg") and/or whole segments by id.
+    Returns base64 JPEGs with their sha256 (capped at MCP_INLINE_MAX_MB).
+    """
+    workspace = _mcp_workspace(workspace_id)
+    return await asyncio.to_thread(_select_frames, workspace, paths, segments)
+
+@mcp.resource("frames://{workspace_id}/manifest", mime_type="application/json")
+def frames_manifest(workspace_id: str) -> str:
+    """Segment/frame listing (timing, paths, dimensions, sha256) of an extraction workspace."""
+    return json.dumps(_load_manifest(_mcp_workspace(workspace_id)))
+
+@mcp.resource("frames://{workspace_id}/{segment}/{name}", mime_type="image/jpeg")
+def frame_resource(workspace_id: str, segment: str, name: str) -> bytes:
+    """One extracted frame, e.g. frames://<workspace_id>/segment_3/seq_2.jpg"""
+    workspace = _mcp_workspace(workspace_id)
+    path = f"{segment}/{name}"
+    if path not in {frame["path"] for seg in _load_manifest(workspace)["segments"] for frame in seg["frames"]}:
+        raise ValueError(f"Unknown frame: {path}")
+    with open(os.path.join(workspace.root, path), "rb") as f:
+        return f.read()
 
-# --- TOOL 2: PDF Generation ---
 @mcp.tool()
-def generate_branded_pdf(input_path: str, output_path: str) -> str:
+def release_workspace(workspace_id: str) -> ReleaseResult:
     """
-    Converts a Markdown analysis into a PDF.
+    Deletes a workspace returned by prepare_video_for_analysis once the
+    client is done with its frames (otherwise it expires after the TTL).
+    released=False while an extraction is still writing into it.
+    """
+    _mcp_workspace(workspace_id)
+    released = get_workspace_manager().delete(workspace_id, force=False) is not None
+    return ReleaseResult(workspace_id=workspace_id, released=released)
+
+# --- TOOL 2: Search Past Analyses ---
+@mcp.tool()
+async def search_analyses(query: str = "", report_type: Optional[str] = None, stroke_type: Optional[str] = None,
+                          flaw: Optional[str] = None, player_email: Optional[str] = None,
+                          limit: int = 20, offset: int = 0) -> SearchResult:
+    """
+    Full-text search over saved analyses (report text and confidence claims),
+    e.g. query='late "unit turn"', stroke_type='Backhand'. Words are AND-ed,
+    quoted phrases match exactly, a trailing * matches prefixes. Filters are
+    exact facet values; the result lists the available facet values with counts.
+    """
+    filters = {"report_type": report_type, "stroke_type": stroke_type, "flaw": flaw, "player_email": player_email}
+    result = await asyncio.to_thread(get_search_index().search, query, filters, max(1, min(limit, 100)), max(0, offset))
+    return SearchResult(**result)
+
+# --- TOOL 3: PDF Generation ---
+def _build_pdf_worker(input_path, output_path, page_queue):
+    """Pool worker: renders the PDF, pushing each laid-out page number to page_queue (None = finished)."""
+    try:
+        with open(input_path, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+        return build_pdf_from_markdown(md_content, output_path, on_page=page_queue.put)
+    finally:
+        page_queue.put(None)
+
+@mcp.tool()
+async def generate_branded_pdf(input_path: str, output_path: str, ctx: Context = None) -> PdfResult:
+    """
+    Converts a Markdown analysis into a PDF. Reports progress per page.
+    Returns the output path, page count, size and sha256 of the PDF.
     """
     base_dir = os.getcwd()
     full_input = os.path.join(base_dir, input_path)
     full_output = os.path.join(base_dir, output_path)
 
     if not os.path.exists(full_input):
-        return f"Error: Input file not found at {input_path}"
+        raise ToolError(f"Input file not found at {input_path}")
 
+    t_start = time.monotonic()
     try:
-        convert_md_to_pdf(full_input, full_output)
-        return f"Success: PDF generated at {output_path}"
+        async with _tool_slots:
+            loop = asyncio.get_running_loop()
+            page_queue = get_progress_manager().Queue()
+            job = loop.run_in_executor(get_process_pool(), _build_pdf_worker, full_input, full_output, page_queue)
+            while not job.done():
+                try:
+                    page = await asyncio.to_thread(page_queue.get, True, 0.5)
+                except queue.Empty:
+                    continue  # Re-check the job: a crashed worker never sends the end marker
+                if page is None:
+                    break
+                await _report(ctx, page)
+            pages = await job
     except Exception as e:
-        return f"Error: {str(e)}"
+        raise ToolError(f"PDF generation failed: {e}") from e
+
+    with open(full_output, "rb") as f:
+        data = f.read()
+    return PdfResult(status="success", output_path=output_path, pages=pages, bytes=len(data),
+                     sha256=hashlib.sha256(data).hexdigest(), elapsed_sec=round(time.monotonic() - t_start, 3))
 
 if __name__ == "__main__":
-    mcp.run()
\ No newline at end of file
+    mcp.run()
@@ -1,11 +1,14 @@
 import os
-import re
+from functools import lru_cache
+from xml.sax.saxutils import escape
 from reportlab.lib.pagesizes import letter
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageTemplate, Frame
 from reportlab.lib import colors
 from reportlab.lib.units import inch
 from datetime import datetime
+from tools.markdown_layout import BlockRenderer, INLINE_BOLD, INLINE_ITALIC, clean_for_pdf, parse_markdown
+from tools.tracing import span
 
 # --- Configuration: Brand Assets ---
 BRAND_COLOR = "#2C3E50"  # Deep Navy
@@ -16,13 +19,9 @@ def clean_text(text):
     Removes emojis and unsupported characters from text to prevent PDF errors.
     """
     if not text: return ""
-    
-    # 1. Encode to ASCII, ignoring errors (strips emojis), then decode back
-    clean = text.encode('ascii', 'ignore').decode('ascii')
-    
-    # 2. Strip extra whitespace
-    return clean.strip()
+    return clean_for_pdf(text).strip()
 
+@lru_cache(maxsize=1)
 def create_branded_styles():
     """Defines the custom paragraph styles for the report."""
     styles = getSampleStyleSheet()
@@ -82,55 +81,51 @@ def create_branded_styles():
 
     return styles
 
-def parse_markdown_to_flowables(md_content, styles):
-    """
-    Parses Markdown text line-by-line into ReportLab Flowables.
-    """
-    story = []
-    lines = md_content.split('\n')
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # CLEAN THE LINE FIRST
-        line = clean_text(line)
-        
-        # -- 1. Inline Formatting (Bold/Italic) --
-        # Convert **text** to <b>text</b> for ReportLab
-        line = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', line)
-        # Convert *text* to <i>text</i>
-        line = re.sub(r'\*(.*?)\*', r'<i>\1</i>', line)
-
-        # -- 2. Block Element Detection --
-        if line.startswith('# '):
+def to_reportlab_markup(text):
+    """Escapes XML and converts **bold** / *italic* into ReportLab <b>/<i> tags."""
+    text = escape(text)
+    text = INLINE_BOLD.sub(r'<b>\1</b>', text)
+    return INLINE_ITALIC.sub(r'<i>\1</i>', text)
+
+class FlowableRenderer(BlockRenderer):
+    """Turns the shared markdown blocks into ReportLab Flowables (MCP path)."""
+    def __init__(self, styles):
+        self.styles = styles
+        self.story = []
+
+    def render_heading(self, block):
+        text = to_reportlab_markup(block.text)
+        if block.level == 1:
             # H1 Title
-            title_text = line[2:].strip()
-            story.append(Paragraph(title_text, styles['BrandTitle']))
-            story.append(Spacer(1, 12))
-
-        elif line.startswith('## '):
-            # H2 Heading
-            heading_text = line[3:].strip()
-            story.append(Spacer(1, 12))
-            story.append(Paragraph(heading_text, styles['BrandHeading']))
-
-        elif line.startswith('* ') or line.startswith('- '):
-            # Bullet list
-            bullet_text = f"• {line[2:].strip()}"
-            story.append(Paragraph(bullet_text, styles['BrandBullet']))
-
-        elif line.startswith('> '):
-            # Blockquote
-            quote_text = line[2:].strip()
-            story.append(Paragraph(quote_text, styles['BrandQuote']))
-            
+            self.story.append(Paragraph(text, self.styles['BrandTitle']))
+            self.story.append(Spacer(1, 12))
         else:
-            # Standard Paragraph
-            story.append(Paragraph(line, styles['BrandNormal']))
+            # H2+ Heading
+            self.story.append(Spacer(1, 12))
+            self.story.append(Paragraph(text, self.styles['BrandHeading']))
+
+    def render_label(self, block):
+        self.story.append(Paragraph(f"<b>{to_reportlab_markup(block.text)}</b>", self.styles['BrandNormal']))
+
+    def render_bullet(self, block):
+        self.story.append(Paragraph(f"• {to_reportlab_markup(block.text)}", self.styles['BrandBullet']))
+
+    def render_quote(self, block):
+        self.story.append(Paragraph(to_reportlab_markup(block.text), self.styles['BrandQuote']))
+
+    def render_rule(self, block):
+        self.story.append(Spacer(1, 12))
 
-    return story
+    def render_paragraph(self, block):
+        self.story.append(Paragraph(to_reportlab_markup(block.text), self.styles['BrandNormal']))
+
+def parse_markdown_to_flowables(md_content, styles):
+    """
+    Renders the shared markdown blocks (see tools/markdown_layout.py) into ReportLab Flowables.
+    """
+    renderer = FlowableRenderer(styles)
+    renderer.render(parse_markdown(md_content))
+    return renderer.story
 
 def add_header_footer(canvas, doc):
     """
@@ -163,19 +158,13 @@ def add_header_footer(canvas, doc):
     
     canvas.restoreState()
 
-def convert_md_to_pdf(input_md_path, output_pdf_path):
+def build_pdf_from_markdown(md_content, output_pdf_path, on_page=None):
     """
-    Main entry point to convert MD file to PDF.
+    Renders markdown text straight to a PDF file and returns the page count.
+    Raises on failure (used by convert_md_to_pdf, batch_pdf.py and the MCP server).
+    on_page: optional callback receiving each page number as it is laid out.
     """
-    if not os.path.exists(input_md_path):
-        print(f"Error: File not found at {input_md_path}")
-        return
-
-    # 1. Read Markdown
-    with open(input_md_path, 'r', encoding='utf-8') as f:
-        md_content = f.read()
-
-    # 2. Setup Document
+    # 1. Setup Document
     doc = SimpleDocTemplate(
         output_pdf_path, 
         pagesize=letter,
@@ -183,20 +172,44 @@ def convert_md_to_pdf(input_md_path, output_pdf_path):
         topMargin=1.5*inch, bottomMargin=1*inch # Extra top margin for Header
     )
 
-    # 3. Create Styles & Content
+    # 2. Create Styles & Content
     styles = create_branded_styles()
     story = parse_markdown_to_flowables(md_content, styles)
 
-    # 4. Build with Header/Footer Callback
+    # 3. Build with Header/Footer Callback
+    def decorate_page(canvas, doc):
+        add_header_footer(canvas, doc)
+        if on_page:
+            on_page(doc.page)
+
+    with span("pdf.build", engine="reportlab", markdown_chars=len(md_content)) as pdf_span:
+        doc.build(story, onFirstPage=decorate_page, onLaterPages=decorate_page)
+        pdf_span.set(pages=doc.page, bytes=os.path.getsize(output_pdf_path))
+    return doc.page
+
+def convert_md_to_pdf(input_md_path, output_pdf_path):
+    """
+    Main entry point to convert MD file to PDF.
+    """
+    if not os.path.exists(input_md_path):
+        print(f"Error: File not found at {input_md_path}")
+        return
+
+    # 1. Read Markdown
+    with open(input_md_path, 'r', encoding='utf-8') as f:
+        md_content = f.read()
+
+    # 2. Build
     print(f"Generating PDF from: {input_md_path}")
     try:
-        doc.build(story, onFirstPage=add_header_footer, onLaterPages=add_header_footer)
+        build_pdf_from_markdown(md_content, output_pdf_path)
         print(f"Success! PDF saved to: {output_pdf_path}")
     except Exception as e:
         print(f"Error building PDF: {e}")
 
 # --- Execution Block ---
 if __name__ == "__main__":
+    # Single-file smoke test. For whole folders / DB exports use: python batch_pdf.py analyses/ --out reports/
     # Test file paths
     INPUT_FILE = "analyses/report_backhand_2025_12_21.md"
     OUTPUT_FILE = "reports/final_backhand_report.pdf"
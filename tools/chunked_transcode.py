@@ -0,0 +1,154 @@
+# tools/chunked_transcode.py
+"""
+Chunked parallel transcoding for long uploads.
+
+libx264 at `veryfast` stops scaling well past a few threads, so long videos are:
+  1. split with the segment muxer (stream copy: cuts land on keyframes),
+  2. encoded chunk by chunk in parallel ffmpeg processes (admitted by the governor),
+  3. joined with the concat demuxer (stream copy), muxing the audio once from
+     the source so there are no AAC priming gaps at the chunk boundaries.
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import imageio_ffmpeg
+
+from tools.encode_profiles import profile_ffmpeg_args
+from tools.ffmpeg_governor import governor
+from tools.ffmpeg_progress import ProgressParser, ProgressUpdate, with_progress_pipe
+from tools.workspace import get_workspace_manager
+
+FFMPEG_BINARY = imageio_ffmpeg.get_ffmpeg_exe()
+
+CHUNK_MIN_SECONDS = float(os.environ.get("CHUNK_MIN_SECONDS", 120))  # Shorter uploads use one process
+CHUNK_SECONDS = float(os.environ.get("CHUNK_SECONDS", 30))           # Target chunk length (cut at the next keyframe)
+
+def should_chunk(duration, min_seconds=None):
+    """Chunking only pays off for long videos and when several jobs may run at once."""
+    return bool(duration) and duration >= (min_seconds or CHUNK_MIN_SECONDS) and governor.max_jobs > 1
+
+def _run(cmd, label, job_class, on_line=None):
+    if on_line is None:
+        result = governor.run(cmd, job_class=job_class, text=True)
+    else:
+        result = governor.stream(with_progress_pipe(cmd), on_line, job_class=job_class)
+    if result.returncode != 0:
+        error_tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"FFmpeg {label} failed: {error_tail}")
+    return result
+
+def split_at_keyframes(input_path, work_dir, chunk_seconds=None, job_class="interactive"):
+    """Stream-copies the first video stream into ~chunk_seconds MP4 pieces; returns their paths in order."""
+    chunk_seconds = chunk_seconds or CHUNK_SECONDS
+    list_path = os.path.join(work_dir, "segments.txt")
+    cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-y", "-i", input_path,
+        "-map", "0:v:0", "-c", "copy",
+        "-f", "segment", "-segment_time", f"{chunk_seconds:.3f}", "-reset_timestamps", "1",
+        "-segment_format", "mp4",          # MP4 keeps the display-matrix rotation flag
+        "-segment_list", list_path, "-segment_list_type", "flat",
+        os.path.join(work_dir, "src_%04d.mp4"),
+    ]
+    _run(cmd, "chunk split", job_class)
+    with open(list_path, encoding="utf-8") as f:
+        return [os.path.join(work_dir, line.strip()) for line in f if line.strip()]
+
+class _ChunkProgress:
+    """
+    Merges per-chunk progress into one ProgressUpdate stream for the whole video.
+    Encoder threads only queue updates; `pump()` delivers them to on_progress on
+    the calling thread (Streamlit elements can't be updated from other threads).
+    """
+
+    def __init__(self, duration, n_chunks, on_progress):
+        self.duration = duration
+        self.on_progress = on_progress
+        self.out_times = [0.0] * n_chunks
+        self.frames = [0] * n_chunks
+        self.updates = queue.Queue()
+        self._lock = threading.Lock()
+        self._t_start = time.monotonic()
+
+    def parser_for(self, index):
+        def update(chunk_update):
+            with self._lock:
+                self.out_times[index] = chunk_update.out_time or self.out_times[index]
+                self.frames[index] = chunk_update.frame
+                done_time = sum(self.out_times)
+                frames = sum(self.frames)
+                wall = max(time.monotonic() - self._t_start, 1e-6)
+                speed = done_time / wall
+                percent = min(done_time / self.duration, 1.0) if self.duration else None
+                eta = max(self.duration - done_time, 0.0) / speed if self.duration and speed else None
+                merged = ProgressUpdate(frames, frames / wall, speed, done_time, self.duration, percent, eta, False)
+            self.updates.put(merged)
+        return ProgressParser(None, update).feed
+
+    def pump(self, futures, interval=0.25):
+        """Waits for `futures`, forwarding the latest merged update every `interval` seconds."""
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, timeout=interval, return_when=FIRST_EXCEPTION)
+            if any(f.exception() for f in done):
+                return  # The caller's result() re-raises it
+            self._deliver()
+        self._deliver()
+
+    def _deliver(self):
+        latest = None
+        while True:
+            try:
+                latest = self.updates.get_nowait()
+            except queue.Empty:
+                break
+        if latest is not None and self.on_progress:
+            self.on_progress(latest)
+
+def transcode_chunked(input_path, output_path, vf, profile, duration=None, on_progress=None,
+                      chunk_seconds=None, workers=None, job_class="interactive"):
+    """
+    Same output as a single `ffmpeg -i input -vf vf <profile args> output` run,
+    encoded in parallel chunks. Raises RuntimeError on failure.
+    Returns the number of chunks.
+    """
+    with get_workspace_manager().create("chunks") as work:
+        work_dir = work.root
+        sources = split_at_keyframes(input_path, work_dir, chunk_seconds, job_class)
+        progress = _ChunkProgress(duration, len(sources), on_progress)
+        video_args = profile_ffmpeg_args(profile._replace(audio_kbps=None))  # Audio is muxed once at the end
+
+        def encode(index):
+            chunk_path = os.path.join(work_dir, f"enc_{index:04d}.mkv")
+            cmd = [FFMPEG_BINARY, "-hide_banner", "-y", "-i", sources[index], "-vf", vf,
+                   "-metadata:s:v:0", "rotate=0"] + video_args + [chunk_path]
+            _run(cmd, f"chunk {index + 1}/{len(sources)}", job_class, progress.parser_for(index))
+            return chunk_path
+
+        with ThreadPoolExecutor(max_workers=workers or governor.max_jobs) as pool:
+            futures = [pool.submit(encode, index) for index in range(len(sources))]
+            progress.pump(futures)
+            for future in futures:
+                if not future.done(): future.cancel()  # A chunk failed: don't start the rest
+            chunks = [future.result() for future in futures]
+
+        list_path = os.path.join(work_dir, "chunks.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for chunk_path in chunks:
+                f.write(f"file '{chunk_path}'\n")
+
+        audio_args = ["-c:a", "aac", "-b:a", f"{profile.audio_kbps}k"] if profile.audio_kbps else ["-an"]
+        cmd = [
+            FFMPEG_BINARY, "-hide_banner", "-y",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-i", input_path,
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c:v", "copy",
+        ] + audio_args + ["-movflags", "+faststart", output_path]
+        _run(cmd, "chunk concat", job_class)
+
+        if on_progress:
+            on_progress(ProgressUpdate(sum(progress.frames), 0.0, None, duration, duration, 1.0 if duration else None, 0.0, True))
+        return len(chunks)
@@ -0,0 +1,236 @@
+# tools/clip_cache.py
+"""
+Cache for rendered highlight clips.
+
+A clip is identified by (source file identity, start, end, render profile),
+where the identity is the source's path, size and mtime, so keys are computed
+without reading the video. Repeated button clicks and reruns reuse the same
+file instead of re-encoding.
+Clips can be rendered speculatively in a background thread as soon as the
+shot windows are known, and the cache directory is size-capped (LRU by mtime).
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from tools.tracing import in_current_trace, span
+from tools.video_editor import create_viral_clip
+from tools.workspace import get_workspace_manager
+
+CLIP_CACHE_DIR = os.environ.get("CLIP_CACHE_DIR", os.path.join(tempfile.gettempdir(), "courtlens_clips"))
+CLIP_CACHE_MAX_MB = int(os.environ.get("CLIP_CACHE_MAX_MB", "1024"))
+
+# Render profiles: name -> extra kwargs for create_viral_clip.
+# The profile name is part of the cache key, so changing what a profile means
+# requires a new name (or clearing the cache).
+RENDER_PROFILES = {
+    "viral": {},
+    "viral-track": {"crop_mode": "track"},
+}
+
+# --- KEYS ---
+def video_identity(video_path):
+    """(absolute path, size, mtime_ns): changes whenever the file is rewritten, costs one stat()."""
+    st = os.stat(video_path)
+    return f"{os.path.abspath(video_path)}|{st.st_size}|{st.st_mtime_ns}"
+
+def clip_key(video_path, start_time, end_time, profile="viral"):
+    raw = f"{video_identity(video_path)}|{float(start_time):.3f}|{float(end_time):.3f}|{profile}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+# --- CACHE ---
+class ClipCache:
+    def __init__(self, cache_dir=CLIP_CACHE_DIR, max_bytes=CLIP_CACHE_MAX_MB * 1024 * 1024, workers=1):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="clip-prerender")
+        self._inflight = {}   # key -> shared Future handed to every caller until the clip is rendered
+        self._sources = {}    # key -> workspace held for a queued pre-render
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def path_for(self, key):
+        return os.path.join(self.cache_dir, f"{key}.mp4")
+
+    def lookup(self, key):
+        """Returns the cached clip path (and marks it recently used), or None."""
+        path = self.path_for(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def _cached(self, key):
+        """A done Future for a cached clip (counted as a hit), or None. Call with the lock held."""
+        path = self.lookup(key)
+        if not path:
+            return None
+        self.hits += 1
+        future = Future()
+        future.set_result(path)
+        return future
+
+    @staticmethod
+    def _claim(future):
+        """True for the first caller to start rendering `future` (the queued job or get()). Call with the lock held."""
+        return not future.running() and not future.done() and future.set_running_or_notify_cancel()
+
+    def prefetch(self, video_path, start_time, end_time, profile="viral", job_class="background"):
+        """
+        Starts rendering in the background (no-op if cached or already queued).
+        Returns a Future resolving to the clip path. Pre-renders queue behind
+        interactive ffmpeg jobs (see tools/ffmpeg_governor.py). The source's
+        workspace is held from the moment the job is queued.
+        """
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"Unknown render profile: {profile}")
+        key = clip_key(video_path, start_time, end_time, profile)
+
+        with self._lock:
+            future = self._inflight.get(key) or self._cached(key)
+            if future is not None:
+                return future
+            self.misses += 1
+            # Pin the source's workspace now: the session may move on to a new upload before the job starts
+            ws = get_workspace_manager().find(video_path)
+            if ws: ws.retain()
+            future = Future()
+            self._inflight[key] = future
+            self._sources[key] = ws
+            # Bound to the caller's trace: the render span shows up under the request that queued it
+            self._executor.submit(in_current_trace(self._prefetch_job), future, key, video_path, start_time, end_time, profile, job_class)
+        return future
+
+    def _prefetch_job(self, future, key, video_path, start_time, end_time, profile, job_class):
+        with self._lock:
+            if not self._claim(future):
+                if future.cancelled():
+                    ws = self._sources.pop(key, None)
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+                    if ws: ws.release()
+                return  # Otherwise get() took it over and renders it
+            ws = self._sources.pop(key, None)
+        self._resolve(future, key, video_path, start_time, end_time, profile, job_class, ws)
+
+    def _resolve(self, future, key, video_path, start_time, end_time, profile, job_class, ws):
+        """Renders into the cache and settles the shared future. Returns True on success."""
+        try:
+            future.set_result(self._render(key, video_path, start_time, end_time, profile, job_class, ws))
+            return True
+        except Exception as e:
+            future.set_exception(e)
+            return False
+
+    def get(self, video_path, start_time, end_time, profile="viral", timeout=None):
+        """
+        Blocks until the clip is available and returns its path. A user is
+        waiting, so a missing clip renders on the calling thread at interactive
+        priority; a pre-render still queued at background priority is taken
+        over (with its workspace hold) instead of waited for, and resolves the
+        same future every other caller is holding.
+        """
+        if profile not in RENDER_PROFILES:
+            raise ValueError(f"Unknown render profile: {profile}")
+        key = clip_key(video_path, start_time, end_time, profile)
+
+        with span("clip.get", profile=profile, start_s=start_time, end_s=end_time) as clip_span:
+            owner = promoted = False
+            ws = None
+            with self._lock:
+                future = self._inflight.get(key)
+                if future is not None and future.cancelled():
+                    future = None  # A caller cancelled the pre-render: its queued job just drops its hold
+                if future is not None:
+                    if self._claim(future):
+                        ws = self._sources.pop(key, None)  # Never started: its hold passes to this render
+                        owner = promoted = True
+                else:
+                    future = self._cached(key)
+                    if future is None:
+                        self.misses += 1
+                        ws = get_workspace_manager().find(video_path)
+                        if ws: ws.retain()
+                        future = Future()
+                        future.set_running_or_notify_cancel()
+                        self._inflight[key] = future
+                        owner = True
+            clip_span.set(cache_hit=future.done(), promoted=promoted)
+
+            if owner:
+                self._resolve(future, key, video_path, start_time, end_time, profile, "interactive", ws)
+            return future.result(timeout=timeout)
+
+    def _render(self, key, video_path, start_time, end_time, profile, job_class="background", ws=None):
+        """Renders one clip into the cache; releases `ws` (the source's held workspace) when done."""
+        final_path = self.path_for(key)
+        # Dot-prefixed temp name: invisible to eviction, renamed atomically when complete
+        tmp_path = os.path.join(self.cache_dir, f".{key}.{threading.get_ident()}.tmp.mp4")
+        try:
+            with span("clip.render", profile=profile, job_class=job_class) as render_span:
+                create_viral_clip(video_path, start_time, end_time, output_path=tmp_path, job_class=job_class, **RENDER_PROFILES[profile])
+                render_span.set(bytes=os.path.getsize(tmp_path))
+            os.replace(tmp_path, final_path)
+        finally:
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            if ws: ws.release()
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._sources.pop(key, None)
+        self.evict(keep=final_path)
+        return final_path
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if name.startswith(".") or not name.endswith(".mp4"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def evict(self, keep=None):
+        """Deletes least-recently-used clips until the cache fits in max_bytes (never `keep`)."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        entries = self._entries()
+        with self._lock:
+            inflight = len(self._inflight)
+        return {
+            "clips": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+            "inflight": inflight,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+@lru_cache(maxsize=1)
+def get_clip_cache():
+    """Process-wide cache shared by every Streamlit session."""
+    return ClipCache()
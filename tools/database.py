@@ -1,6 +1,29 @@
 import os
+import time
+import threading
 import streamlit as st
-from supabase import create_client
+from functools import lru_cache
+from tools.player_progress import analysis_delta, build_progress, merge_progress, summarize_progress
+from tools.search_index import get_search_index
+from tools.storage import ANALYSES_TABLE, SQLiteStore, SupabaseStore
+from tools.tracing import current_span, traced
+from tools.write_behind import WriteBehindQueue
+
+try:
+    from supabase import create_client
+except ImportError:  # Offline / single-node installs can run on the SQLite store alone
+    create_client = None
+
+# "supabase", "sqlite", or "auto" (Supabase when credentials are set, else the local SQLite file)
+ANALYSIS_STORE = os.environ.get("ANALYSIS_STORE", "auto").lower()
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", 10))
+HISTORY_CACHE_TTL_SEC = float(os.environ.get("HISTORY_CACHE_TTL_SEC", 30))
+
+def _secret(name):
+    try:
+        return st.secrets.get(name)
+    except Exception:  # No secrets.toml (local / offline runs)
+        return None
 
 # Initialize Client
 @st.cache_resource
@@ -9,24 +32,68 @@ def init_supabase():
     key = os.environ.get("SUPABASE_KEY")
     
     # Fallback for Streamlit Cloud Secrets
-    if not url: url = st.secrets.get("SUPABASE_URL")
-    if not key: key = st.secrets.get("SUPABASE_KEY")
+    if not url: url = _secret("SUPABASE_URL")
+    if not key: key = _secret("SUPABASE_KEY")
     
-    if not url or not key:
+    if not url or not key or create_client is None:
         return None
     
     return create_client(url, key)
 
-def save_analysis_to_db(email, player_name, video_name, analysis_text, json_data, report_type):
-    """Saves the analysis result to the cloud."""
-    db = init_supabase()
-    if not db: return False
+@lru_cache(maxsize=1)
+def get_store():
+    """The analysis store (tools/storage.py) picked by ANALYSIS_STORE; None if Supabase is forced but not configured."""
+    if ANALYSIS_STORE in ("supabase", "auto"):
+        db = init_supabase()
+        if db:
+            return SupabaseStore(db)
+        if ANALYSIS_STORE == "supabase":
+            return None
+    return SQLiteStore()
+
+@lru_cache(maxsize=1)
+def get_write_queue():
+    """
+    Write-behind queue in front of a remote store (tools/write_behind.py), with
+    its flusher running. Creating it drains rows journaled by a previous run.
+    None for local stores (they're written directly) or without a store.
+    """
+    store = get_store()
+    if not store or not store.write_behind:
+        return None
+    queue = WriteBehindQueue(
+        sink=lambda table, rows: store.insert(rows),
+        on_flush=lambda table, rows: _after_insert(rows),
+    )
+    queue.start()
+    return queue
+
+def _after_insert(rows):
+    """Folds freshly stored analyses into the player aggregates and search index, and drops stale cached pages."""
+    for row in rows:
+        _apply_progress(row)
+        try:
+            get_search_index().add(row)
+        except Exception as e:
+            print(f"❌ Search Index Error: {e}")
+        invalidate_history(row.get("player_email"))
+
+@traced("db.save")
+def save_analysis_to_db(email, player_name, video_name, analysis_text, json_data, report_type, stroke_type=None, player_level=None):
+    """
+    Saves the analysis result. With Supabase it returns once the row is in the
+    local journal; the insert happens in the background (batched, retried on errors).
+    """
+    store = get_store()
+    if not store: return False
     
     try:
         # 1. Inject Metadata into the JSON blob
         # This allows us to save extra info without changing the database columns
         if json_data is None: json_data = {}
         json_data["report_type"] = report_type
+        if stroke_type: json_data["stroke_type"] = stroke_type
+        if player_level: json_data["player_level"] = player_level  # Declared level (batch PDF re-exports print it)
 
         # 2. Calculate Score
         avg_confidence = 0.0
@@ -44,24 +111,123 @@ def save_analysis_to_db(email, player_name, video_name, analysis_text, json_data
             "confidence_score": avg_confidence
         }
         
-        db.table("tennis_analyses").insert(data).execute()
+        queue = get_write_queue()
+        current_span().set(store=store.name, queued=bool(queue), text_chars=len(analysis_text or ""))
+        if queue:
+            queue.enqueue(ANALYSES_TABLE, data)
+        else:
+            store.insert([data])
+            _after_insert([data])
+        invalidate_history(email)
         return True
     except Exception as e:
         print(f"❌ DB Save Error: {e}")
         return False
 
-def fetch_history(email):
-    """Gets past analyses for a specific user."""
-    db = init_supabase()
-    if not db: return []
-    
+# --- HISTORY ---
+# Two tiers: a light, cached listing (fetch_history_page) and the full report,
+# loaded only when the user opens it (fetch_analysis).
+_history_cache = {}          # (email, cursor, limit) -> (expires_at, page); (email, "progress", None) -> summary
+_history_lock = threading.Lock()
+
+def invalidate_history(email):
+    """Drops the cached listing pages of one player (after a save or a flush)."""
+    with _history_lock:
+        for key in [k for k in _history_cache if k[0] == email]:
+            del _history_cache[key]
+
+def fetch_history_page(email, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of a player's history, newest first: id, created_at, video_name,
+    confidence_score and report_type only. Pass the returned `next_cursor` to
+    get the next page (None = last page). Pages are cached for
+    HISTORY_CACHE_TTL_SEC; the first page also lists saves still waiting in the
+    write queue (those carry their full analysis_text).
+    """
+    store = get_store()
+    if not store: return {"items": [], "next_cursor": None}
+
+    key = (email, cursor, limit)
+    with _history_lock:
+        hit = _history_cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        page = hit[1]
+    else:
+        try:
+            page = store.list_history(email, cursor, limit)
+        except Exception as e:
+            print(f"❌ DB Fetch Error: {e}")
+            page = {"items": [], "next_cursor": None}
+        else:
+            with _history_lock:
+                _history_cache[key] = (time.monotonic() + HISTORY_CACHE_TTL_SEC, page)
+
+    if cursor is None:
+        queue = get_write_queue()
+        pending = [
+            {**row, "report_type": (row.get("structured_data") or {}).get("report_type")}
+            for row in (queue.pending_rows(ANALYSES_TABLE) if queue else [])
+            if row.get("player_email") == email
+        ]
+        page = {**page, "items": pending[::-1] + page["items"]}
+    return page
+
+@lru_cache(maxsize=64)
+def _fetch_analysis_cached(row_id):
+    row = get_store().get_analysis(row_id)
+    if row is None:
+        raise LookupError(row_id)
+    return row
+
+def fetch_analysis(row_id):
+    """Full analysis_text and structured_data of one saved analysis (None if unavailable)."""
+    if not get_store(): return None
+    try:
+        return _fetch_analysis_cached(row_id)  # Saved analyses never change: safe to keep
+    except Exception as e:
+        print(f"❌ DB Fetch Error: {e}")
+        return None
+
+# --- PROGRESS ---
+# Per-player aggregates (tools/player_progress.py), updated once per stored analysis.
+def _apply_progress(row):
+    store = get_store()
+    email = row.get("player_email")
+    delta = analysis_delta(row)
+
+    def update(current):
+        if current is None:
+            # First aggregate for this player: backfill from their history (which already holds this row)
+            return build_progress(store.iter_analyses(email))
+        return merge_progress(current, delta)
+
+    try:
+        store.update_progress(email, update)
+    except Exception as e:
+        print(f"❌ Progress Update Error: {e}")
+
+def get_player_progress(email):
+    """
+    Trend data for one player: analyses count, NTRP timeline, confidence
+    timeline, flaws by frequency and mean confidence per stroke type.
+    Reads the precomputed aggregate (cached like history pages).
+    """
+    store = get_store()
+    if not store: return summarize_progress(None)
+
+    key = (email, "progress", None)
+    with _history_lock:
+        hit = _history_cache.get(key)
+    if hit and hit[0] > time.monotonic():
+        return hit[1]
     try:
-        response = db.table("tennis_analyses").select("*")\
-            .eq("player_email", email)\
-            .order("created_at", desc=True)\
-            .limit(10)\
-            .execute()
-        return response.data
+        progress = store.get_progress(email)
+        if progress is None:
+            progress = store.update_progress(email, lambda current: current or build_progress(store.iter_analyses(email)))
     except Exception as e:
         print(f"❌ DB Fetch Error: {e}")
-        return []
\ No newline at end of file
+        return summarize_progress(None)
+    summary = summarize_progress(progress)
+    with _history_lock:
+        _history_cache[key] = (time.monotonic() + HISTORY_CACHE_TTL_SEC, summary)
+    return summary
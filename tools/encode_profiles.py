@@ -0,0 +1,105 @@
+# tools/encode_profiles.py
+"""
+Adaptive encode profiles for upload normalization.
+
+The AI only needs enough pixels to see body position and ball contact, so long
+match clips are downscaled harder while short serve/stroke clips keep detail.
+A target upload size caps the bitrate, the frame rate is capped at 30 fps and
+audio is dropped unless the creator pack needs it for the social clips.
+"""
+import os
+import re
+import subprocess
+from collections import namedtuple
+
+import cv2
+import imageio_ffmpeg
+
+from tools.ffmpeg_governor import governor
+
+FFMPEG_BINARY = imageio_ffmpeg.get_ffmpeg_exe()
+
+UPLOAD_TARGET_MB = float(os.environ.get("UPLOAD_TARGET_MB", 25))
+ANALYSIS_FPS_CAP = 30
+MIN_BITS_PER_PIXEL = 0.04   # Below this (per pixel per frame) H.264 smears the racket/ball: drop a resolution tier
+AUDIO_BITRATE_KBPS = 128
+
+VideoInfo = namedtuple("VideoInfo", ["width", "height", "fps", "duration", "has_audio"])
+
+# short_side: target shorter edge | fps: frame rate cap (None = keep source) | crf/preset: x264 quality/speed
+# maxrate_kbps: video bitrate cap from the size budget (None = crf only) | audio_kbps: None = drop audio
+EncodeProfile = namedtuple("EncodeProfile", ["name", "short_side", "fps", "crf", "preset", "maxrate_kbps", "audio_kbps"])
+
+# (max duration in seconds, name, short side, crf, preset): first match wins
+DURATION_TIERS = [
+    (20, "detail", 1080, 23, "veryfast"),    # Single serve / stroke: keep detail
+    (90, "standard", 720, 26, "veryfast"),   # A few rallies
+    (None, "long", 540, 28, "veryfast"),     # Match footage: the model samples it sparsely anyway
+]
+RESOLUTION_LADDER = (1080, 720, 540, 360)
+
+def probe_video(video_path):
+    """Width, height, fps and duration (OpenCV) plus whether there is an audio stream (ffmpeg)."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 0.0
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT) or 0.0
+    finally:
+        cap.release()
+    duration = frames / fps if fps > 0 and frames > 0 else None
+    return VideoInfo(width, height, fps, duration, _has_audio(video_path))
+
+def _has_audio(video_path):
+    try:
+        result = governor.run([FFMPEG_BINARY, "-hide_banner", "-i", video_path], job_class="probe", text=True)
+    except subprocess.TimeoutExpired:
+        return True  # Unknown: let ffmpeg's `-map 0:a?` decide
+    return re.search(r"Stream #\S+.*: Audio:", result.stderr) is not None
+
+def select_profile(info, target_mb=UPLOAD_TARGET_MB, keep_audio=False):
+    """Picks resolution, fps cap, crf/preset and bitrate cap for an upload."""
+    duration = info.duration or 0
+    for max_duration, name, short_side, crf, preset in DURATION_TIERS:
+        if max_duration is None or duration <= max_duration:
+            break
+
+    # Never upscale, never raise the frame rate
+    source_short = min(info.width, info.height) or short_side
+    short_side = min(short_side, source_short)
+    fps = ANALYSIS_FPS_CAP if not info.fps or info.fps > ANALYSIS_FPS_CAP + 0.5 else None
+    audio_kbps = AUDIO_BITRATE_KBPS if keep_audio and info.has_audio else None
+
+    maxrate_kbps = None
+    if duration > 0 and target_mb:
+        budget_kbps = target_mb * 8000 / duration - (audio_kbps or 0)
+        aspect = max(info.width, info.height) / source_short if source_short else 16 / 9
+        # Step down the ladder until the budget gives enough bits per pixel
+        for rung in [short_side] + [r for r in RESOLUTION_LADDER if r < short_side]:
+            short_side = rung
+            if budget_kbps * 1000 / (rung * rung * aspect * (fps or info.fps)) >= MIN_BITS_PER_PIXEL:
+                break
+        maxrate_kbps = max(int(budget_kbps), 200)
+
+    return EncodeProfile(name, int(short_side) // 2 * 2, fps, crf, preset, maxrate_kbps, audio_kbps)
+
+def profile_ffmpeg_args(profile):
+    """Output options (everything except -vf) for a profile."""
+    args = ["-c:v", "libx264", "-preset", profile.preset, "-crf", str(profile.crf), "-pix_fmt", "yuv420p"]
+    if profile.maxrate_kbps:
+        # Capped CRF: quality-driven, but never above the size budget
+        args += ["-maxrate", f"{profile.maxrate_kbps}k", "-bufsize", f"{profile.maxrate_kbps * 2}k"]
+    if profile.audio_kbps:
+        args += ["-c:a", "aac", "-b:a", f"{profile.audio_kbps}k"]
+    else:
+        args += ["-an"]
+    return args
+
+def profile_filters(profile):
+    """Scale (shorter edge -> profile.short_side, orientation-aware) and fps cap filters."""
+    s = profile.short_side
+    filters = [f"scale='if(gt(iw,ih),-2,{s})':'if(gt(iw,ih),{s},-2)'"]
+    if profile.fps:
+        filters.append(f"fps={profile.fps}")
+    return filters
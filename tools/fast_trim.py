@@ -0,0 +1,143 @@
+# tools/fast_trim.py
+"""
+Keyframe-accurate fast trimming for short shot windows.
+
+A per-video keyframe index (one ffprobe pass, cached) lets us stream-copy the
+GOP-aligned interior of [start, end) and re-encode only the partial GOPs at
+the edges ("smart cut"). Parts are cut to Matroska and joined with the concat
+demuxer without another encode (it carries each part's H.264 parameter sets
+across the splice, so x264-encoded edges and copied source GOPs decode cleanly).
+"""
+import os
+from functools import lru_cache
+
+import cv2
+
+from tools.ffmpeg_governor import governor
+from tools.video_editor import FFMPEG_BINARY, _validate_clip_window, get_ffprobe_binary, run_ffmpeg
+from tools.workspace import get_workspace_manager
+
+KEYFRAME_EPSILON = 0.002  # Seconds: a cut this close to a keyframe is "on" the keyframe
+SMART_CUT_CODECS = ("avc1", "h264", "x264")
+
+# --- KEYFRAME INDEX ---
+def _probe_keyframes_ffprobe(ffprobe_binary, video_path):
+    cmd = [
+        ffprobe_binary, "-v", "error",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",          # Only decode keyframes: fast even on long files
+        "-show_frames",
+        "-show_entries", "frame=best_effort_timestamp_time",
+        "-of", "csv=p=0",
+        video_path,
+    ]
+    result = governor.run(cmd, job_class="probe", text=True)
+    times = []
+    for line in result.stdout.splitlines():
+        value = line.strip().strip(",")
+        if value and value != "N/A":
+            times.append(float(value))
+    return times
+
+def _probe_keyframes_ffmpeg(video_path):
+    """Fallback when ffprobe isn't installed (e.g. imageio-ffmpeg only ships ffmpeg)."""
+    cmd = [
+        FFMPEG_BINARY, "-hide_banner", "-nostats",
+        "-skip_frame", "nokey", "-i", video_path,
+        "-map", "0:v:0", "-vf", "showinfo", "-f", "null", "-",
+    ]
+    # Decodes every keyframe: an admitted job, not a quick probe
+    result = governor.run(cmd, job_class="interactive", text=True)
+    times = []
+    for line in result.stderr.splitlines():
+        if "Parsed_showinfo" in line and " pts_time:" in line:
+            times.append(float(line.split(" pts_time:")[1].split()[0]))
+    return times
+
+@lru_cache(maxsize=64)
+def _keyframe_index(video_path, size, mtime_ns):
+    ffprobe_binary = get_ffprobe_binary()
+    if ffprobe_binary:
+        times = _probe_keyframes_ffprobe(ffprobe_binary, video_path)
+    else:
+        times = _probe_keyframes_ffmpeg(video_path)
+    return tuple(sorted(set(times)))
+
+def get_keyframe_index(video_path):
+    """Sorted keyframe timestamps (seconds) of the first video stream, cached per file version."""
+    st = os.stat(video_path)
+    return _keyframe_index(os.path.abspath(video_path), st.st_size, st.st_mtime_ns)
+
+def plan_trim(keyframes, start, end):
+    """
+    Splits [start, end) into (kind, t0, t1) parts: "encode" for partial GOPs at
+    the edges, "copy" for the keyframe-aligned interior.
+    """
+    inner = [k for k in keyframes if start - KEYFRAME_EPSILON <= k <= end + KEYFRAME_EPSILON]
+    if len(inner) < 2:
+        # No complete GOP inside the window: nothing to copy
+        return [("encode", start, end)]
+
+    k_in, k_out = inner[0], inner[-1]
+    parts = []
+    if k_in - start > KEYFRAME_EPSILON:
+        parts.append(("encode", start, k_in))
+    parts.append(("copy", k_in, k_out))
+    if end - k_out > KEYFRAME_EPSILON:
+        parts.append(("encode", k_out, end))
+    return parts
+
+# --- TRIM ---
+def _is_smart_cut_codec(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+    codec = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).lower()
+    return codec in SMART_CUT_CODECS
+
+def _cut_part(video_path, kind, t0, t1, part_path):
+    cmd = [FFMPEG_BINARY, "-y", "-ss", f"{t0:.6f}", "-i", video_path, "-t", f"{t1 - t0:.6f}", "-map", "0:v:0", "-map", "0:a?"]
+    if kind == "copy":
+        cmd += ["-c", "copy"]
+    else:
+        cmd += ["-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p", "-c:a", "aac"]
+    cmd += ["-avoid_negative_ts", "make_zero", "-f", "matroska", part_path]
+    run_ffmpeg(cmd, [part_path], f"trim ({kind})")
+
+def fast_trim(video_path, start_time, end_time, output_path=None):
+    """
+    Raw (unbranded) export of [start, end) with minimal re-encoding.
+    Returns (output_path, parts) where parts is the executed plan.
+    """
+    start, end = _validate_clip_window(start_time, end_time)
+    manager = get_workspace_manager()
+    if output_path is None:
+        output_path = manager.create("trim", hold=False).path("trim.mp4")
+
+    if _is_smart_cut_codec(video_path):
+        parts = plan_trim(get_keyframe_index(video_path), start, end)
+    else:
+        # Source codec can't be spliced with x264 edges: re-encode the whole window
+        parts = [("encode", start, end)]
+
+    with manager.create("trimparts") as work:
+        part_paths = []
+        for i, (kind, t0, t1) in enumerate(parts):
+            part_path = work.path(f"part_{i}.mkv")
+            _cut_part(video_path, kind, t0, t1, part_path)
+            part_paths.append(part_path)
+
+        list_path = work.path("parts.txt")
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part_path in part_paths:
+                f.write(f"file '{part_path}'\n")
+
+        cmd = [
+            FFMPEG_BINARY, "-y", "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart",
+            output_path,
+        ]
+        run_ffmpeg(cmd, [output_path], "trim concat")
+    return output_path, parts
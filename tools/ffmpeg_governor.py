@@ -0,0 +1,196 @@
+# tools/ffmpeg_governor.py
+"""
+Process-wide resource governor for ffmpeg/ffprobe subprocesses.
+
+Every Streamlit session (and the background clip renderer) shares one
+admission queue: at most FFMPEG_MAX_JOBS encodes run at once, interactive
+jobs (upload normalization) are admitted before background ones (clip
+pre-rendering), each job gets a `-threads` cap, a timeout and a nice level,
+and queue depth / wait times are exposed through `metrics()`.
+"""
+import os
+import heapq
+import itertools
+import shutil
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+CPU_COUNT = os.cpu_count() or 1
+FFMPEG_MAX_JOBS = int(os.environ.get("FFMPEG_MAX_JOBS", max(1, CPU_COUNT // 2)))
+FFMPEG_THREADS = int(os.environ.get("FFMPEG_THREADS", max(1, CPU_COUNT // FFMPEG_MAX_JOBS)))
+
+# priority: lower is admitted first | nice: POSIX niceness | timeout: seconds
+# queued=False skips admission (cheap probes must never wait behind encodes)
+JOB_CLASSES = {
+    "interactive": {"priority": 0, "nice": 0, "timeout": 900, "queued": True},
+    "background": {"priority": 1, "nice": 10, "timeout": 1800, "queued": True},
+    "probe": {"priority": 0, "nice": 0, "timeout": 60, "queued": False},
+}
+
+_NICE_BINARY = shutil.which("nice") if os.name == "posix" else None
+
+# ffmpeg options that take no value (everything else consumes the next argument)
+_FLAG_OPTIONS = {"-y", "-n", "-hide_banner", "-nostdin", "-nostats", "-stats", "-shortest",
+                 "-an", "-vn", "-sn", "-dn", "-copyts", "-re"}
+
+def with_thread_limit(cmd, threads):
+    """
+    Caps ffmpeg threading: decoder threads for the first input, filter threads,
+    and encoder threads for every output (multi-output commands have one
+    encoder set each). No-op for non-ffmpeg commands.
+    """
+    if not threads or "ffmpeg" not in os.path.basename(cmd[0]) or "-threads" in cmd:
+        return list(cmd)
+    limited = [cmd[0], "-threads", str(threads), "-filter_threads", str(threads)]
+    args = iter(cmd[1:])
+    for arg in args:
+        if arg.startswith("-") and arg != "-":
+            limited.append(arg)
+            if arg not in _FLAG_OPTIONS:
+                limited.append(next(args, None))  # Option value (an input for -i)
+        else:
+            limited += ["-threads", str(threads), arg]  # Output (`ffmpeg -i file` probes have none)
+    return [a for a in limited if a is not None]
+
+class FFmpegGovernor:
+    def __init__(self, max_jobs=FFMPEG_MAX_JOBS, threads=FFMPEG_THREADS):
+        self.max_jobs = max_jobs
+        self.threads = threads
+        self._cond = threading.Condition()
+        self._waiting = []              # Heap of (priority, seq, job_class)
+        self._seq = itertools.count()
+        self._running = {name: 0 for name in JOB_CLASSES}
+        self._stats = {name: {"completed": 0, "failed": 0, "timeouts": 0, "wait_total": 0.0, "wait_max": 0.0, "run_total": 0.0}
+                       for name in JOB_CLASSES}
+
+    # --- ADMISSION ---
+    @contextmanager
+    def slot(self, job_class="interactive"):
+        """Holds one job slot for the duration of the block (also for non-subprocess work, e.g. MoviePy)."""
+        cfg = JOB_CLASSES[job_class]
+        t_queued = time.monotonic()
+        if cfg["queued"]:
+            with self._cond:
+                ticket = (cfg["priority"], next(self._seq), job_class)
+                heapq.heappush(self._waiting, ticket)
+                while self._waiting[0] is not ticket or self._admitted() >= self.max_jobs:
+                    self._cond.wait()
+                heapq.heappop(self._waiting)
+                self._running[job_class] += 1
+                self._cond.notify_all()  # The next ticket may now be at the head
+        else:
+            with self._cond:
+                self._running[job_class] += 1
+
+        waited = time.monotonic() - t_queued
+        t_start = time.monotonic()
+        ok = False
+        try:
+            yield waited
+            ok = True
+        finally:
+            with self._cond:
+                self._running[job_class] -= 1
+                stats = self._stats[job_class]
+                stats["completed" if ok else "failed"] += 1
+                stats["wait_total"] += waited
+                stats["wait_max"] = max(stats["wait_max"], waited)
+                stats["run_total"] += time.monotonic() - t_start
+                self._cond.notify_all()
+
+    def _admitted(self):
+        return sum(n for name, n in self._running.items() if JOB_CLASSES[name]["queued"])
+
+    # --- EXECUTION ---
+    def run(self, cmd, job_class="interactive", timeout=None, threads=None, **kwargs):
+        """
+        subprocess.run() under governance. Raises subprocess.TimeoutExpired
+        (after killing the process) if the job exceeds its timeout.
+        """
+        cfg = JOB_CLASSES[job_class]
+        cmd = with_thread_limit(cmd, threads or self.threads)
+        if cfg["nice"] and _NICE_BINARY:
+            cmd = [_NICE_BINARY, "-n", str(cfg["nice"])] + cmd
+        kwargs.setdefault("stdout", subprocess.PIPE)
+        kwargs.setdefault("stderr", subprocess.PIPE)
+
+        with self.slot(job_class):
+            try:
+                return subprocess.run(cmd, timeout=timeout or cfg["timeout"], **kwargs)
+            except subprocess.TimeoutExpired:
+                with self._cond:
+                    self._stats[job_class]["timeouts"] += 1
+                raise
+
+    def stream(self, cmd, on_line, job_class="interactive", timeout=None, threads=None):
+        """
+        Like run(), but hands each stdout line to on_line() as it arrives
+        (e.g. `-progress pipe:1` output). stderr is collected in the background
+        and returned on the CompletedProcess.
+        """
+        cfg = JOB_CLASSES[job_class]
+        cmd = with_thread_limit(cmd, threads or self.threads)
+        if cfg["nice"] and _NICE_BINARY:
+            cmd = [_NICE_BINARY, "-n", str(cfg["nice"])] + cmd
+        timeout = timeout or cfg["timeout"]
+
+        with self.slot(job_class):
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
+            stderr_chunks = []
+            drain = threading.Thread(target=lambda: stderr_chunks.append(proc.stderr.read()), daemon=True)
+            drain.start()
+            timed_out = threading.Event()
+
+            def _kill():
+                timed_out.set()
+                proc.kill()
+
+            killer = threading.Timer(timeout, _kill)  # Line reads block, so the deadline runs on a timer
+            killer.start()
+            try:
+                for line in proc.stdout:
+                    on_line(line)
+                proc.wait()
+            finally:
+                killer.cancel()
+                if proc.poll() is None:
+                    proc.kill()
+                    proc.wait()
+                drain.join()
+            stderr = "".join(stderr_chunks)
+            if timed_out.is_set():
+                with self._cond:
+                    self._stats[job_class]["timeouts"] += 1
+                raise subprocess.TimeoutExpired(cmd, timeout, stderr=stderr)
+            return subprocess.CompletedProcess(cmd, proc.returncode, None, stderr)
+
+    # --- METRICS ---
+    def metrics(self):
+        with self._cond:
+            queued = {name: 0 for name in JOB_CLASSES}
+            for _, _, job_class in self._waiting:
+                queued[job_class] += 1
+            per_class = {}
+            for name, stats in self._stats.items():
+                done = stats["completed"] + stats["failed"]
+                per_class[name] = {
+                    "running": self._running[name],
+                    "queued": queued[name],
+                    "completed": stats["completed"],
+                    "failed": stats["failed"],
+                    "timeouts": stats["timeouts"],
+                    "avg_wait_s": round(stats["wait_total"] / done, 3) if done else 0.0,
+                    "max_wait_s": round(stats["wait_max"], 3),
+                    "avg_run_s": round(stats["run_total"] / done, 3) if done else 0.0,
+                }
+            return {
+                "max_jobs": self.max_jobs,
+                "threads_per_job": self.threads,
+                "running": self._admitted(),
+                "queue_depth": len(self._waiting),
+                "classes": per_class,
+            }
+
+governor = FFmpegGovernor()
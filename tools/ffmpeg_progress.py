@@ -0,0 +1,100 @@
+# tools/ffmpeg_progress.py
+"""
+Incremental parser for ffmpeg's `-progress pipe:1` output, plus a JSONL
+performance log so encode throughput (x realtime) is observable per job.
+
+ffmpeg writes blocks of key=value lines, each terminated by
+`progress=continue` (or `progress=end` for the final block).
+"""
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import namedtuple
+
+PERF_LOG_PATH = os.environ.get("FFMPEG_PERF_LOG", os.path.join(tempfile.gettempdir(), "courtlens_ffmpeg_perf.jsonl"))
+
+# percent: 0..1 (None if the input duration is unknown) | eta: seconds (None if unknown)
+ProgressUpdate = namedtuple("ProgressUpdate", ["frame", "fps", "speed", "out_time", "duration", "percent", "eta", "done"])
+
+_perf_lock = threading.Lock()
+
+def _to_float(value):
+    try:
+        return float(value.rstrip("x"))
+    except (AttributeError, ValueError):
+        return None  # "N/A" before the first frame is out
+
+class ProgressParser:
+    """Feed it stdout lines; calls on_progress(ProgressUpdate) once per completed block."""
+
+    def __init__(self, duration=None, on_progress=None):
+        self.duration = duration if duration and duration > 0 else None
+        self.on_progress = on_progress
+        self.last = None
+        self._block = {}
+        self._t_start = time.monotonic()
+
+    def feed(self, line):
+        key, sep, value = line.strip().partition("=")
+        if not sep:
+            return None
+        if key != "progress":
+            self._block[key] = value
+            return None
+
+        update = self._build(self._block, done=(value == "end"))
+        self._block = {}
+        self.last = update
+        if self.on_progress:
+            self.on_progress(update)
+        return update
+
+    def _build(self, block, done):
+        out_us = _to_float(block.get("out_time_us") or block.get("out_time_ms"))
+        out_time = max(out_us / 1e6, 0.0) if out_us is not None else None
+        speed = _to_float(block.get("speed"))
+        if speed is None and out_time:
+            # Early blocks report speed=N/A: derive it from wall time
+            speed = out_time / max(time.monotonic() - self._t_start, 1e-6)
+
+        percent = eta = None
+        if self.duration and out_time is not None:
+            percent = 1.0 if done else min(out_time / self.duration, 1.0)
+            eta = 0.0 if done else (max(self.duration - out_time, 0.0) / speed if speed else None)
+        return ProgressUpdate(
+            frame=int(_to_float(block.get("frame")) or 0),
+            fps=_to_float(block.get("fps")) or 0.0,
+            speed=speed,
+            out_time=out_time,
+            duration=self.duration,
+            percent=percent,
+            eta=eta,
+            done=done,
+        )
+
+def with_progress_pipe(cmd):
+    """Inserts `-progress pipe:1 -nostats` right after the ffmpeg binary."""
+    if "-progress" in cmd:
+        return list(cmd)
+    return [cmd[0], "-progress", "pipe:1", "-nostats"] + list(cmd[1:])
+
+def log_perf(record, path=None):
+    """Appends one job record to the JSONL perf log (never raises)."""
+    path = path or PERF_LOG_PATH
+    record = dict(record, ts=time.strftime("%Y-%m-%dT%H:%M:%S"))
+    try:
+        with _perf_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"⚠️ Perf log write failed: {e}")
+
+def read_perf_log(path=None, limit=50):
+    """Most recent perf records, newest last."""
+    path = path or PERF_LOG_PATH
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = f.readlines()[-limit:]
+    return [json.loads(line) for line in lines if line.strip()]
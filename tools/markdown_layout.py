@@ -0,0 +1,143 @@
+# tools/markdown_layout.py
+"""
+Shared Markdown -> layout blocks parser.
+
+Both PDF pipelines (FPDF `create_pdf` for the Streamlit app and ReportLab
+`convert_md_to_pdf` for the MCP server) tokenize the report once into a flat
+tuple of Blocks, then walk it with their own BlockRenderer.
+"""
+import re
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, namedtuple
+
+# --- TEXT CLEANUP (Core PDF fonts are Latin-1 only) ---
+class _PdfCharMap(dict):
+    """
+    str.translate table for the core PDF fonts: typographic punctuation is mapped
+    to ASCII, any other non-ASCII char (emojis, accents) is dropped.
+    Unknown code points are resolved once and memoized, so cleanup is a single pass.
+    """
+    def __missing__(self, codepoint):
+        value = codepoint if codepoint < 0x80 else None
+        self[codepoint] = value
+        return value
+
+_PDF_CHAR_MAP = _PdfCharMap({
+    ord("–"): "-", ord("—"): "--", ord("“"): '"', ord("”"): '"',
+    ord("‘"): "'", ord("’"): "'", ord("…"): "...", ord("•"): "-"
+})
+
+def clean_for_pdf(text):
+    """Sanitizes text: Removes emojis, maps smart punctuation to ASCII (single pass)."""
+    return text.translate(_PDF_CHAR_MAP)
+
+# --- BLOCKS ---
+# kind:  "blank" | "heading" | "label" | "bullet" | "quote" | "rule" | "paragraph"
+# text:  cleaned line content (inline **bold** / *italic* markers are kept)
+# level: heading depth (1 for '#', 2 for '##', ...), 0 for everything else
+Block = namedtuple("Block", ["kind", "text", "level"])
+
+# Everything after these markers is machine metadata, never report content
+STOP_MARKERS = ("Shot Log", "JSON_DATA", "SEARCH_QUERY")
+
+INLINE_BOLD = re.compile(r'\*\*(.*?)\*\*')
+INLINE_ITALIC = re.compile(r'\*(.*?)\*')
+_HEADING = re.compile(r'^(#{1,6})\s*(.*)$')
+_RULE = re.compile(r'^(-{3,}|\*{3,}|_{3,})$')
+
+def strip_inline(text):
+    """Removes inline markdown emphasis (for renderers without rich text)."""
+    return text.replace('**', '')
+
+def _tokenize(text):
+    blocks = []
+    for raw_line in text.split('\n'):
+        line = clean_for_pdf(raw_line).strip()
+
+        # 🛑 FILTER: stop at the hidden metadata section
+        if any(marker in line for marker in STOP_MARKERS):
+            break
+
+        if not line:
+            blocks.append(Block("blank", "", 0))
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            blocks.append(Block("heading", heading.group(2).strip(), len(heading.group(1))))
+        elif _RULE.match(line):
+            blocks.append(Block("rule", "", 0))
+        elif line.startswith('* ') or line.startswith('- '):
+            blocks.append(Block("bullet", line[2:].strip(), 0))
+        elif line.startswith('> '):
+            blocks.append(Block("quote", line[2:].strip(), 0))
+        elif len(line) > 4 and line.startswith('**') and line.endswith('**'):
+            blocks.append(Block("label", line[2:-2].strip(), 0))
+        else:
+            blocks.append(Block("paragraph", line, 0))
+    return tuple(blocks)
+
+# --- CACHE (Keyed by content hash, bounded LRU) ---
+BLOCK_CACHE_SIZE = 256
+_block_cache = OrderedDict()
+_block_cache_lock = threading.Lock()
+
+def parse_markdown(text):
+    """Tokenizes markdown into an immutable tuple of Blocks (cached per text hash)."""
+    key = hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+    with _block_cache_lock:
+        blocks = _block_cache.get(key)
+        if blocks is not None:
+            _block_cache.move_to_end(key)
+            return blocks
+
+    blocks = _tokenize(text)
+
+    with _block_cache_lock:
+        _block_cache[key] = blocks
+        if len(_block_cache) > BLOCK_CACHE_SIZE:
+            _block_cache.popitem(last=False)
+    return blocks
+
+def clear_block_cache():
+    with _block_cache_lock:
+        _block_cache.clear()
+
+# --- RENDERERS ---
+class BlockRenderer(ABC):
+    """
+    Base class for layout backends. `render` dispatches each block to
+    `render_<kind>`; subclasses implement `render_paragraph` (the fallback
+    for every text block) and override the other kinds they care about.
+    """
+    def render(self, blocks):
+        for block in blocks:
+            getattr(self, "render_" + block.kind)(block)
+            self.after_block(block)
+
+    def after_block(self, block):
+        pass
+
+    def render_blank(self, block):
+        pass
+
+    def render_heading(self, block):
+        self.render_paragraph(block)
+
+    def render_label(self, block):
+        self.render_paragraph(block)
+
+    def render_bullet(self, block):
+        self.render_paragraph(block)
+
+    def render_quote(self, block):
+        self.render_paragraph(block)
+
+    def render_rule(self, block):
+        pass
+
+    @abstractmethod
+    def render_paragraph(self, block):
+        """Lays out one text block."""
@@ -0,0 +1,136 @@
+# tools/player_progress.py
+"""
+Per-player progress aggregates: observed NTRP over time, recurring flaws and
+confidence by stroke type.
+
+Each saved analysis is reduced once (at save time) to a small delta; the
+player's aggregate is the running merge of those deltas, stored as one row per
+player (see the stores in tools/storage.py). Trend views read that row only and
+never scan analysis text.
+
+Rows reach the aggregate at least once (write-behind retries can deliver a row
+again), so each delta carries the analysis' content key and the aggregate
+remembers the keys it has merged; a repeated delta is a no-op.
+"""
+import os
+import re
+import json
+import hashlib
+from datetime import datetime, timezone
+
+PROGRESS_TIMELINE_MAX = int(os.environ.get("PROGRESS_TIMELINE_MAX", 200))  # Points kept per player
+PROGRESS_APPLIED_MAX = int(os.environ.get("PROGRESS_APPLIED_MAX", 500))     # Merged analysis keys remembered per player
+
+# Flaws are free text; bucket them so "left arm drops early" and "off arm falls" count as the same issue.
+# First match wins, so the more specific buckets come first.
+FLAW_CATEGORIES = [
+    ("Serve toss", ["toss", "lançamento"]),
+    ("Non-dominant arm", ["left arm", "right arm", "left hand", "non-dominant", "off arm", "free arm", "braço"]),
+    ("Grip / racquet face", ["grip", "racquet face", "racket face", "empunhadura", "face da raquete"]),
+    ("Contact point", ["contact", "jammed", "too close", "ponto de contato"]),
+    ("Preparation / unit turn", ["unit turn", "preparation", "backswing", "take back", "takeback", "late", "preparação"]),
+    ("Follow-through", ["follow-through", "follow through", "finish", "terminação"]),
+    ("Footwork / stance", ["footwork", "feet", "split step", "split-step", "recovery", "stance", "pés", "posicionamento"]),
+    ("Balance", ["balance", "falling", "equilíbrio"]),
+    ("Rotation / kinetic chain", ["rotation", "hips", "shoulder", "trunk", "legs", "knee", "kinetic", "quadril", "ombro", "rotação"]),
+]
+OTHER_FLAW = "Other"
+
+_LEVEL_RE = re.compile(r"(?:Observed Level|Nível Observado)[^\n]*\n?(.{0,200})", re.IGNORECASE | re.DOTALL)
+_NTRP_RE = re.compile(r"NTRP\s*:?\s*([1-7](?:\.\d)?)", re.IGNORECASE)
+_BARE_LEVEL_RE = re.compile(r"\b([1-7]\.[05])\b")
+_FLAWS_RE = re.compile(r"\*\*(?:The Bad|O Ruim|Major Flaws|Principais Falhas)[^\n]*\n(.*?)(?=\n\s*##|\n\s*\*\*[^*\n]+\*\*|\Z)",
+                       re.IGNORECASE | re.DOTALL)
+_MAIN_ISSUE_RE = re.compile(r"\*\*(?:The Main Issue|O Principal Problema):?\*\*:?(.*?)(?=\n\s*##|\n\s*\*\*|\Z)",
+                            re.IGNORECASE | re.DOTALL)
+_BULLET_RE = re.compile(r"^\s*[\*\-•]\s+(.+)$", re.MULTILINE)
+
+def parse_observed_ntrp(text):
+    """NTRP rating from the 'Observed Level' section (e.g. 'Intermediate (NTRP 3.5)'), or None."""
+    match = _LEVEL_RE.search(text or "")
+    if not match:
+        return None
+    section = match.group(0)
+    level = _NTRP_RE.search(section) or _BARE_LEVEL_RE.search(section)
+    return float(level.group(1)) if level else None
+
+def parse_flaws(text):
+    """Flaw sentences: the 'The Bad (Major Flaws)' bullets (full audit) or 'The Main Issue' (quick fix)."""
+    flaws = []
+    match = _FLAWS_RE.search(text or "")
+    if match:
+        flaws += [" ".join(b.split()) for b in _BULLET_RE.findall(match.group(1))]
+    match = _MAIN_ISSUE_RE.search(text or "")
+    if match and match.group(1).strip():
+        flaws.append(" ".join(match.group(1).split()))
+    return [f for f in flaws if f and not f.startswith("[")]  # Skip unfilled template placeholders
+
+def flaw_category(flaw):
+    lowered = flaw.lower()
+    for category, keywords in FLAW_CATEGORIES:
+        if any(k in lowered for k in keywords):
+            return category
+    return OTHER_FLAW
+
+def analysis_key(row):
+    """Content key of a saved analysis (player, video, text); the same for every delivery of the row."""
+    return hashlib.sha256(
+        json.dumps([row.get("player_email"), row.get("video_name"), row.get("analysis_text") or ""], ensure_ascii=False).encode("utf-8")
+    ).hexdigest()[:32]
+
+def analysis_delta(row):
+    """Reduces one saved analysis row to what the aggregate needs."""
+    meta = row.get("structured_data") or {}
+    scores = [float(x.get("confidence_score", 0)) for x in meta.get("confidence_log") or []]
+    return {
+        "key": analysis_key(row),
+        "at": row.get("created_at") or datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+        "ntrp": parse_observed_ntrp(row.get("analysis_text")),
+        "stroke": meta.get("stroke_type") or "Unknown",
+        "report_type": meta.get("report_type"),
+        "confidence": sum(scores) / len(scores) if scores else None,
+        "flaws": sorted({flaw_category(f) for f in parse_flaws(row.get("analysis_text"))}),
+    }
+
+def empty_progress():
+    return {"analyses": 0, "timeline": [], "flaw_counts": {}, "stroke_confidence": {}, "applied": []}
+
+def merge_progress(progress, delta):
+    """Adds one analysis delta to a player's aggregate (returns a new dict; unchanged if already merged)."""
+    if delta.get("key") in progress.get("applied", []):
+        return progress
+    progress = {
+        "analyses": progress.get("analyses", 0) + 1,
+        "timeline": list(progress.get("timeline", [])),
+        "flaw_counts": dict(progress.get("flaw_counts", {})),
+        "stroke_confidence": {k: dict(v) for k, v in progress.get("stroke_confidence", {}).items()},
+        "applied": (list(progress.get("applied", [])) + [delta.get("key")])[-PROGRESS_APPLIED_MAX:],
+    }
+    progress["timeline"].append({k: delta[k] for k in ("at", "ntrp", "stroke", "report_type", "confidence")})
+    progress["timeline"] = sorted(progress["timeline"], key=lambda p: p["at"] or "")[-PROGRESS_TIMELINE_MAX:]
+    for flaw in delta["flaws"]:
+        progress["flaw_counts"][flaw] = progress["flaw_counts"].get(flaw, 0) + 1
+    if delta["confidence"] is not None:
+        stats = progress["stroke_confidence"].setdefault(delta["stroke"], {"n": 0, "total": 0.0})
+        stats["n"] += 1
+        stats["total"] += delta["confidence"]
+    return progress
+
+def build_progress(rows):
+    """Aggregate from scratch (backfill for players whose history predates the aggregates)."""
+    progress = empty_progress()
+    for row in rows:
+        progress = merge_progress(progress, analysis_delta(row))
+    return progress
+
+def summarize_progress(progress):
+    """Dashboard view of an aggregate: NTRP timeline, flaws by frequency, mean confidence per stroke."""
+    progress = progress or empty_progress()
+    return {
+        "analyses": progress["analyses"],
+        "ntrp_timeline": [{"date": (p["at"] or "").split("T")[0], "ntrp": p["ntrp"]} for p in progress["timeline"] if p["ntrp"] is not None],
+        "confidence_timeline": [{"date": (p["at"] or "").split("T")[0], "confidence": round(p["confidence"], 2)}
+                                for p in progress["timeline"] if p["confidence"] is not None],
+        "top_flaws": sorted(progress["flaw_counts"].items(), key=lambda kv: (-kv[1], kv[0])),
+        "confidence_by_stroke": {stroke: round(s["total"] / s["n"], 2) for stroke, s in progress["stroke_confidence"].items() if s["n"]},
+    }
@@ -1,9 +1,16 @@
 import time
 import os
-import re
+import io
+from functools import lru_cache
 import qrcode
 from PIL import Image
 from fpdf import FPDF
+try:
+    from fpdf.fonts import CoreFont, CORE_FONTS_CHARWIDTHS  # fpdf2 internals: pinned to 2.8.x in requirements.txt
+except ImportError:
+    CoreFont = None  # Other fpdf2 layouts: keep the stock (uncached) measurement
+from tools.markdown_layout import BlockRenderer, clean_for_pdf, parse_markdown, strip_inline
+from tools.tracing import span
 
 TRANSLATIONS = {
     "English": {
@@ -54,15 +61,62 @@ TRANSLATIONS = {
     }
 }
 
+# --- STATIC ASSETS (Built once per process, shared by every report) ---
+
+# Core fonts used by ProReport (fpdf2 font keys: family + style)
+REPORT_FONT_KEYS = [("helvetica", ""), ("helvetica", "B"), ("helvetica", "I")]
+
+@lru_cache(maxsize=65536)
+def _text_width_units(fontkey, text):
+    """Width of `text` in 1/1000 font units. Line-breaking re-measures the same strings a lot."""
+    widths = CORE_FONTS_CHARWIDTHS[fontkey]
+    return sum(map(widths.__getitem__, text))
+
+if CoreFont is not None:
+    class _MeasuredCoreFont(CoreFont):
+        """Core font whose text measurement goes through the process-wide width cache."""
+        __slots__ = ()
+
+        def get_text_width(self, text, font_size_pt, _):
+            return (len(text), _text_width_units(self.fontkey, text) * font_size_pt * 0.001)
+
+@lru_cache(maxsize=32)
+def get_report_assets(lang_key, report_type):
+    """Pre-cleaned labels and header strings for a (language, report type) pair."""
+    is_quick = "Quick" in report_type or "Rápida" in report_type
+    return {
+        "labels": {k: clean_for_pdf(v) for k, v in TRANSLATIONS[lang_key].items() if isinstance(v, str)},
+        "header_text": "COURT LENS AI | " + ("Quick Fix" if is_quick else "Full Audit"),
+        "cover_title": "QUICK FIX" if is_quick else "FULL AUDIT",
+    }
+
+@lru_cache(maxsize=64)
+def _qr_png_bytes(video_link):
+    """Renders the drill-link QR code once per link (PNG bytes, no temp file)."""
+    qr = qrcode.QRCode(box_size=10, border=4)
+    qr.add_data(video_link)
+    qr.make(fit=True)
+    img = qr.make_image(fill='black', back_color='white')
+    buf = io.BytesIO()
+    img.save(buf)
+    return buf.getvalue()
+
 class ProReport(FPDF):
     def __init__(self, player_name, level, lang_key, report_type):
         super().__init__()
         self.player_name = player_name
         self.level = level
         self.lang_key = lang_key
-        self.labels = TRANSLATIONS[lang_key]
         self.report_type = report_type
-        self.header_text = "COURT LENS AI | " + ("Quick Fix" if "Quick" in report_type or "Rápida" in report_type else "Full Audit")
+        assets = get_report_assets(lang_key, report_type)
+        self.labels = assets["labels"]
+        self.header_text = assets["header_text"]
+        self.cover_title = assets["cover_title"]
+        # Register the core fonts up-front with the cached width measurement
+        if CoreFont is not None:
+            for family, style in REPORT_FONT_KEYS:
+                fontkey = family + style
+                self.fonts[fontkey] = _MeasuredCoreFont(len(self.fonts) + 1, fontkey, style)
         self.set_auto_page_break(auto=True, margin=20)
         self.set_margins(left=20, top=20, right=20)
 
@@ -73,7 +127,7 @@ class ProReport(FPDF):
         self.set_font('Helvetica', 'B', 10)
         self.set_text_color(255, 255, 255) 
         self.set_xy(20, 4)
-        self.cell(0, 8, clean_for_pdf(self.header_text), align='L')
+        self.cell(0, 8, self.header_text, align='L')
         self.ln(20)
 
     # --- NEW: CALCULATE PROPORTIONAL DIMENSIONS ---
@@ -96,8 +150,7 @@ class ProReport(FPDF):
         self.set_y(40)
         self.set_font('Helvetica', 'B', 36)
         self.set_text_color(255, 255, 255) 
-        title_text = "QUICK FIX" if "Quick" in self.report_type or "Rápida" in self.report_type else "FULL AUDIT"
-        self.cell(0, 20, title_text, align='C', new_x="LMARGIN", new_y="NEXT")
+        self.cell(0, 20, self.cover_title, align='C', new_x="LMARGIN", new_y="NEXT")
         
         self.set_font('Helvetica', '', 18)
         self.set_text_color(0, 101, 189) 
@@ -127,8 +180,6 @@ class ProReport(FPDF):
         self.cell(120, 8, f"Date: {time.strftime('%d/%m/%Y')}", align='C', new_x="LMARGIN", new_y="NEXT")
 
     def chapter_body(self, text, fix_img_path=None):
-        image_inserted = False 
-        
         self.add_page()
         self.set_text_color(50, 50, 50)
         self.set_font('Helvetica', 'B', 16)
@@ -136,70 +187,29 @@ class ProReport(FPDF):
         self.ln(5)
         self.set_font('Helvetica', '', 11)
 
-        lines = text.split('\n')
-
-        for line in lines:
-            safe_line = clean_for_pdf(line).strip()
-            
-            # 🛑 FILTER
-            if "Shot Log" in safe_line or "JSON_DATA" in safe_line or "SEARCH_QUERY" in safe_line:
-                break
-                
-            if not safe_line:
-                self.ln(4)
-                continue
-            
-            # 1. HEADERS
-            if safe_line.startswith('##') or (safe_line.startswith('**') and safe_line.endswith('**')):
-                self.ln(5)
-                self.set_fill_color(240, 240, 240)
-                self.set_font('Helvetica', 'B', 12)
-                self.set_text_color(0, 101, 189) 
-                content = safe_line.replace('**', '').replace('##', '').strip()
-                self.cell(0, 8, content, fill=True, new_x="LMARGIN", new_y="NEXT")
-                self.set_font('Helvetica', '', 11)
-                self.set_text_color(50, 50, 50)
-            
-            # 2. LISTS
-            elif safe_line.startswith('- ') or safe_line.startswith('* '):
-                clean_item = safe_line[1:].replace('**', '').strip()
-                self.set_x(28)
-                self.multi_cell(0, 5, chr(149) + " " + clean_item)
-                
-            # 3. TEXT
-            else:
-                self.set_x(20)
-                clean_text_line = safe_line.replace('**', '')
-                if "The Bad" in safe_line or "Main Issue" in safe_line:
-                     self.set_font('Helvetica', 'B', 11)
-                     self.multi_cell(0, 6, clean_text_line)
-                     self.set_font('Helvetica', '', 11)
-                else:
-                    self.multi_cell(0, 6, clean_text_line)
+        if not (fix_img_path and os.path.exists(fix_img_path)):
+            fix_img_path = None
+        _FPDFBodyRenderer(self, fix_img_path).render(parse_markdown(text))
 
-            # 4. IMAGE INJECTION
-            if fix_img_path and os.path.exists(fix_img_path) and not image_inserted:
-                triggers = ["The Bad", "Main Issue", "Correção", "Major Flaws"]
-                if any(trigger in safe_line for trigger in triggers):
-                    self.ln(5)
-                    
-                    # --- UPDATED: Use Smart Resize ---
-                    max_w, max_h = 120, 80 
-                    img_w, img_h = self.get_fitted_dimensions(fix_img_path, max_w, max_h)
-                    
-                    x_pos = (210 - img_w) / 2
-                    if self.get_y() + img_h > 270: self.add_page()
-                    
-                    self.image(fix_img_path, x=x_pos, w=img_w, h=img_h)
-                    self.ln(img_h + 2)
-                    
-                    self.set_font('Helvetica', 'I', 9)
-                    self.set_text_color(200, 0, 0)
-                    self.cell(0, 5, "Visual Evidence: Area for Improvement", align='C', new_x="LMARGIN", new_y="NEXT")
-                    self.ln(5)
-                    self.set_text_color(50, 50, 50)
-                    self.set_font('Helvetica', '', 11)
-                    image_inserted = True
+    def insert_fix_image(self, fix_img_path):
+        self.ln(5)
+        
+        # --- UPDATED: Use Smart Resize ---
+        max_w, max_h = 120, 80 
+        img_w, img_h = self.get_fitted_dimensions(fix_img_path, max_w, max_h)
+        
+        x_pos = (210 - img_w) / 2
+        if self.get_y() + img_h > 270: self.add_page()
+        
+        self.image(fix_img_path, x=x_pos, w=img_w, h=img_h)
+        self.ln(img_h + 2)
+        
+        self.set_font('Helvetica', 'I', 9)
+        self.set_text_color(200, 0, 0)
+        self.cell(0, 5, "Visual Evidence: Area for Improvement", align='C', new_x="LMARGIN", new_y="NEXT")
+        self.ln(5)
+        self.set_text_color(50, 50, 50)
+        self.set_font('Helvetica', '', 11)
 
     # --- NEW: CONFIDENCE SECTION ---
     def add_confidence_section(self, confidence_data):
@@ -255,38 +265,78 @@ class ProReport(FPDF):
         self.ln(20)
         self.set_font('Helvetica', 'B', 14)
         self.set_text_color(0, 101, 189)
-        self.cell(0, 10, clean_for_pdf(self.labels["pdf_watch_video"]), align='C', link=video_link, new_x="LMARGIN", new_y="NEXT")
+        self.cell(0, 10, self.labels["pdf_watch_video"], align='C', link=video_link, new_x="LMARGIN", new_y="NEXT")
         
         self.ln(10)
-        qr = qrcode.QRCode(box_size=10, border=4)
-        qr.add_data(video_link)
-        qr.make(fit=True)
-        img = qr.make_image(fill='black', back_color='white')
-        img_path = "temp_qr.png"
-        img.save(img_path)
         x_pos = (210 - 80) / 2
-        self.image(img_path, x=x_pos, w=80)
-        if os.path.exists(img_path): os.remove(img_path)
+        self.image(io.BytesIO(_qr_png_bytes(video_link)), x=x_pos, w=80)
 
-def clean_for_pdf(text):
-    """Sanitizes text: Removes emojis, markdown stars, and fixes encoding."""
-    text = re.sub(r'[^\x00-\x7F]+', '', text) 
-    replacements = {
-        "–": "-", "—": "--", "“": '"', "”": '"', 
-        "‘": "'", "’": "'", "…": "...", "•": "-" 
-    }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-    return text.encode('latin-1', 'replace').decode('latin-1')
+class _FPDFBodyRenderer(BlockRenderer):
+    """Lays out the shared markdown blocks on a ProReport page (Streamlit path)."""
+    # Lines after which the "fix" evidence frame is injected (cleaned like the text)
+    IMAGE_TRIGGERS = tuple(clean_for_pdf(t) for t in ["The Bad", "Main Issue", "Correção", "Major Flaws"])
+
+    def __init__(self, pdf, fix_img_path=None):
+        self.pdf = pdf
+        self.fix_img_path = fix_img_path
+
+    def render_blank(self, block):
+        self.pdf.ln(4)
+
+    # 1. HEADERS
+    def render_heading(self, block):
+        pdf = self.pdf
+        pdf.ln(5)
+        pdf.set_fill_color(240, 240, 240)
+        pdf.set_font('Helvetica', 'B', 12)
+        pdf.set_text_color(0, 101, 189) 
+        pdf.cell(0, 8, strip_inline(block.text), fill=True, new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font('Helvetica', '', 11)
+        pdf.set_text_color(50, 50, 50)
+
+    render_label = render_heading
+
+    # 2. LISTS
+    def render_bullet(self, block):
+        self.pdf.set_x(28)
+        self.pdf.multi_cell(0, 5, chr(149) + " " + strip_inline(block.text))
+
+    # 3. TEXT
+    def render_paragraph(self, block):
+        pdf = self.pdf
+        pdf.set_x(20)
+        if "The Bad" in block.text or "Main Issue" in block.text:
+            pdf.set_font('Helvetica', 'B', 11)
+            pdf.multi_cell(0, 6, strip_inline(block.text))
+            pdf.set_font('Helvetica', '', 11)
+        else:
+            pdf.multi_cell(0, 6, strip_inline(block.text))
+
+    def render_rule(self, block):
+        pdf = self.pdf
+        pdf.ln(2)
+        pdf.set_draw_color(200, 200, 200)
+        pdf.set_line_width(0.3)
+        pdf.line(20, pdf.get_y(), 190, pdf.get_y())
+        pdf.ln(2)
+
+    # 4. IMAGE INJECTION
+    def after_block(self, block):
+        if self.fix_img_path and any(trigger in block.text for trigger in self.IMAGE_TRIGGERS):
+            self.pdf.insert_fix_image(self.fix_img_path)
+            self.fix_img_path = None
 
 # --- UPDATED CREATE FUNCTION ---
 def create_pdf(text, name, level, lang, r_type, video_link, images={}, confidence_data=[]):
-    pdf = ProReport(name, level, lang, r_type)
-    pdf.create_cover_page(images.get("cover"))
-    pdf.chapter_body(text, fix_img_path=images.get("fix"))
-    
-    # Add the new section
-    pdf.add_confidence_section(confidence_data)
-    
-    pdf.add_qr_page(video_link)
-    return pdf.output(dest='S')
\ No newline at end of file
+    with span("pdf.build", engine="fpdf", markdown_chars=len(text or ""), images=len(images)) as pdf_span:
+        pdf = ProReport(name, level, lang, r_type)
+        pdf.create_cover_page(images.get("cover"))
+        pdf.chapter_body(text, fix_img_path=images.get("fix"))
+        
+        # Add the new section
+        pdf.add_confidence_section(confidence_data)
+        
+        pdf.add_qr_page(video_link)
+        data = bytes(pdf.output())
+        pdf_span.set(pages=pdf.page_no(), bytes=len(data))
+    return data
\ No newline at end of file
@@ -0,0 +1,212 @@
+# tools/search_index.py
+"""
+Full-text and faceted search over saved analyses (SQLite FTS5).
+
+Every stored analysis is indexed once, right after it lands in the store: the
+report text (without the JSON/SEARCH_QUERY metadata), the confidence_log claims
+and the report type are full-text searchable (bm25-ranked, claims weigh more);
+report type, stroke, flaw category and player are facets.
+
+The index is its own SQLite file, so it serves both the Supabase and the local
+store and can be opened from the MCP server process as well.
+"""
+import os
+import re
+import json
+import sqlite3
+import argparse
+import threading
+from datetime import datetime, timezone
+from functools import lru_cache
+
+from tools.player_progress import analysis_key, flaw_category, parse_flaws, parse_observed_ntrp
+
+SEARCH_INDEX_PATH = os.environ.get("SEARCH_INDEX_PATH", os.path.join(os.path.expanduser("~"), ".courtlens", "search.db"))
+FACETS = ("report_type", "stroke_type", "flaw", "player_email")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    doc_key TEXT NOT NULL UNIQUE,      -- Content hash: re-indexing the same analysis is a no-op
+    player_email TEXT,
+    player_name TEXT,
+    video_name TEXT,
+    created_at TEXT,
+    report_type TEXT,
+    stroke_type TEXT,
+    confidence REAL,
+    ntrp REAL,
+    flaws TEXT                         -- JSON list of flaw categories
+);
+CREATE INDEX IF NOT EXISTS docs_created ON docs (created_at DESC);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    body, claims, report_type,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+);
+"""
+# bm25 column weights: body, claims, report_type
+_BM25 = "bm25(docs_fts, 1.0, 2.0, 0.5)"
+
+def clean_analysis_text(text):
+    """Report text without the hidden metadata blocks and markdown markup."""
+    text = re.sub(r"(?i)\**JSON_DATA.*", "", text or "", flags=re.DOTALL)
+    text = re.sub(r"(?i)\**SEARCH_QUERY.*", "", text, flags=re.DOTALL)
+    return " ".join(re.sub(r"[#*_>`]+", " ", text).split())
+
+def fts_query(text):
+    """
+    User input -> safe FTS5 query: every word is a quoted term (AND-ed),
+    "quoted phrases" stay phrases and a trailing * keeps prefix matching.
+    """
+    terms = []
+    for token in re.findall(r'"[^"]+"|\S+', text or ""):
+        prefix = token.endswith("*")
+        words = re.findall(r"\w+", token)
+        if not words:
+            continue
+        term = '"' + " ".join(words) + '"'
+        terms.append(term + "*" if prefix else term)
+    return " ".join(terms)
+
+class SearchIndex:
+    def __init__(self, path=SEARCH_INDEX_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        self.conn().executescript(_SCHEMA)
+
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    # --- INDEXING ---
+    def add(self, row):
+        """Indexes one analysis row (as saved by save_analysis_to_db). Returns False if it was already indexed."""
+        meta = row.get("structured_data") or {}
+        text = row.get("analysis_text") or ""
+        doc_key = analysis_key(row)
+        claims = " \n".join(c.get("claim", "") for c in meta.get("confidence_log") or [] if isinstance(c, dict))
+        scores = [float(c.get("confidence_score", 0)) for c in meta.get("confidence_log") or [] if isinstance(c, dict)]
+        flaws = sorted({flaw_category(f) for f in parse_flaws(text)})
+
+        with self.conn() as conn:
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO docs (doc_key, player_email, player_name, video_name, created_at, "
+                "report_type, stroke_type, confidence, ntrp, flaws) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_key, row.get("player_email"), row.get("player_name"), row.get("video_name"),
+                 row.get("created_at") or datetime.now(timezone.utc).isoformat(timespec="microseconds"),
+                 meta.get("report_type"), meta.get("stroke_type"), sum(scores) / len(scores) if scores else None,
+                 parse_observed_ntrp(text), json.dumps(flaws))
+            )
+            if not cur.rowcount:
+                return False
+            conn.execute(
+                "INSERT INTO docs_fts (rowid, body, claims, report_type) VALUES (?, ?, ?, ?)",
+                (cur.lastrowid, clean_analysis_text(text), claims, meta.get("report_type") or "")
+            )
+        return True
+
+    # --- QUERIES ---
+    def _where(self, query, filters, skip=None):
+        """WHERE clause + params for the text query and every facet filter except `skip`."""
+        clauses, params = [], []
+        match = fts_query(query)
+        if match:
+            clauses.append("docs.id IN (SELECT rowid FROM docs_fts WHERE docs_fts MATCH ?)")
+            params.append(match)
+        for facet, value in (filters or {}).items():
+            if not value or facet == skip:
+                continue
+            if facet == "flaw":
+                clauses.append("EXISTS (SELECT 1 FROM json_each(docs.flaws) WHERE json_each.value = ?)")
+            elif facet in FACETS:
+                clauses.append(f"docs.{facet} = ?")
+            else:
+                raise ValueError(f"Unknown facet: {facet}")
+            params.append(value)
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def search(self, query="", filters=None, limit=20, offset=0):
+        """
+        Ranked hits (bm25 for text queries, newest first otherwise) plus facet
+        counts. Each facet is counted with the other filters applied, so the UI
+        can show alternatives for the value already selected.
+        filters: {"report_type", "stroke_type", "flaw", "player_email"} -> value.
+        """
+        conn = self.conn()
+        match = fts_query(query)
+        where, params = self._where(query, filters)
+        total = conn.execute(f"SELECT COUNT(*) FROM docs{where}", params).fetchone()[0]
+
+        if match:
+            filter_where, filter_params = self._where("", filters)
+            filter_where = filter_where.replace(" WHERE ", " AND ", 1)
+            sql = (f"SELECT docs.*, {_BM25} AS score, "
+                   f"snippet(docs_fts, 0, '**', '**', ' … ', 24) AS snippet "
+                   f"FROM docs_fts JOIN docs ON docs.id = docs_fts.rowid "
+                   f"WHERE docs_fts MATCH ?{filter_where} "
+                   f"ORDER BY score LIMIT ? OFFSET ?")
+            rows = conn.execute(sql, [match] + filter_params + [limit, offset]).fetchall()
+        else:
+            sql = (f"SELECT docs.*, NULL AS score, substr(docs_fts.body, 1, 200) AS snippet "
+                   f"FROM docs JOIN docs_fts ON docs.id = docs_fts.rowid{where} "
+                   f"ORDER BY docs.created_at DESC LIMIT ? OFFSET ?")
+            rows = conn.execute(sql, params + [limit, offset]).fetchall()
+
+        hits = []
+        for r in rows:
+            hit = {k: r[k] for k in r.keys() if k not in ("doc_key",)}
+            hit["flaws"] = json.loads(r["flaws"] or "[]")
+            hit["score"] = -r["score"] if r["score"] is not None else None  # bm25: lower is better
+            hits.append(hit)
+        return {"total": total, "hits": hits, "facets": self.facets(query, filters)}
+
+    def facets(self, query="", filters=None, top=20):
+        conn = self.conn()
+        result = {}
+        for facet in FACETS:
+            where, params = self._where(query, filters, skip=facet)
+            if facet == "flaw":
+                sql = (f"SELECT json_each.value AS value, COUNT(*) AS n FROM docs, json_each(docs.flaws)"
+                       f"{where} GROUP BY value ORDER BY n DESC, value LIMIT ?")
+            else:
+                sql = (f"SELECT docs.{facet} AS value, COUNT(*) AS n FROM docs{where} "
+                       f"{'AND' if where else 'WHERE'} docs.{facet} IS NOT NULL "
+                       f"GROUP BY value ORDER BY n DESC, value LIMIT ?")
+            result[facet] = {r["value"]: r["n"] for r in conn.execute(sql, params + [top])}
+        return result
+
+    def stats(self):
+        return {"documents": self.conn().execute("SELECT COUNT(*) FROM docs").fetchone()[0], "path": self.path}
+
+@lru_cache(maxsize=1)
+def get_search_index():
+    return SearchIndex()
+
+def _load_rows(path):
+    """A tennis_analyses export: JSON list, {"data": [...]}, or JSON Lines."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    if path.lower().endswith(".jsonl"):
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    data = json.loads(raw)
+    return data.get("data", []) if isinstance(data, dict) else data
+
+if __name__ == "__main__":
+    # Backfill: python -m tools.search_index export.jsonl [more exports...]
+    parser = argparse.ArgumentParser(description="Index tennis_analyses exports into the search index.")
+    parser.add_argument("exports", nargs="+")
+    args = parser.parse_args()
+    index = get_search_index()
+    for export in args.exports:
+        rows = _load_rows(export)
+        added = sum(index.add(row) for row in rows)
+        print(f"✅ {export}: {added} new / {len(rows)} rows")
+    print(f"📚 {index.stats()['documents']} documents in {index.path}")
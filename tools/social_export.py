@@ -0,0 +1,87 @@
+# tools/social_export.py
+"""
+Multi-format social export: one decode of the shot window, fanned out through
+an ffmpeg `split` filtergraph into several crop/scale/watermark/encode outputs.
+"""
+import os
+
+from tools.video_editor import FFMPEG_BINARY, _validate_clip_window, get_media_duration, run_ffmpeg
+from tools.watermark import WATERMARK_TEXT, get_watermark_png
+from tools.workspace import get_workspace_manager
+
+# Per-format presets: output size, aspect of the center crop and encoder settings
+SOCIAL_PRESETS = {
+    "9:16": {"name": "vertical", "size": (1080, 1920), "aspect": (9, 16), "crf": 21, "preset": "fast", "audio_bitrate": "128k"},
+    "1:1": {"name": "square", "size": (1080, 1080), "aspect": (1, 1), "crf": 21, "preset": "fast", "audio_bitrate": "128k"},
+    "16:9": {"name": "landscape", "size": (1920, 1080), "aspect": (16, 9), "crf": 21, "preset": "fast", "audio_bitrate": "128k"},
+}
+DEFAULT_FORMATS = ("9:16", "1:1", "16:9")
+
+def _crop_filter(aspect_w, aspect_h):
+    """Largest even-sized centered window with the requested aspect ratio."""
+    ratio = f"{aspect_w}/{aspect_h}"
+    return (
+        f"crop=w='trunc(min(iw,ih*{ratio})/2)*2':h='trunc(min(ih,iw/({ratio}))/2)*2'"
+        ":x='(iw-ow)/2':y='(ih-oh)/2'"
+    )
+
+def build_social_export_command(video_path, start, end, formats, output_paths, watermark=True):
+    """Builds the single ffmpeg command for all formats (exposed for tests/benchmarks)."""
+    cmd = [FFMPEG_BINARY, "-y", "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", video_path]
+
+    # Inputs 1..n: one cropped watermark PNG per output size
+    placements = []
+    if watermark:
+        for fmt in formats:
+            w, h = SOCIAL_PRESETS[fmt]["size"]
+            png_path, wm_x, wm_y = get_watermark_png(WATERMARK_TEXT, w, h)
+            cmd += ["-i", png_path]
+            placements.append((wm_x, wm_y))
+
+    n = len(formats)
+    graph = ["[0:v]split=" + str(n) + "".join(f"[s{i}]" for i in range(n))]
+    for i, fmt in enumerate(formats):
+        preset = SOCIAL_PRESETS[fmt]
+        w, h = preset["size"]
+        chain = f"[s{i}]{_crop_filter(*preset['aspect'])},scale={w}:{h},setsar=1"
+        if watermark:
+            wm_x, wm_y = placements[i]
+            graph.append(f"{chain}[b{i}]")
+            graph.append(f"[b{i}][{i + 1}:v]overlay={wm_x}:{wm_y}:format=auto[o{i}]")
+        else:
+            graph.append(f"{chain}[o{i}]")
+    cmd += ["-filter_complex", ";".join(graph)]
+
+    # One encoder set per output, audio included: each output runs its own (cheap) AAC encode.
+    # The governor adds a -threads cap in front of every output (see with_thread_limit)
+    for i, fmt in enumerate(formats):
+        preset = SOCIAL_PRESETS[fmt]
+        cmd += [
+            "-map", f"[o{i}]", "-map", "0:a?",
+            "-c:v", "libx264", "-preset", preset["preset"], "-crf", str(preset["crf"]), "-pix_fmt", "yuv420p",
+            "-c:a", "aac", "-b:a", preset["audio_bitrate"],
+            "-movflags", "+faststart",
+            output_paths[fmt],
+        ]
+    return cmd
+
+def export_social_formats(video_path, start_time, end_time, formats=DEFAULT_FORMATS, output_dir=None, watermark=True):
+    """
+    Renders the same shot window in several social formats with a single decode.
+    Returns {format: output_path}, e.g. {"9:16": ".../clip_vertical.mp4", ...}.
+    """
+    formats = list(dict.fromkeys(formats))  # De-duplicate, keep order
+    unknown = [f for f in formats if f not in SOCIAL_PRESETS]
+    if not formats or unknown:
+        raise ValueError(f"Unknown social formats: {unknown} (expected some of {list(SOCIAL_PRESETS)})")
+
+    # Clamp the end to the media like the clip engines do: a start past EOF fails here, not in ffmpeg
+    start, end = _validate_clip_window(start_time, end_time, get_media_duration(video_path))
+    if output_dir is None:
+        output_dir = get_workspace_manager().create("social", hold=False).root
+    os.makedirs(output_dir, exist_ok=True)
+    output_paths = {fmt: os.path.join(output_dir, f"clip_{SOCIAL_PRESETS[fmt]['name']}.mp4") for fmt in formats}
+
+    cmd = build_social_export_command(video_path, start, end, formats, output_paths, watermark=watermark)
+    run_ffmpeg(cmd, list(output_paths.values()), "social export")
+    return output_paths
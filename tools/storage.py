@@ -0,0 +1,207 @@
+# tools/storage.py
+"""
+Analysis store backends.
+
+Both expose the same small API used by tools/database.py:
+  insert(rows)                                   -> None (raises on failure)
+  list_history(email, cursor, limit, report_type) -> {"items": [...], "next_cursor": ...}
+  get_analysis(row_id)                           -> {"analysis_text", "structured_data"} or None
+  iter_analyses(email)                           -> all of a player's rows, oldest first
+  get_progress(email) / update_progress(email, fn) -> per-player aggregate (tools/player_progress.py)
+
+History items carry id, created_at, video_name, confidence_score and
+report_type (read from the structured_data JSON). Pages are keyset-paginated
+on (created_at, id), newest first.
+
+SupabaseStore wraps a supabase client (remote; saves go through the write-behind
+queue). SQLiteStore is a local single-file database in WAL mode for offline and
+single-node deployments; saves are written directly.
+
+The Supabase project needs the aggregate table next to tennis_analyses:
+    create table player_progress (
+        player_email text primary key,
+        progress jsonb not null,
+        updated_at timestamptz not null default now()
+    );
+"""
+import os
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+ANALYSES_TABLE = "tennis_analyses"
+PROGRESS_TABLE = "player_progress"
+ANALYSIS_DB_PATH = os.environ.get("ANALYSIS_DB_PATH", os.path.join(os.path.expanduser("~"), ".courtlens", "analyses.db"))
+
+def _next_cursor(rows, limit):
+    return (rows[-1]["created_at"], rows[-1]["id"]) if len(rows) == limit else None
+
+class SupabaseStore:
+    name = "supabase"
+    write_behind = True   # Network round-trips: queue saves instead of blocking the UI
+    LIST_COLUMNS = "id,created_at,video_name,confidence_score,report_type:structured_data->>report_type"
+
+    def __init__(self, client, table=ANALYSES_TABLE, progress_table=PROGRESS_TABLE):
+        self.client = client
+        self.table = table
+        self.progress_table = progress_table
+
+    def insert(self, rows):
+        self.client.table(self.table).insert(rows).execute()
+
+    def list_history(self, email, cursor=None, limit=10, report_type=None):
+        query = self.client.table(self.table).select(self.LIST_COLUMNS).eq("player_email", email)
+        if report_type:
+            query = query.eq("structured_data->>report_type", report_type)
+        if cursor:
+            # Keyset pagination on (created_at, id): stable while new rows arrive, no OFFSET scan
+            created_at, row_id = cursor
+            query = query.or_(f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",id.lt.{row_id})')
+        rows = query.order("created_at", desc=True).order("id", desc=True).limit(limit).execute().data
+        return {"items": rows, "next_cursor": _next_cursor(rows, limit)}
+
+    def get_analysis(self, row_id):
+        rows = self.client.table(self.table).select("analysis_text,structured_data").eq("id", row_id).limit(1).execute().data
+        return rows[0] if rows else None
+
+    def iter_analyses(self, email, page_size=200):
+        columns = "id,created_at,player_email,video_name,analysis_text,structured_data"  # analysis_key() needs email and video
+        cursor = None
+        while True:
+            query = self.client.table(self.table).select(columns).eq("player_email", email)
+            if cursor:
+                query = query.or_(f'created_at.gt."{cursor[0]}",and(created_at.eq."{cursor[0]}",id.gt.{cursor[1]})')
+            rows = query.order("created_at").order("id").limit(page_size).execute().data
+            yield from rows
+            if len(rows) < page_size:
+                return
+            cursor = (rows[-1]["created_at"], rows[-1]["id"])
+
+    def get_progress(self, email):
+        rows = self.client.table(self.progress_table).select("progress").eq("player_email", email).limit(1).execute().data
+        return rows[0]["progress"] if rows else None
+
+    def update_progress(self, email, fn):
+        """
+        Read-modify-write of the player's aggregate. Not atomic: two concurrent
+        updates for one player can lose one merge (last writer wins). Saves for
+        one player are rare and the write-behind flusher applies them serially;
+        repeated deliveries of a row are skipped by the merge itself.
+        """
+        progress = fn(self.get_progress(email))
+        self.client.table(self.progress_table).upsert(
+            {"player_email": email, "progress": progress, "updated_at": datetime.now(timezone.utc).isoformat()},
+            on_conflict="player_email",
+        ).execute()
+        return progress
+
+_SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {ANALYSES_TABLE} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,                      -- ISO 8601 UTC, fixed width so it sorts as text
+    player_email TEXT NOT NULL,
+    player_name TEXT,
+    video_name TEXT,
+    analysis_text TEXT,
+    structured_data TEXT CHECK (structured_data IS NULL OR json_valid(structured_data)),
+    confidence_score REAL
+);
+CREATE INDEX IF NOT EXISTS {ANALYSES_TABLE}_player_created
+    ON {ANALYSES_TABLE} (player_email, created_at DESC, id DESC);
+CREATE TABLE IF NOT EXISTS {PROGRESS_TABLE} (
+    player_email TEXT PRIMARY KEY,
+    progress TEXT NOT NULL CHECK (json_valid(progress)),
+    updated_at TEXT NOT NULL
+);
+"""
+
+class SQLiteStore:
+    name = "sqlite"
+    write_behind = False  # A local insert takes well under a millisecond
+
+    def __init__(self, path=ANALYSIS_DB_PATH, table=ANALYSES_TABLE, progress_table=PROGRESS_TABLE):
+        self.path = path
+        self.table = table
+        self.progress_table = progress_table
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()   # One connection per thread (Streamlit runs sessions on threads)
+        self.conn().executescript(_SQLITE_SCHEMA)
+
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def insert(self, rows):
+        now = datetime.now(timezone.utc).isoformat(timespec="microseconds")
+        with self.conn() as conn:
+            conn.executemany(
+                f"INSERT INTO {self.table} (created_at, player_email, player_name, video_name, "
+                "analysis_text, structured_data, confidence_score) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(row.get("created_at") or now, row["player_email"], row.get("player_name"), row.get("video_name"),
+                  row.get("analysis_text"), json.dumps(row.get("structured_data"), default=str),
+                  row.get("confidence_score")) for row in rows]
+            )
+
+    def list_history(self, email, cursor=None, limit=10, report_type=None):
+        sql = (f"SELECT id, created_at, video_name, confidence_score, "
+               f"json_extract(structured_data, '$.report_type') AS report_type "
+               f"FROM {self.table} WHERE player_email = ?")
+        params = [email]
+        if report_type:
+            sql += " AND json_extract(structured_data, '$.report_type') = ?"
+            params.append(report_type)
+        if cursor:
+            sql += " AND (created_at, id) < (?, ?)"
+            params += list(cursor)
+        sql += " ORDER BY created_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+        rows = [dict(r) for r in self.conn().execute(sql, params)]
+        return {"items": rows, "next_cursor": _next_cursor(rows, limit)}
+
+    def get_analysis(self, row_id):
+        row = self.conn().execute(
+            f"SELECT analysis_text, structured_data FROM {self.table} WHERE id = ?", (row_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"analysis_text": row["analysis_text"],
+                "structured_data": json.loads(row["structured_data"]) if row["structured_data"] else None}
+
+    def iter_analyses(self, email):
+        rows = self.conn().execute(
+            f"SELECT id, created_at, player_email, video_name, analysis_text, structured_data FROM {self.table} "
+            "WHERE player_email = ? ORDER BY created_at, id", (email,)
+        )
+        for row in rows:
+            yield {**dict(row), "structured_data": json.loads(row["structured_data"]) if row["structured_data"] else None}
+
+    def get_progress(self, email):
+        row = self.conn().execute(
+            f"SELECT progress FROM {self.progress_table} WHERE player_email = ?", (email,)
+        ).fetchone()
+        return json.loads(row["progress"]) if row else None
+
+    def update_progress(self, email, fn):
+        """Atomic read-modify-write of the player's aggregate (IMMEDIATE locks out concurrent writers)."""
+        conn = self.conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            progress = fn(self.get_progress(email))
+            conn.execute(
+                f"INSERT INTO {self.progress_table} (player_email, progress, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (player_email) DO UPDATE SET progress = excluded.progress, updated_at = excluded.updated_at",
+                (email, json.dumps(progress), datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return progress
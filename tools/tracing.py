@@ -0,0 +1,221 @@
+# tools/tracing.py
+"""
+Lightweight pipeline tracing.
+
+    with span("gemini.upload", bytes=size) as s:
+        ...
+        s.set(state="ACTIVE")
+
+Spans nest through a context variable (the first span in a context starts a
+new trace), record wall time, attributes and errors, and are appended to a
+JSONL file when they end. Each line is an OTLP/JSON ExportTraceServiceRequest
+with one span, so the file can be replayed into any OpenTelemetry collector
+(`otlpjsonfile` receiver) as well as read back by `read_traces()` for the
+Streamlit timings panel.
+
+Worker threads don't inherit context variables: submit work with
+`in_current_trace(fn)` to keep their spans in the caller's trace. Worker
+processes get the ids instead: pass `trace_context()` along and open the
+worker's spans inside `remote_parent(ctx)`.
+
+The sink is rotated to `<path>.1` once it passes TRACE_LOG_MAX_MB, and
+`read_traces()` only parses its last TRACE_READ_TAIL_MB.
+"""
+import os
+import json
+import time
+import uuid
+import tempfile
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+
+TRACING_ENABLED = os.environ.get("TRACING_ENABLED", "1") != "0"
+TRACE_LOG_PATH = os.environ.get("TRACE_LOG_PATH", os.path.join(tempfile.gettempdir(), "courtlens_traces.jsonl"))
+SERVICE_NAME = os.environ.get("TRACE_SERVICE_NAME", "courtlens")
+TRACE_LOG_MAX_MB = float(os.environ.get("TRACE_LOG_MAX_MB", 50))       # Rotate the sink past this size
+TRACE_READ_TAIL_MB = float(os.environ.get("TRACE_READ_TAIL_MB", 8))     # How much of the sink read_traces() parses
+
+_current = contextvars.ContextVar("courtlens_span", default=None)
+_write_lock = threading.Lock()
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name, parent=None, attributes=None, trace_id=None, span_id=None):
+        self.name = name
+        self.trace_id = trace_id or (parent.trace_id if parent else uuid.uuid4().hex)
+        self.span_id = span_id or uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes or {})
+        self.error = None
+
+    def set(self, **attributes):
+        """Adds/overwrites attributes (bytes, duration, model, cache_hit, ...)."""
+        self.attributes.update(attributes)
+        return self
+
+    @property
+    def duration_ms(self):
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}  # OTLP/JSON encodes int64 as a string
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def _to_otlp(s):
+    span = {
+        "traceId": s.trace_id,
+        "spanId": s.span_id,
+        "name": s.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(s.start_ns),
+        "endTimeUnixNano": str(s.end_ns),
+        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+        "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+    }
+    if s.parent_id:
+        span["parentSpanId"] = s.parent_id
+    return {"resourceSpans": [{
+        "resource": {"attributes": [
+            {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+            {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+        ]},
+        "scopeSpans": [{"scope": {"name": "courtlens.tracing"}, "spans": [span]}],
+    }]}
+
+def _export(s):
+    try:
+        line = json.dumps(_to_otlp(s), ensure_ascii=False, default=str)
+        with _write_lock:
+            try:
+                if os.path.getsize(TRACE_LOG_PATH) > TRACE_LOG_MAX_MB * 1e6:
+                    os.replace(TRACE_LOG_PATH, TRACE_LOG_PATH + ".1")
+            except FileNotFoundError:
+                pass
+            with open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+    except OSError as e:  # Tracing must never break the pipeline
+        print(f"⚠️ Trace export failed: {e}")
+
+@contextmanager
+def span(name, **attributes):
+    """Times a block as a child of the current span (or as a new trace). Yields the Span."""
+    if not TRACING_ENABLED:
+        yield Span(name, attributes=attributes)
+        return
+    s = Span(name, _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end_ns = time.time_ns()
+        _export(s)
+
+def traced(name=None, **attributes):
+    """Decorator form of span(); the span is named after the function unless `name` is given."""
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name or fn.__qualname__, **attributes):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def current_span():
+    """The innermost open span (a detached one outside any trace, so `.set()` is always safe)."""
+    return _current.get() or Span("untraced")
+
+def trace_context():
+    """(trace_id, span_id) of the current span, or None outside a trace. Picklable, for worker processes."""
+    s = _current.get()
+    return (s.trace_id, s.span_id) if s else None
+
+@contextmanager
+def remote_parent(ctx):
+    """Opens spans in this block as children of a span from another process (`ctx` from trace_context())."""
+    if not ctx:
+        yield
+        return
+    trace_id, span_id = ctx
+    token = _current.set(Span("remote", trace_id=trace_id, span_id=span_id))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+
+def in_current_trace(fn):
+    """Binds `fn` to the caller's context, so spans it opens on a worker thread join the caller's trace."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
+
+# --- READING ---
+def _from_otlp(record):
+    for resource in record.get("resourceSpans", []):
+        for scope in resource.get("scopeSpans", []):
+            for s in scope.get("spans", []):
+                attrs = {}
+                for a in s.get("attributes", []):
+                    (kind, value), = a["value"].items()
+                    attrs[a["key"]] = int(value) if kind == "intValue" else value
+                yield {
+                    "trace_id": s["traceId"], "span_id": s["spanId"], "parent_id": s.get("parentSpanId"),
+                    "name": s["name"], "start_ns": int(s["startTimeUnixNano"]), "end_ns": int(s["endTimeUnixNano"]),
+                    "attributes": attrs, "error": s.get("status", {}).get("message"),
+                }
+
+def read_traces(limit=5, path=None, tail_mb=TRACE_READ_TAIL_MB):
+    """
+    The `limit` most recent traces from the JSONL sink, newest first. Each is
+    {"trace_id", "name", "start_ns", "duration_ms", "spans": [...]} with spans
+    in start order, carrying "depth" and "offset_ms" (from the trace start).
+    Only the last `tail_mb` of the file is read.
+    """
+    try:
+        with open(path or TRACE_LOG_PATH, "rb") as f:
+            size = f.seek(0, os.SEEK_END)
+            f.seek(max(0, size - int(tail_mb * 1e6)))
+            raw = f.read()
+    except FileNotFoundError:
+        return []
+    lines = raw.decode("utf-8", errors="replace").splitlines()
+
+    by_trace = {}
+    for line in lines:
+        try:
+            for s in _from_otlp(json.loads(line)):
+                by_trace.setdefault(s["trace_id"], []).append(s)
+        except (ValueError, KeyError):
+            continue  # Partial line: a concurrent writer, or the cut at the start of the tail
+
+    traces = []
+    for trace_id, spans in by_trace.items():
+        spans.sort(key=lambda s: s["start_ns"])
+        ids = {s["span_id"]: s for s in spans}
+        roots = [s for s in spans if s["parent_id"] not in ids]
+        start = min(s["start_ns"] for s in spans)
+        end = max(s["end_ns"] for s in spans)
+        for s in spans:
+            depth, parent = 0, ids.get(s["parent_id"])
+            while parent is not None:
+                depth, parent = depth + 1, ids.get(parent["parent_id"])
+            s["depth"] = depth
+            s["offset_ms"] = (s["start_ns"] - start) / 1e6
+            s["duration_ms"] = (s["end_ns"] - s["start_ns"]) / 1e6
+        traces.append({"trace_id": trace_id, "name": roots[0]["name"] if roots else spans[0]["name"],
+                       "start_ns": start, "duration_ms": (end - start) / 1e6, "spans": spans})
+    traces.sort(key=lambda t: t["start_ns"], reverse=True)
+    return traces[:limit]
@@ -0,0 +1,107 @@
+# tools/tracking_crop.py
+"""
+Subject-tracking horizontal crop for vertical clips.
+
+The shot window is decoded once at a tiny resolution (grayscale, ~10 fps),
+per-frame motion centroids are computed with vectorized frame differencing,
+and the resulting path is smoothed and clamped to a valid crop window.
+The renderers in video_editor.py then apply it as a time-varying crop.
+"""
+from collections import namedtuple
+
+import numpy as np
+import imageio_ffmpeg
+
+from tools.ffmpeg_governor import governor
+
+FFMPEG_BINARY = imageio_ffmpeg.get_ffmpeg_exe()
+
+ANALYSIS_SIZE = (160, 90)   # Width x height of the analysis frames (aspect doesn't matter, only x fractions)
+ANALYSIS_FPS = 10           # Samples per second of the crop path
+SMOOTHING_SEC = 0.8         # Moving-average window: keeps the virtual camera from jittering
+MIN_MOTION_FRACTION = 0.001 # Motion energy (as a fraction of a fully-changed frame) needed to trust a centroid
+
+# times: seconds relative to the clip start; xs: left edge of the crop (source pixels, even)
+TrackingPath = namedtuple("TrackingPath", ["times", "xs", "crop_w", "crop_h"])
+
+def decode_analysis_frames(video_path, start, end, size=ANALYSIS_SIZE, fps=ANALYSIS_FPS, job_class="interactive"):
+    """Decodes [start, end) as a (N, h, w) uint8 grayscale array in one ffmpeg pass."""
+    w, h = size
+    cmd = [
+        FFMPEG_BINARY, "-v", "error",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", video_path,
+        "-vf", f"fps={fps},scale={w}:{h}:flags=area,format=gray",
+        "-an", "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1",
+    ]
+    result = governor.run(cmd, job_class=job_class)
+    n = len(result.stdout) // (w * h)
+    return np.frombuffer(result.stdout[:n * w * h], dtype=np.uint8).reshape(n, h, w)
+
+def motion_centroids(frames):
+    """
+    Horizontal motion centroid per frame, as a fraction of the width (NaN = no motion).
+    Vectorized over all frames: abs frame difference -> per-column energy -> weighted mean.
+    """
+    if len(frames) < 2:
+        return np.full(len(frames), np.nan)
+    diffs = np.abs(np.diff(frames.astype(np.int16), axis=0))          # (N-1, h, w)
+    energy = diffs.sum(axis=1, dtype=np.float32)                        # (N-1, w)
+    # Remove the per-frame noise floor (compression flicker, camera shake)
+    energy = np.maximum(energy - np.median(energy, axis=1, keepdims=True), 0)
+
+    totals = energy.sum(axis=1)
+    xs = (np.arange(energy.shape[1], dtype=np.float32) + 0.5) / energy.shape[1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        centroids = (energy @ xs) / totals
+    full_change = frames.shape[1] * frames.shape[2] * 255.0
+    centroids[totals < MIN_MOTION_FRACTION * full_change] = np.nan
+    # N-1 differences -> N samples (the first frame reuses the first difference)
+    return np.concatenate([centroids[:1], centroids])
+
+def smooth_path(centroids, fps=ANALYSIS_FPS, smoothing_sec=SMOOTHING_SEC):
+    """Fills gaps (hold last position, start centered) and applies a moving average."""
+    path = np.array(centroids, dtype=np.float64)
+    if np.all(np.isnan(path)):
+        return np.full(len(path), 0.5)
+    # Forward-fill, then back-fill the leading gap
+    idx = np.where(~np.isnan(path), np.arange(len(path)), 0)
+    np.maximum.accumulate(idx, out=idx)
+    path = path[idx]
+    first_valid = np.argmax(~np.isnan(path))
+    path[:first_valid] = path[first_valid]
+
+    window = max(1, int(round(smoothing_sec * fps)))
+    if window > 1 and len(path) > 1:
+        padded = np.pad(path, (window // 2, window - 1 - window // 2), mode="edge")
+        path = np.convolve(padded, np.ones(window) / window, mode="valid")
+    return path
+
+def compute_tracking_path(video_path, start, end, src_w, src_h, aspect=(9, 16), fps=ANALYSIS_FPS, job_class="interactive"):
+    """Crop path that keeps the moving subject inside a centered-height 9:16 window."""
+    crop_h = int(src_h // 2 * 2)
+    crop_w = min(int(src_w // 2 * 2), int((src_h * aspect[0] / aspect[1]) // 2 * 2))
+
+    frames = decode_analysis_frames(video_path, start, end, fps=fps, job_class=job_class)
+    centers = smooth_path(motion_centroids(frames), fps=fps) * src_w
+    if len(centers) == 0:
+        centers = np.array([src_w / 2])
+
+    xs = np.clip(centers - crop_w / 2, 0, src_w - crop_w)
+    xs = (xs // 2 * 2).astype(int)
+    times = np.arange(len(xs)) / fps
+    return TrackingPath(times, xs, crop_w, crop_h)
+
+def write_sendcmd_file(path, track, target="crop@track"):
+    """ffmpeg `sendcmd` script that moves the crop window along the path."""
+    with open(path, "w", encoding="utf-8") as f:
+        last_x = None
+        for t, x in zip(track.times, track.xs):
+            if x != last_x:
+                f.write(f"{t:.3f} {target} x {x};\n")
+                last_x = x
+    return path
+
+def crop_x_at(track, t):
+    """Interpolated crop left edge at time t (seconds since clip start)."""
+    x = np.interp(t, track.times, track.xs)
+    return int(x // 2 * 2)
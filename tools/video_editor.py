@@ -8,31 +8,56 @@ if not hasattr(PIL.Image, 'ANTIALIAS'):
 
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.video.fx.all import crop, resize
-from moviepy.video.VideoClip import ImageClip
-from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
-from PIL import Image, ImageDraw, ImageFont
 import numpy as np
 import tempfile
 import cv2
 import os
+import json
+import time
+import shutil
 import subprocess
 import imageio_ffmpeg
+from functools import lru_cache
+from tools.chunked_transcode import should_chunk, transcode_chunked
+from tools.encode_profiles import AUDIO_BITRATE_KBPS, UPLOAD_TARGET_MB, probe_video, profile_ffmpeg_args, profile_filters, select_profile
+from tools.ffmpeg_governor import governor
+from tools.ffmpeg_progress import ProgressParser, log_perf, with_progress_pipe
+from tools.tracing import current_span, span, traced
+from tools.tracking_crop import compute_tracking_path, crop_x_at, write_sendcmd_file
+from tools.workspace import get_workspace_manager
+from tools.watermark import WATERMARK_TEXT, blend_watermark, get_watermark_overlay, get_watermark_png, render_watermark
 from moviepy.editor import VideoFileClip, vfx
 
 # 1. FIND FFMPEG AUTOMATICALLY
 # This finds the ffmpeg.exe that MoviePy installed, so you don't need to install it manually.
 FFMPEG_BINARY = imageio_ffmpeg.get_ffmpeg_exe()
 
+# 2. CLIP RENDER ENGINE
+# "ffmpeg"  = one ffmpeg filtergraph does seek/trim/crop/scale/watermark/encode (fast)
+# "moviepy" = legacy frame-by-frame Python compositing
+CLIP_ENGINES = ("ffmpeg", "moviepy")
+DEFAULT_CLIP_ENGINE = os.environ.get("CLIP_ENGINE", "ffmpeg")
+VIRAL_SIZE = (1080, 1920)
+
+# 3. CROP MODES
+# "center" = fixed center 9:16 window
+# "track"  = window follows the motion centroid (see tools/tracking_crop.py)
+CROP_MODES = ("center", "track")
+
+@lru_cache(maxsize=1)
+def get_ffprobe_binary():
+    """ffprobe next to the ffmpeg binary, else the system one. None if neither exists."""
+    local = os.path.join(os.path.dirname(FFMPEG_BINARY), os.path.basename(FFMPEG_BINARY).replace("ffmpeg", "ffprobe"))
+    if local != FFMPEG_BINARY and os.path.exists(local):
+        return local
+    return shutil.which("ffprobe")
+
 def get_rotation(video_path):
     """
     Robust Rotation Detector: Scans ALL metadata for rotation flags.
     """
     try:
-        # Check if ffprobe is next to ffmpeg
-        ffprobe_binary = FFMPEG_BINARY.replace("ffmpeg", "ffprobe")
-        if not os.path.exists(ffprobe_binary):
-            # Fallback to system command if not found locally
-            ffprobe_binary = "ffprobe"
+        ffprobe_binary = get_ffprobe_binary() or "ffprobe"
 
         cmd = [
             ffprobe_binary, 
@@ -42,7 +67,7 @@ def get_rotation(video_path):
             "-show_format", 
             video_path
         ]
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        result = governor.run(cmd, job_class="probe", text=True)
         data = json.loads(result.stdout)
 
         for stream in data.get('streams', []):
@@ -59,51 +84,136 @@ def get_rotation(video_path):
         print(f"⚠️ Rotation Detection Failed: {e}")
         return 0
 
+def get_media_duration(video_path):
+    """Container duration in seconds (ffprobe, else OpenCV frame count / fps). None if unknown."""
+    ffprobe_binary = get_ffprobe_binary()
+    if ffprobe_binary:
+        try:
+            cmd = [ffprobe_binary, "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", video_path]
+            return float(governor.run(cmd, job_class="probe", text=True).stdout.strip())
+        except (ValueError, subprocess.TimeoutExpired):
+            pass
+    cap = cv2.VideoCapture(video_path)
+    try:
+        frames = cap.get(cv2.CAP_PROP_FRAME_COUNT)
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return frames / fps if frames > 0 and fps > 0 else None
+    finally:
+        cap.release()
+
 def create_watermark_image(text, width, height):
     """
-    Creates a transparent PNG image with text using purely Python (Pillow).
-    Returns a numpy array readable by MoviePy.
+    Full-frame transparent watermark as a numpy array (RGBA).
+    The renderers use the cropped, cached overlay from tools/watermark.py instead.
     """
-    # Create a transparent canvas (RGBA)
-    # We make it the same size as the video frame to make positioning easy
-    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(img)
-    
-    # Load default font (or try to load a system font)
+    return np.array(render_watermark(text, width, height))
+
+def run_ffmpeg(cmd, expected_outputs, label="job", job_class="interactive"):
+    """
+    Runs an ffmpeg command through the process-wide governor (see tools/ffmpeg_governor.py);
+    raises RuntimeError (with the stderr tail) unless every output was written.
+    """
+    if "-hide_banner" not in cmd:
+        cmd = [cmd[0], "-hide_banner"] + list(cmd[1:])  # Keep the error tail about the error, not the build
     try:
-        # Try 'consola.ttf' (Windows code font) for a "Data/Tech" look.
-        # Use size 50 so it's readable on mobile.
-        font = ImageFont.truetype("consola.ttf", 50)
-    except:
-        # Fallback to default ugly font if Arial fails
-        font = ImageFont.load_default()
+        result = governor.run(cmd, job_class=job_class, text=True)
+    except subprocess.TimeoutExpired as e:
+        raise RuntimeError(f"FFmpeg {label} timed out after {e.timeout:.0f}s") from e
+    missing = [p for p in expected_outputs if not os.path.exists(p) or os.path.getsize(p) == 0]
+    if result.returncode != 0 or missing:
+        error_tail = "\n".join(result.stderr.strip().splitlines()[-5:])
+        raise RuntimeError(f"FFmpeg {label} failed: {error_tail}")
+    return result
 
-    # Text Settings
-    text_content = "COURT LENS AI"
-    
-    # Calculate text position (Centered horizontally, near bottom)
-    # Get bounding box of text
-    left, top, right, bottom = draw.textbbox((0, 0), text_content, font=font)
-    text_w = right - left
-    text_h = bottom - top
-    
-    x = (width - text_w) / 2
-    y = height - 150 # 150 pixels from bottom
-    
-    # Draw "Shadow" (Black) for readability
-    draw.text((x+2, y+2), text_content, font=font, fill=(0, 0, 0, 180))
-    # Draw "Main Text" (White)
-    draw.text((x, y), text_content, font=font, fill=(255, 255, 255, 230))
-    
-    return np.array(img)
+def _validate_clip_window(start_time, end_time, duration=None):
+    """Clip window in seconds: start floored at 0, end clamped to `duration` when known."""
+    start = max(float(start_time), 0.0)
+    end = float(end_time)
+    if duration: end = min(end, duration)
+    if start >= end: raise ValueError("Invalid timestamps")
+    return start, end
 
-def create_viral_clip(video_path, start_time, end_time):
+def create_viral_clip(video_path, start_time, end_time, engine=None, output_path=None, crop_mode="center", job_class="interactive"):
     """
     Cuts, Crops to 9:16, Resizes to 1080x1920, and adds Watermark.
+    engine: "ffmpeg" (single filtergraph, default) or "moviepy" (legacy compositing).
+    output_path: where to write the MP4 (default: a fresh janitor-managed workspace).
+    crop_mode: "center" (fixed window) or "track" (follows the player's motion).
+    job_class: governor admission class ("interactive" or "background" for pre-renders).
     """
-    fd, output_path = tempfile.mkstemp(suffix="_viral.mp4")
-    os.close(fd)
+    engine = engine or DEFAULT_CLIP_ENGINE
+    if engine not in CLIP_ENGINES:
+        raise ValueError(f"Unknown clip engine: {engine} (expected one of {CLIP_ENGINES})")
+    if crop_mode not in CROP_MODES:
+        raise ValueError(f"Unknown crop mode: {crop_mode} (expected one of {CROP_MODES})")
+
+    if output_path is None:
+        output_path = get_workspace_manager().create("clip", hold=False).path("viral.mp4")
 
+    if engine == "ffmpeg":
+        return _render_viral_clip_ffmpeg(video_path, start_time, end_time, output_path, crop_mode, job_class)
+    return _render_viral_clip_moviepy(video_path, start_time, end_time, output_path, crop_mode, job_class)
+
+def get_video_size(video_path):
+    cap = cv2.VideoCapture(video_path)
+    try:
+        return int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+
+def _escape_filter_path(path):
+    """Normalizes a file path for use as a quoted filter option value inside -filter_complex."""
+    return path.replace("\\", "/")
+
+def _render_viral_clip_ffmpeg(video_path, start_time, end_time, output_path, crop_mode="center", job_class="interactive"):
+    """
+    Single ffmpeg invocation: input seek + trim, crop to 9:16 (center or tracked),
+    scale to 1080x1920, overlay the cached watermark PNG, encode H.264/AAC.
+    """
+    # Clamp the end to the media like the MoviePy engine does
+    start, end = _validate_clip_window(start_time, end_time, get_media_duration(video_path))
+    out_w, out_h = VIRAL_SIZE
+    watermark_png, wm_x, wm_y = get_watermark_png(WATERMARK_TEXT, out_w, out_h)
+
+    cmd_file = None
+    if crop_mode == "track":
+        # Time-varying crop: sendcmd moves crop@track's x along the smoothed motion path
+        src_w, src_h = get_video_size(video_path)
+        track = compute_tracking_path(video_path, start, end, src_w, src_h, job_class=job_class)
+        fd, cmd_file = tempfile.mkstemp(suffix="_track.cmd")
+        os.close(fd)
+        write_sendcmd_file(cmd_file, track)
+        crop_filter = (
+            f"sendcmd=f='{_escape_filter_path(cmd_file)}',"
+            f"crop@track=w={track.crop_w}:h={track.crop_h}:x={track.xs[0]}:y=0"
+        )
+    else:
+        # Same geometry as the MoviePy path: even-sized 9:16 window, centered, full height
+        crop_filter = "crop=w='min(iw,trunc(ih*9/32)*2)':h='trunc(ih/2)*2':x='(iw-ow)/2':y=0"
+
+    filtergraph = (
+        f"[0:v]{crop_filter},"
+        f"scale={out_w}:{out_h},setsar=1[base];"
+        f"[base][1:v]overlay={wm_x}:{wm_y}:format=auto[out]"
+    )
+    cmd = [
+        FFMPEG_BINARY, "-y",
+        "-ss", f"{start:.3f}", "-t", f"{end - start:.3f}", "-i", video_path,  # Input seek (fast)
+        "-i", watermark_png,
+        "-filter_complex", filtergraph,
+        "-map", "[out]", "-map", "0:a?",
+        "-c:v", "libx264", "-preset", "fast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac",
+        "-movflags", "+faststart",
+        output_path
+    ]
+    try:
+        run_ffmpeg(cmd, [output_path], "clip render", job_class=job_class)
+    finally:
+        if cmd_file and os.path.exists(cmd_file): os.remove(cmd_file)
+    return output_path
+
+def _render_viral_clip_moviepy(video_path, start_time, end_time, output_path, crop_mode="center", job_class="interactive"):
     video = VideoFileClip(video_path)
     
     try:
@@ -122,34 +232,38 @@ def create_viral_clip(video_path, start_time, end_time):
         crop_width = int((h * target_ratio) // 2 * 2)
         target_height = int(h // 2 * 2)
         
-        x_center = w / 2
-        x1 = x_center - (crop_width / 2)
-        x2 = x_center + (crop_width / 2)
-        
-        cropped_clip = crop(clip, x1=x1, y1=0, x2=x2, y2=target_height)
+        if crop_mode == "track":
+            # Time-varying window: slice each frame at the tracked x position
+            track = compute_tracking_path(video_path, start, end, w, h, job_class=job_class)
+            cropped_clip = clip.fl(
+                lambda get_frame, t: get_frame(t)[:track.crop_h, crop_x_at(track, t):crop_x_at(track, t) + track.crop_w]
+            )
+        else:
+            x_center = w / 2
+            x1 = x_center - (crop_width / 2)
+            x2 = x_center + (crop_width / 2)
+            
+            cropped_clip = crop(clip, x1=x1, y1=0, x2=x2, y2=target_height)
         
         # 3. Resize to HD (1080x1920)
-        final_clip = resize(cropped_clip, newsize=(1080, 1920))
-        
-        # --- NEW STEP: WATERMARK OVERLAY ---
-        # Generate the text image
-        watermark_array = create_watermark_image("COURT LENS A", 1080, 1920)
-        
-        # Create a MoviePy clip from that image
-        txt_clip = ImageClip(watermark_array).set_duration(final_clip.duration)
+        final_clip = resize(cropped_clip, newsize=VIRAL_SIZE)
         
-        # Composite them (Layer Text on top of Video)
-        final_composite = CompositeVideoClip([final_clip, txt_clip])
+        # --- WATERMARK OVERLAY ---
+        # Blend the cached, cropped overlay into the text band of each frame only
+        overlay = get_watermark_overlay(WATERMARK_TEXT, *VIRAL_SIZE)
+        final_composite = final_clip.fl_image(lambda frame: blend_watermark(frame, overlay))
         
-        # 4. Write File
-        final_composite.write_videofile(
-            output_path, 
-            codec="libx264", 
-            audio_codec="aac",
-            preset="fast", 
-            ffmpeg_params=["-pix_fmt", "yuv420p"], 
-            logger="bar" 
-        )
+        # 4. Write File (MoviePy spawns its own ffmpeg: hold a governor slot meanwhile)
+        with governor.slot(job_class):
+            final_composite.write_videofile(
+                output_path, 
+                codec="libx264", 
+                audio_codec="aac",
+                preset="fast", 
+                threads=governor.threads,
+                ffmpeg_params=["-pix_fmt", "yuv420p"], 
+                logger="bar" 
+            )
             
     finally:
         video.close()
@@ -171,26 +285,104 @@ def extract_frame(video_path, timestamp, output_path):
     except:
         return None
 
-def normalize_input_video(input_path):
+def _log_transcode_perf(label, job_class, input_path, output_path, duration, wall, frames, returncode):
+    log_perf({
+        "label": label,
+        "job_class": job_class,
+        "input": os.path.basename(input_path),
+        "input_mb": round(os.path.getsize(input_path) / (1024 * 1024), 2),
+        "output_mb": round(os.path.getsize(output_path) / (1024 * 1024), 2) if os.path.exists(output_path) else None,
+        "duration_s": round(duration, 3) if duration else None,
+        "wall_s": round(wall, 3),
+        "realtime_x": round(duration / wall, 2) if duration and wall > 0 else None,
+        "frames": frames,
+        "avg_fps": round(frames / wall, 1) if wall > 0 else None,
+        "returncode": returncode,
+    })
+
+def run_ffmpeg_with_progress(cmd, input_path, label="job", job_class="interactive", on_progress=None):
+    """
+    Runs ffmpeg with `-progress pipe:1`, forwarding ProgressUpdates to on_progress
+    and appending a throughput record (x realtime) to the perf log.
+    Returns the CompletedProcess (stderr only).
+    """
+    duration = get_media_duration(input_path)
+    parser = ProgressParser(duration, on_progress)
+    t_start = time.monotonic()
+    result = governor.stream(with_progress_pipe(cmd), parser.feed, job_class=job_class)
+    wall = time.monotonic() - t_start
+
+    _log_transcode_perf(label, job_class, input_path, cmd[-1], duration, wall,
+                        parser.last.frame if parser.last else 0, result.returncode)
+    return result
+
+def extract_audio_track(input_path, output_path):
+    """
+    Stream-copies the first audio track into `output_path` (use .mka: it takes
+    any codec). Returns the path, or None when there is no audio.
+    """
+    if not probe_video(input_path).has_audio:
+        return None
+    cmd = [FFMPEG_BINARY, "-y", "-i", input_path, "-map", "0:a:0", "-vn", "-c:a", "copy", output_path]
+    try:
+        run_ffmpeg(cmd, [output_path], "audio extract", job_class="interactive")
+    except RuntimeError as e:
+        print(f"⚠️ Audio Extract Failed: {e}")
+        return None
+    return output_path
+
+def add_audio_track(video_path, audio_path, output_path=None):
+    """
+    Muxes `audio_path` into an already normalized video: the video stream is
+    copied, only the audio is encoded (AAC). Returns the new path, or
+    `video_path` if muxing fails.
+    """
+    output_path = output_path or video_path.rsplit(".", 1)[0] + "_audio.mp4"
+    cmd = [
+        FFMPEG_BINARY, "-y", "-i", video_path, "-i", audio_path,
+        "-map", "0:v:0", "-map", "1:a:0", "-c:v", "copy",
+        "-c:a", "aac", "-b:a", f"{AUDIO_BITRATE_KBPS}k", "-shortest",
+        "-movflags", "+faststart", output_path
+    ]
+    try:
+        with span("video.add_audio", bytes=os.path.getsize(video_path)):
+            run_ffmpeg(cmd, [output_path], "audio mux", job_class="interactive")
+    except RuntimeError as e:
+        print(f"⚠️ Audio Mux Failed: {e}")
+        return video_path
+    return output_path
+
+@traced("video.normalize")
+def normalize_input_video(input_path, on_progress=None, keep_audio=False, target_mb=UPLOAD_TARGET_MB, chunked=None):
+    """
+    Rotates/downscales/compresses an upload with an adaptive profile
+    (tools/encode_profiles.py): resolution, fps cap, crf/preset and bitrate cap
+    follow the clip's duration, resolution and the target upload size.
+    keep_audio: keep the soundtrack (creator pack clips); dropped otherwise.
+    on_progress: optional callback receiving tools.ffmpeg_progress.ProgressUpdate.
+    chunked: force (True/False) the parallel chunked mode; None = auto for long videos.
+    """
     try:
         print(f"🔄 Checking video: {input_path}")
         output_path = input_path.rsplit(".", 1)[0] + "_fixed.mp4"
         
-        # 1. Detect Rotation
-        rotation = get_rotation(input_path)
-        print(f"📐 Detected Rotation Flag: {rotation}°")
+        with span("video.probe", bytes=os.path.getsize(input_path)) as probe_span:
+            # 1. Detect Rotation
+            rotation = get_rotation(input_path)
+            print(f"📐 Detected Rotation Flag: {rotation}°")
+
+            # 2. Pick the encode profile
+            info = probe_video(input_path)
+            profile = select_profile(info, target_mb=target_mb, keep_audio=keep_audio)
+            probe_span.set(duration_s=info.duration, width=info.width, height=info.height, fps=info.fps,
+                           rotation=rotation, profile=profile.name)
+        print(f"🎛️ Encode Profile: {profile.name} ({profile.short_side}p, fps cap {profile.fps or 'source'}, "
+              f"crf {profile.crf}, {profile.preset}, audio {'on' if profile.audio_kbps else 'off'})")
         
-        # 2. BUILD FFMPEG COMMAND
+        # 3. BUILD FFMPEG COMMAND
         # We build a complex filter to handle Rotation AND Scaling simultaneously.
-        
-        # Smart Scale Logic:
-        # "scale='if(gt(iw,ih),-2,720)':'if(gt(iw,ih),720,-2)'"
-        # Translation: 
-        # - If Landscape (Width > Height): Set Height to 720, calc Width automatically.
-        # - If Portrait (Height > Width): Set Width to 720, calc Height automatically.
-        # This guarantees 720p resolution regardless of orientation.
-        scale_filter = "scale='if(gt(iw,ih),-2,720)':'if(gt(iw,ih),720,-2)'"
-        
+        # The profile's scale filter is orientation-aware: it sets the SHORTER edge
+        # (height for landscape, width for portrait), so it must come after the transpose.
         vf_chain = []
         
         # Add Rotation Filter if needed
@@ -202,8 +394,8 @@ def normalize_input_video(input_path):
         elif rotation == 270:
             vf_chain.append("transpose=2") 
             
-        # Add Scaling Filter
-        vf_chain.append(scale_filter)
+        # Add Scaling + FPS cap Filters
+        vf_chain.extend(profile_filters(profile))
         
         # Combine filters with commas
         full_vf_string = ",".join(vf_chain)
@@ -212,29 +404,47 @@ def normalize_input_video(input_path):
             FFMPEG_BINARY,
             "-y",               # Overwrite
             "-i", input_path,   # Input
-            "-c:v", "libx264",  # Video Codec
-            
-            # --- AGGRESSIVE COMPRESSION ---
-            "-preset", "veryfast", # Faster encoding
-            "-crf", "28",        # 28 = High Compression (Web Standard). 23 was too big.
-            "-pix_fmt", "yuv420p",
-            
-            "-vf", full_vf_string, # Apply Rotation + Resize
+            "-vf", full_vf_string, # Apply Rotation + Resize + FPS cap
             "-metadata:s:v:0", "rotate=0", # Clear rotation flag
-            
-            "-c:a", "aac",      # Audio Codec
-            "-b:a", "128k"      # Limit audio bitrate to save space
-        ]
+        ] + profile_ffmpeg_args(profile) # Codec, crf/preset, bitrate cap, audio
         
         cmd.append(output_path)
         
-        # 3. Execute
+        # 4. Execute
+        if chunked is None:
+            chunked = should_chunk(info.duration)
+        if chunked:
+            # Long upload: keyframe-split, encode chunks in parallel, concat without re-encoding
+            print(f"⚡ Compressing & Normalizing in parallel chunks: -vf {full_vf_string}")
+            t_start = time.monotonic()
+            try:
+                with span("video.transcode", mode="chunked", profile=profile.name, duration_s=info.duration) as transcode_span:
+                    n_chunks = transcode_chunked(input_path, output_path, full_vf_string, profile,
+                                                 duration=info.duration, on_progress=on_progress)
+                    transcode_span.set(chunks=n_chunks, output_bytes=os.path.getsize(output_path))
+                wall = time.monotonic() - t_start
+                _log_transcode_perf(f"normalize (chunked x{n_chunks})", "interactive", input_path, output_path,
+                                    info.duration, wall, round((info.duration or 0) * (profile.fps or info.fps)), 0)
+                file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
+                print(f"✅ Video Ready: {output_path} ({file_size_mb:.1f} MB, {n_chunks} chunks)")
+                current_span().set(output_bytes=os.path.getsize(output_path))
+                return output_path
+            except Exception as e:  # Any chunking failure: the single pass below still normalizes the upload
+                print(f"⚠️ Chunked transcode failed, falling back to a single pass: {e}")
+
         print(f"⚡ Compressing & Normalizing: {' '.join(cmd)}")
-        subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Interactive class: admitted ahead of background clip renders, capped threads + timeout
+        with span("video.transcode", mode="single", profile=profile.name, duration_s=info.duration) as transcode_span:
+            result = run_ffmpeg_with_progress(cmd, input_path, "normalize", "interactive", on_progress)
+            transcode_span.set(returncode=result.returncode,
+                               output_bytes=os.path.getsize(output_path) if os.path.exists(output_path) else None)
+        if result.returncode != 0:
+            print(f"⚠️ FFmpeg exited with {result.returncode}: {result.stderr.strip().splitlines()[-1:]}")
         
-        if os.path.exists(output_path):
+        if result.returncode == 0 and os.path.exists(output_path):
             file_size_mb = os.path.getsize(output_path) / (1024 * 1024)
             print(f"✅ Video Ready: {output_path} ({file_size_mb:.1f} MB)")
+            current_span().set(output_bytes=os.path.getsize(output_path))
             return output_path
         else:
             print("❌ FFmpeg failed. Returning original.")
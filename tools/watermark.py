@@ -0,0 +1,106 @@
+# tools/watermark.py
+"""
+Watermark overlays for the clip renderers.
+
+The overlay is rendered once per (text, frame size, font), cropped to the
+bounding box of its visible pixels and cached. Blending then only touches that
+small band of each frame, so per-frame cost scales with the text area instead
+of the 1080x1920 frame.
+"""
+import os
+import hashlib
+import tempfile
+import threading
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+WATERMARK_TEXT = "COURT LENS AI"
+WATERMARK_FONT = "consola.ttf"   # Windows code font for a "Data/Tech" look
+WATERMARK_FONT_SIZE = 50         # Readable on mobile
+WATERMARK_BOTTOM_OFFSET = 150    # Pixels from the bottom edge
+
+# Tried in order when the requested font is missing (e.g. consola.ttf on Linux)
+FALLBACK_FONTS = ["DejaVuSansMono.ttf", "DejaVuSans.ttf", "LiberationMono-Regular.ttf"]
+
+# rgba:    uint8 (h, w, 4) cropped overlay, e.g. for the ffmpeg PNG
+# premult: float32 (h, w, 3) color already multiplied by alpha
+# inv_alpha: float32 (h, w, 1) = 1 - alpha
+WatermarkOverlay = namedtuple("WatermarkOverlay", ["x", "y", "rgba", "premult", "inv_alpha"])
+
+@lru_cache(maxsize=8)
+def load_watermark_font(font_name=WATERMARK_FONT, size=WATERMARK_FONT_SIZE):
+    for candidate in [font_name] + FALLBACK_FONTS:
+        try:
+            return ImageFont.truetype(candidate, size)
+        except OSError:
+            continue
+    try:
+        return ImageFont.load_default(size=size)  # Pillow >= 10.1 (scalable)
+    except TypeError:
+        return ImageFont.load_default()
+
+def render_watermark(text, width, height, font_name=WATERMARK_FONT, font_size=WATERMARK_FONT_SIZE):
+    """Full-frame transparent RGBA canvas with the text centered near the bottom."""
+    img = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    font = load_watermark_font(font_name, font_size)
+
+    # Calculate text position (Centered horizontally, near bottom)
+    left, top, right, bottom = draw.textbbox((0, 0), text, font=font)
+    x = (width - (right - left)) / 2
+    y = height - WATERMARK_BOTTOM_OFFSET
+
+    # Draw "Shadow" (Black) for readability
+    draw.text((x+2, y+2), text, font=font, fill=(0, 0, 0, 180))
+    # Draw "Main Text" (White)
+    draw.text((x, y), text, font=font, fill=(255, 255, 255, 230))
+    return img
+
+@lru_cache(maxsize=16)
+def get_watermark_overlay(text, width, height, font_name=WATERMARK_FONT, font_size=WATERMARK_FONT_SIZE):
+    """Cached overlay cropped to its visible bounding box, with blend factors precomputed."""
+    img = render_watermark(text, width, height, font_name, font_size)
+    bbox = img.getchannel('A').getbbox() or (0, 0, 1, 1)
+    rgba = np.array(img.crop(bbox))
+    rgba.flags.writeable = False
+
+    alpha = rgba[:, :, 3:4].astype(np.float32) / 255.0
+    premult = rgba[:, :, :3].astype(np.float32) * alpha
+    return WatermarkOverlay(bbox[0], bbox[1], rgba, premult, 1.0 - alpha)
+
+def blend_watermark(frame, overlay):
+    """
+    Alpha-blends `overlay` onto an RGB frame, touching only the overlay region.
+    Writable frames are blended in place and returned, so the cost follows the
+    text band, not the frame size; read-only frames (e.g. straight from a
+    MoviePy reader) are copied first.
+    """
+    out = frame if frame.flags.writeable else frame.copy()
+    h, w = overlay.rgba.shape[:2]
+    region = out[overlay.y:overlay.y + h, overlay.x:overlay.x + w]
+    # Frames smaller than the overlay canvas: clip the overlay to what fits
+    rh, rw = region.shape[:2]
+    blended = region[:, :, :3] * overlay.inv_alpha[:rh, :rw] + overlay.premult[:rh, :rw]
+    region[:, :, :3] = blended.astype(np.uint8)
+    return out
+
+def get_watermark_png(text, width, height, font_name=WATERMARK_FONT, font_size=WATERMARK_FONT_SIZE):
+    """
+    Writes the cropped overlay to the temp dir for ffmpeg's `overlay` filter.
+    Returns (png_path, x, y): where to place it on a width x height frame.
+    Not memoized: the file is checked on every call and rewritten if a temp
+    cleaner removed it (only the in-memory overlay is cached).
+    """
+    overlay = get_watermark_overlay(text, width, height, font_name, font_size)
+    cache_dir = os.path.join(tempfile.gettempdir(), "courtlens_watermarks")
+    os.makedirs(cache_dir, exist_ok=True)
+    digest = hashlib.sha1(f"{text}|{width}x{height}|{font_name}|{font_size}".encode("utf-8")).hexdigest()[:16]
+    png_path = os.path.join(cache_dir, f"wm_{digest}.png")
+    if not os.path.exists(png_path):
+        tmp_path = f"{png_path}.{os.getpid()}.{threading.get_ident()}.tmp.png"
+        Image.fromarray(overlay.rgba).save(tmp_path)
+        os.replace(tmp_path, png_path)
+    return png_path, overlay.x, overlay.y
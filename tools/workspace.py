@@ -0,0 +1,405 @@
+# tools/workspace.py
+"""
+Scoped workspaces for every temp artifact in the pipeline.
+
+Each job (upload, frame extraction, clip export, ...) gets its own directory
+under WORKSPACE_ROOT, so concurrent sessions never share paths. Workspaces are
+reference counted: `create()` returns a held workspace that is deleted as soon
+as its last holder releases it; `create(hold=False)` is for outputs handed to a
+caller we can't track (they're reclaimed by the janitor after a grace period,
+or when their TTL runs out).
+
+WORKSPACE_ROOT is shared by the Streamlit app, the MCP server and its pool
+workers, so holds are visible across processes: a process holding a
+workspace keeps a `.lease.<pid>` file in it. Neither the janitor nor a
+release in another process deletes a workspace while a live process has a
+lease; leases of dead processes are ignored (the janitor removes them).
+A workspace is renamed to a `.deleting-*` tombstone before it is removed, so
+a holder arriving mid-delete gets FileNotFoundError from `retain()` instead
+of writing into a directory that is going away.
+
+The janitor also enforces a total size cap (evicting idle, unheld workspaces
+oldest first) and a maximum age (stale holders, e.g. abandoned Streamlit
+sessions, don't pin disk forever).
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+
+WORKSPACE_ROOT = os.environ.get("WORKSPACE_ROOT", os.path.join(tempfile.gettempdir(), "courtlens_workspaces"))
+WORKSPACE_MAX_MB = float(os.environ.get("WORKSPACE_MAX_MB", 4096))
+WORKSPACE_MAX_AGE_HOURS = float(os.environ.get("WORKSPACE_MAX_AGE_HOURS", 6))
+WORKSPACE_GRACE_SEC = float(os.environ.get("WORKSPACE_GRACE_SEC", 600))       # Unheld outputs live at least this long
+WORKSPACE_JANITOR_SEC = float(os.environ.get("WORKSPACE_JANITOR_SEC", 300))   # Janitor sweep interval
+
+_META_FILE = ".workspace.json"
+_TOUCH_FILE = ".last_used"
+_LEASE_PREFIX = ".lease."
+_TOMBSTONE_PREFIX = ".deleting-"
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except PermissionError:
+        return True   # Exists, owned by another user
+    except OSError:
+        return False
+    return True
+
+def _lease_pids(root):
+    """Pids with a lease file in `root` (live or not)."""
+    try:
+        names = os.listdir(root)
+    except OSError:
+        return []
+    return [int(n[len(_LEASE_PREFIX):]) for n in names
+            if n.startswith(_LEASE_PREFIX) and n[len(_LEASE_PREFIX):].isdigit()]
+
+def _foreign_holders(root):
+    """Live processes other than this one holding a lease in `root`."""
+    return [pid for pid in _lease_pids(root) if pid != os.getpid() and _pid_alive(pid)]
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass  # Deleted while walking
+    return total
+
+class Workspace:
+    """One job's directory. Use as a context manager to release it on exit."""
+
+    def __init__(self, manager, job_id, kind):
+        self.manager = manager
+        self.job_id = job_id
+        self.kind = kind
+        self.root = os.path.join(manager.root, job_id)
+
+    def path(self, name):
+        """Absolute path for an artifact inside the workspace (parent dirs are created)."""
+        full = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(full), exist_ok=True)
+        return full
+
+    def subdir(self, name):
+        full = os.path.join(self.root, name)
+        os.makedirs(full, exist_ok=True)
+        return full
+
+    def remove(self, name):
+        """Deletes one artifact early (e.g. the raw upload once it's normalized)."""
+        full = os.path.join(self.root, name)
+        if os.path.isdir(full):
+            shutil.rmtree(full, ignore_errors=True)
+        elif os.path.exists(full):
+            os.remove(full)
+
+    def touch(self):
+        """Marks the workspace as recently used (renews the holder's lease)."""
+        try:
+            os.utime(os.path.join(self.root, _TOUCH_FILE))
+        except FileNotFoundError:
+            pass
+
+    def exists(self):
+        return os.path.isdir(self.root)
+
+    def lease_pids(self):
+        """Pids of the processes holding this workspace (live or not)."""
+        return _lease_pids(self.root)
+
+    def meta(self):
+        try:
+            with open(os.path.join(self.root, _META_FILE), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @property
+    def expires_at(self):
+        """Unix time after which the janitor may delete this workspace (None = no TTL)."""
+        return self.meta().get("expires")
+
+    def size_bytes(self):
+        return _dir_size(self.root)
+
+    def retain(self):
+        self.manager.retain(self.job_id)
+        return self
+
+    def release(self, keep=False):
+        self.manager.release(self.job_id, keep=keep)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def __repr__(self):
+        return f"Workspace({self.job_id!r})"
+
+class WorkspaceManager:
+    def __init__(self, root=WORKSPACE_ROOT, max_bytes=WORKSPACE_MAX_MB * 1024 * 1024,
+                 max_age_sec=WORKSPACE_MAX_AGE_HOURS * 3600, grace_sec=WORKSPACE_GRACE_SEC):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_sec = max_age_sec
+        self.grace_sec = grace_sec
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._refs = {}                   # job_id -> holder count in this process (mirrored by a lease file)
+        self._janitor = None
+        self.deleted = 0
+        self.bytes_freed = 0
+
+    # --- LIFECYCLE ---
+    def create(self, kind="job", hold=True, ttl=None):
+        """
+        New empty workspace. hold=True: deleted when released; hold=False: janitor-managed.
+        ttl: seconds after which an unheld workspace is deleted (enforced by the janitor).
+        """
+        job_id = f"{kind}-{time.strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        ws = Workspace(self, job_id, kind)
+        os.makedirs(ws.root)
+        with open(os.path.join(ws.root, _META_FILE), "w", encoding="utf-8") as f:
+            created = time.time()
+            json.dump({"kind": kind, "created": created, "pid": os.getpid(),
+                       "expires": created + ttl if ttl else None}, f)
+        open(os.path.join(ws.root, _TOUCH_FILE), "w").close()
+        if hold:
+            self.retain(job_id)
+        return ws
+
+    def get(self, job_id):
+        """Existing workspace by id, or None if it's gone."""
+        if not job_id or os.sep in job_id or "/" in job_id or job_id.startswith("."):
+            return None  # Ids come from clients too (MCP): never resolve outside the root
+        root = os.path.join(self.root, job_id)
+        if not os.path.isdir(root):
+            return None
+        return Workspace(self, job_id, job_id.split("-", 1)[0])
+
+    def find(self, path):
+        """Workspace that contains `path`, or None for files outside the root."""
+        rel = os.path.relpath(os.path.abspath(path), os.path.abspath(self.root))
+        if rel.startswith(os.pardir) or rel == os.curdir:
+            return None
+        return self.get(rel.split(os.sep, 1)[0])
+
+    def _lease_path(self, job_id, pid=None):
+        return os.path.join(self.root, job_id, f"{_LEASE_PREFIX}{pid or os.getpid()}")
+
+    def retain(self, job_id):
+        """Adds one hold. Raises FileNotFoundError if the workspace is gone (or being deleted)."""
+        with self._lock:
+            if self._refs.get(job_id, 0) == 0:
+                # First hold in this process: the lease only lands in a live directory, never in a tombstone
+                with open(self._lease_path(job_id), "w"):
+                    pass
+            self._refs[job_id] = self._refs.get(job_id, 0) + 1
+
+    def release(self, job_id, keep=False):
+        """
+        Drops one hold; the last one in the last holding process deletes the
+        workspace (keep=True leaves it to the janitor, e.g. outputs handed to a client).
+        """
+        with self._lock:
+            count = self._refs.get(job_id, 0) - 1
+            if count > 0:
+                self._refs[job_id] = count
+                return
+            self._refs.pop(job_id, None)
+            try:
+                os.remove(self._lease_path(job_id))
+            except FileNotFoundError:
+                pass
+            tomb = None if keep else self._tombstone(job_id)
+        if tomb:
+            self._purge(tomb)
+
+    def held(self, job_id):
+        """True if this process or another live process holds the workspace. Read-only."""
+        return self.refcount(job_id) > 0 or bool(_foreign_holders(os.path.join(self.root, job_id)))
+
+    def _prune_leases(self, job_id):
+        """Removes leases of dead processes (and this process' own, if it holds nothing). Janitor only."""
+        with self._lock:
+            local = self._refs.get(job_id, 0)
+        for pid in _lease_pids(os.path.join(self.root, job_id)):
+            if (pid == os.getpid() and not local) or (pid != os.getpid() and not _pid_alive(pid)):
+                try:
+                    os.remove(self._lease_path(job_id, pid))
+                except FileNotFoundError:
+                    pass
+
+    @contextmanager
+    def holding(self, path_or_ws):
+        """Keeps the workspace behind a path alive for the duration of the block (no-op outside the root)."""
+        ws = path_or_ws if isinstance(path_or_ws, Workspace) else self.find(path_or_ws)
+        if ws is None:
+            yield None
+            return
+        ws.retain()
+        try:
+            yield ws
+        finally:
+            ws.release()
+
+    def refcount(self, job_id):
+        with self._lock:
+            return self._refs.get(job_id, 0)
+
+    def _tombstone(self, job_id, force=False):
+        """
+        Renames an unheld workspace (any workspace if `force`) to a tombstone;
+        returns its path, or None if it's held or gone. Call with the lock held.
+        """
+        if not force and self._refs.get(job_id, 0) > 0:
+            return None
+        root = os.path.join(self.root, job_id)
+        if not force and _foreign_holders(root):
+            return None
+        tomb = os.path.join(self.root, f"{_TOMBSTONE_PREFIX}{job_id}-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(root, tomb)
+        except FileNotFoundError:
+            return None
+        if not force and _foreign_holders(tomb):
+            os.rename(tomb, root)  # Another process retained it between the check and the rename
+            return None
+        self._refs.pop(job_id, None)
+        return tomb
+
+    def _purge(self, tomb):
+        size = _dir_size(tomb)
+        shutil.rmtree(tomb, ignore_errors=True)
+        with self._lock:
+            self.deleted += 1
+            self.bytes_freed += size
+        return size
+
+    def delete(self, job_id, force=True):
+        """
+        Deletes a workspace; with force=False only if nobody holds it.
+        Returns the bytes freed, or None if it was held (or already gone).
+        """
+        with self._lock:
+            tomb = self._tombstone(job_id, force=force)
+        return self._purge(tomb) if tomb else None
+
+    # --- JANITOR ---
+    def _scan(self):
+        """(job_id, last_used, size, held, expires) for every workspace on disk."""
+        entries = []
+        for job_id in os.listdir(self.root):
+            if job_id.startswith(_TOMBSTONE_PREFIX):
+                continue
+            root = os.path.join(self.root, job_id)
+            try:
+                last_used = os.path.getmtime(os.path.join(root, _TOUCH_FILE))
+            except OSError:
+                if not os.path.isdir(root):
+                    continue
+                last_used = os.path.getmtime(root)
+            ws = Workspace(self, job_id, job_id.split("-", 1)[0])
+            entries.append((job_id, last_used, _dir_size(root), self.held(job_id), ws.expires_at))
+        return entries
+
+    def sweep(self):
+        """
+        Removes stale leases and leftover tombstones, evicts expired
+        workspaces (older than max age, held or not; past their TTL and
+        unheld), then idle unheld ones oldest-first until the total fits the
+        size cap.
+        Returns {"removed": n, "freed_bytes": n}.
+        """
+        now = time.time()
+        removed = freed = 0
+        for name in os.listdir(self.root):
+            if name.startswith(_TOMBSTONE_PREFIX):
+                freed += self._purge(os.path.join(self.root, name))  # Interrupted delete
+            elif os.path.isdir(os.path.join(self.root, name)):
+                self._prune_leases(name)
+
+        entries = []
+        for job_id, last_used, size, held, expires in self._scan():
+            ttl_expired = expires is not None and now > expires and not held
+            if ttl_expired or now - last_used > self.max_age_sec:
+                if held:
+                    print(f"🧹 Workspace {job_id} expired while held (stale lease)")
+                size = self.delete(job_id, force=held)  # Re-checked under the lock: a holder may have just arrived
+                if size is not None:
+                    freed += size
+                    removed += 1
+            else:
+                entries.append((last_used, size, held, job_id))
+
+        total = sum(size for _, size, _, _ in entries)
+        for last_used, size, held, job_id in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if held or now - last_used < self.grace_sec:
+                continue
+            size = self.delete(job_id, force=False)
+            if size is None:
+                continue
+            freed += size
+            total -= size
+            removed += 1
+        return {"removed": removed, "freed_bytes": freed}
+
+    def start_janitor(self, interval=WORKSPACE_JANITOR_SEC):
+        """Runs sweep() every `interval` seconds on a daemon thread (idempotent)."""
+        if self._janitor is not None:
+            return
+
+        def loop():
+            while True:
+                try:
+                    self.sweep()
+                except Exception as e:  # Never let the janitor thread die
+                    print(f"⚠️ Workspace janitor failed: {e}")
+                time.sleep(interval)
+
+        self._janitor = threading.Thread(target=loop, name="workspace-janitor", daemon=True)
+        self._janitor.start()
+
+    # --- METRICS ---
+    def metrics(self):
+        entries = self._scan()
+        disk = shutil.disk_usage(self.root)
+        by_kind = {}
+        for job_id, _, size, _, _ in entries:
+            kind = job_id.split("-", 1)[0]
+            stats = by_kind.setdefault(kind, {"count": 0, "mb": 0.0})
+            stats["count"] += 1
+            stats["mb"] += size / (1024 * 1024)
+        return {
+            "root": self.root,
+            "workspaces": len(entries),
+            "held": sum(1 for e in entries if e[3]),
+            "used_mb": round(sum(e[2] for e in entries) / (1024 * 1024), 1),
+            "cap_mb": round(self.max_bytes / (1024 * 1024), 1),
+            "disk_free_mb": round(disk.free / (1024 * 1024), 1),
+            "disk_used_pct": round(100 * disk.used / disk.total, 1) if disk.total else None,
+            "deleted": self.deleted,
+            "freed_mb": round(self.bytes_freed / (1024 * 1024), 1),
+            "by_kind": {k: {"count": v["count"], "mb": round(v["mb"], 1)} for k, v in by_kind.items()},
+        }
+
+@lru_cache(maxsize=1)
+def get_workspace_manager():
+    """Process-wide manager (Streamlit reruns and the MCP server share it), with the janitor running."""
+    manager = WorkspaceManager()
+    manager.start_janitor()
+    return manager
@@ -0,0 +1,227 @@
+# tools/write_behind.py
+"""
+Write-behind queue for database inserts.
+
+`enqueue()` appends the row to a local SQLite journal and returns immediately;
+a background flusher groups pending rows into batch inserts and hands them to
+the sink. A failed batch stays in the journal and is retried with exponential
+backoff (rows that keep failing are parked as "dead" after WRITE_QUEUE_MAX_ATTEMPTS
+and kept for inspection). Rows journaled by a previous process are flushed as
+soon as the flusher starts.
+
+The sink is any callable `sink(table, rows)` that raises on failure, so the
+queue runs the same against Supabase, a local PostgREST or an in-process fake.
+`on_flush(table, rows)` is called after each successful batch (e.g. to
+invalidate read caches).
+Delivery is at-least-once: a batch whose insert committed but whose response
+was lost is sent again.
+Rows are stamped with `created_at` when they are journaled, so a batch that
+is retried later keeps the time the row was saved, not the flush time.
+"""
+import os
+import json
+import time
+import random
+import sqlite3
+import threading
+from datetime import datetime, timezone
+
+from tools.tracing import span
+
+WRITE_QUEUE_PATH = os.environ.get("WRITE_QUEUE_PATH", os.path.join(os.path.expanduser("~"), ".courtlens", "write_queue.db"))
+WRITE_QUEUE_BATCH = int(os.environ.get("WRITE_QUEUE_BATCH", 50))              # Rows per insert
+WRITE_QUEUE_INTERVAL_SEC = float(os.environ.get("WRITE_QUEUE_INTERVAL_SEC", 2))  # Idle poll; enqueue wakes the flusher
+WRITE_QUEUE_LINGER_SEC = float(os.environ.get("WRITE_QUEUE_LINGER_SEC", 0.2))    # Wait for more rows before a flush
+WRITE_QUEUE_MAX_ATTEMPTS = int(os.environ.get("WRITE_QUEUE_MAX_ATTEMPTS", 12))
+WRITE_QUEUE_BACKOFF_SEC = float(os.environ.get("WRITE_QUEUE_BACKOFF_SEC", 1))    # First retry delay (doubles, +jitter)
+WRITE_QUEUE_BACKOFF_MAX_SEC = float(os.environ.get("WRITE_QUEUE_BACKOFF_MAX_SEC", 300))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    dead INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS pending_due ON pending (dead, next_attempt_at);
+"""
+
+def _iso(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat(timespec="microseconds")
+
+def backoff_delay(attempts, base=None, cap=None):
+    """Seconds before retry number `attempts` (1-based): exponential with full jitter on the top half."""
+    base = WRITE_QUEUE_BACKOFF_SEC if base is None else base
+    cap = WRITE_QUEUE_BACKOFF_MAX_SEC if cap is None else cap
+    delay = min(cap, base * (2 ** (attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class WriteBehindQueue:
+    def __init__(self, sink, path=WRITE_QUEUE_PATH, batch_size=WRITE_QUEUE_BATCH,
+                 interval=WRITE_QUEUE_INTERVAL_SEC, linger=WRITE_QUEUE_LINGER_SEC,
+                 max_attempts=WRITE_QUEUE_MAX_ATTEMPTS, on_flush=None):
+        self.sink = sink
+        self.on_flush = on_flush
+        self.path = path
+        self.batch_size = batch_size
+        self.interval = interval
+        self.linger = linger
+        self.max_attempts = max_attempts
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+        self._flush_lock = threading.Lock()   # One flush at a time (flusher thread vs explicit flush())
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.flushed_rows = 0
+        self.failed_batches = 0
+        self.last_error = None
+        self.last_flush_at = None
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")   # Durable across app crashes; WAL keeps commits cheap
+        return conn
+
+    # --- PRODUCER ---
+    def enqueue(self, table, row):
+        """Journals one row for `table` and wakes the flusher. Returns the journal id."""
+        now = time.time()
+        payload = json.dumps({"created_at": _iso(now), **row}, default=str)
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO pending (table_name, payload, created_at) VALUES (?, ?, ?)",
+                (table, payload, now)
+            )
+        self._wake.set()
+        return cur.lastrowid
+
+    def pending_rows(self, table):
+        """Rows still waiting to be written (oldest first), each with an ISO `created_at` like the DB's."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload, created_at FROM pending WHERE table_name = ? AND dead = 0 ORDER BY id",
+                (table,)
+            ).fetchall()
+        result = []
+        for payload, created_at in rows:
+            row = json.loads(payload)
+            row.setdefault("created_at", _iso(created_at))
+            result.append(row)
+        return result
+
+    # --- FLUSHER ---
+    def flush(self):
+        """
+        Sends every due row, one batch (per table, up to batch_size rows) at a time.
+        Returns the number of rows written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                now = time.time()
+                with self._connect() as conn:
+                    head = conn.execute(
+                        "SELECT table_name FROM pending WHERE dead = 0 AND next_attempt_at <= ? ORDER BY id LIMIT 1",
+                        (now,)
+                    ).fetchone()
+                    if head is None:
+                        return written
+                    batch = conn.execute(
+                        "SELECT id, payload, attempts FROM pending "
+                        "WHERE dead = 0 AND next_attempt_at <= ? AND table_name = ? ORDER BY id LIMIT ?",
+                        (now, head[0], self.batch_size)
+                    ).fetchall()
+
+                ids = [row_id for row_id, _, _ in batch]
+                rows = [json.loads(payload) for _, payload, _ in batch]
+                try:
+                    with span("db.flush", table=head[0], rows=len(rows), attempt=max(a for _, _, a in batch) + 1):
+                        self.sink(head[0], rows)
+                except Exception as e:
+                    self._record_failure(batch, e)
+                    return written
+
+                marks = ",".join("?" * len(ids))
+                with self._connect() as conn:
+                    conn.execute(f"DELETE FROM pending WHERE id IN ({marks})", ids)
+                written += len(ids)
+                self.flushed_rows += len(ids)
+                self.last_flush_at = time.time()
+                if self.on_flush:
+                    self.on_flush(head[0], rows)
+
+    def _record_failure(self, batch, error):
+        self.failed_batches += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+        attempts = max(a for _, _, a in batch) + 1
+        dead = attempts >= self.max_attempts
+        next_at = time.time() + backoff_delay(attempts)
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE pending SET attempts = attempts + 1, next_attempt_at = ?, last_error = ?, dead = ? WHERE id = ?",
+                [(next_at, self.last_error, int(dead), row_id) for row_id, _, _ in batch]
+            )
+        if dead:
+            print(f"❌ DB write gave up after {attempts} attempts ({len(batch)} rows kept in {self.path}): {self.last_error}")
+        else:
+            print(f"⚠️ DB write failed (attempt {attempts}, retry in {next_at - time.time():.0f}s): {self.last_error}")
+
+    def start(self):
+        """Starts the flusher thread (idempotent). It drains rows left over from earlier runs first."""
+        if self._thread is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.flush()
+                except Exception as e:  # Journal trouble: keep the thread alive and try again later
+                    print(f"⚠️ Write-behind flusher failed: {e}")
+                if self._wake.wait(self._next_wait()):
+                    self._wake.clear()
+                    self._stop.wait(self.linger)  # Let a burst of saves share one insert
+
+        self._thread = threading.Thread(target=loop, name="db-write-behind", daemon=True)
+        self._thread.start()
+
+    def _next_wait(self):
+        with self._connect() as conn:
+            (next_at,) = conn.execute("SELECT MIN(next_attempt_at) FROM pending WHERE dead = 0").fetchone()
+        if next_at is None:
+            return self.interval
+        return min(self.interval, max(next_at - time.time(), 0.01))
+
+    def stop(self, drain=True, timeout=10):
+        """Stops the flusher; with drain=True makes one last attempt to send everything due."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        if drain:
+            self.flush()
+
+    # --- METRICS ---
+    def metrics(self):
+        with self._connect() as conn:
+            pending, dead, oldest = conn.execute(
+                "SELECT SUM(dead = 0), SUM(dead = 1), MIN(CASE WHEN dead = 0 THEN created_at END) FROM pending"
+            ).fetchone()
+        return {
+            "pending": pending or 0,
+            "dead": dead or 0,
+            "oldest_pending_sec": round(time.time() - oldest, 1) if oldest else None,
+            "flushed_rows": self.flushed_rows,
+            "failed_batches": self.failed_batches,
+            "last_error": self.last_error,
+            "last_flush_at": self.last_flush_at,
+        }
@@ -1,39 +1,38 @@
 import cv2
 import os
+import json
 import shutil
+import hashlib
 import numpy as np
+from tools.tracing import current_span, traced
+from tools.workspace import get_workspace_manager
+
+MANIFEST_FILE = "manifest.json"
 
 def clean_text(text):
     """Sanitizes text for PDF generation."""
     if not text: return ""
     return text.encode('ascii', 'ignore').decode('ascii').strip()
 
-def extract_analysis_frames(video_path, output_dir="temp_frames", frames_per_chunk=6, chunk_duration_sec=4.0):
+def plan_analysis_segments(video_path, frames_per_chunk=6, chunk_duration_sec=4.0):
     """
-    Robust Method: Slices video into fixed time chunks (e.g., every 4 seconds).
-    Reliability: 100% (Never misses a shot).
-    Cost: Creates some 'junk' folders (walking) that the Agent must filter out.
+    Fixed-length time chunks and the evenly spaced frame indices to grab from each.
+    Returns {"fps", "total_frames", "duration", "width", "height",
+    "segments": [(chunk_id, start_f, end_f, indices), ...]} or {"error": ...}.
     """
-    if not os.path.exists(video_path):
-        return {"error": f"Video not found at {video_path}"}
-    
-    # Setup
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir)
-    
     cap = cv2.VideoCapture(video_path)
     fps = cap.get(cv2.CAP_PROP_FPS)
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    duration = total_frames / fps
-    
-    if total_frames == 0: 
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    cap.release()
+
+    if total_frames == 0 or not fps:
         return {"error": "Video is empty"}
+    duration = total_frames / fps
 
-    print(f"Video Duration: {duration:.1f}s. Slicing into {chunk_duration_sec}s chunks...")
-    
     chunk_frames = int(chunk_duration_sec * fps)
-    saved_summary = []
+    segments = []
     
     # Loop through the video in fixed chunks
     num_chunks = int(total_frames / chunk_frames)
@@ -41,29 +40,112 @@ def extract_analysis_frames(video_path, output_dir="temp_frames", frames_per_chu
     for i in range(num_chunks):
         start_f = i * chunk_frames
         end_f = min(total_frames, (i + 1) * chunk_frames)
-        
-        # Create folder
-        chunk_id = i + 1
-        chunk_dir = os.path.join(output_dir, f"segment_{chunk_id}")
-        os.makedirs(chunk_dir, exist_ok=True)
-        
         # Extract frames evenly from this chunk
-        indices = np.linspace(start_f, end_f-1, frames_per_chunk, dtype=int)
-        
+        indices = [int(f) for f in np.linspace(start_f, end_f-1, frames_per_chunk, dtype=int)]
+        segments.append((i + 1, start_f, end_f, indices))
+
+    return {"fps": fps, "total_frames": total_frames, "duration": duration,
+            "width": width, "height": height, "segments": segments}
+
+@traced("frames.extract_segment")
+def extract_segment(video_path, output_dir, segment, fps):
+    """
+    Writes one segment's frames to output_dir/segment_<id>/seq_<k>.jpg.
+    Opens its own capture, so segments can run in parallel worker processes.
+    Returns the segment record: timing, summary line and per-frame
+    path (relative to output_dir), timestamp, dimensions and sha256.
+    """
+    chunk_id, start_f, end_f, indices = segment
+    folder = f"segment_{chunk_id}"
+    chunk_dir = os.path.join(output_dir, folder)
+    if os.path.exists(chunk_dir):
+        shutil.rmtree(chunk_dir)
+    os.makedirs(chunk_dir)
+
+    frames = []
+    cap = cv2.VideoCapture(video_path)
+    try:
         for k, f_idx in enumerate(indices):
             cap.set(cv2.CAP_PROP_POS_FRAMES, f_idx)
             ret, frame = cap.read()
             if ret:
-                fname = f"{chunk_dir}/seq_{k+1}.jpg"
-                cv2.imwrite(fname, frame)
-        
-        saved_summary.append(f"Segment {chunk_id}: {frames_per_chunk} frames ({start_f/fps:.1f}s - {end_f/fps:.1f}s)")
+                # Encode in memory so the hash comes from the same bytes we write
+                ok, jpeg = cv2.imencode(".jpg", frame)
+                if not ok:
+                    continue
+                data = jpeg.tobytes()
+                with open(os.path.join(chunk_dir, f"seq_{k+1}.jpg"), "wb") as f:
+                    f.write(data)
+                frames.append({
+                    "seq": k + 1,
+                    "path": f"{folder}/seq_{k+1}.jpg",
+                    "frame_number": f_idx,
+                    "timestamp_sec": round(f_idx / fps, 3),
+                    "width": frame.shape[1],
+                    "height": frame.shape[0],
+                    "bytes": len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                })
+    finally:
+        cap.release()
+    current_span().set(segment=chunk_id, frames=len(frames), bytes=sum(f["bytes"] for f in frames))
+    return {
+        "id": chunk_id,
+        "folder": folder,
+        "start_sec": round(start_f / fps, 3),
+        "end_sec": round(end_f / fps, 3),
+        "start_frame": start_f,
+        "end_frame": end_f,
+        "summary": f"Segment {chunk_id}: {len(indices)} frames ({start_f/fps:.1f}s - {end_f/fps:.1f}s)",
+        "frames": frames,
+    }
 
-    cap.release()
+def extract_analysis_frames(video_path, output_dir=None, frames_per_chunk=6, chunk_duration_sec=4.0):
+    """
+    Robust Method: Slices video into fixed time chunks (e.g., every 4 seconds).
+    Reliability: 100% (Never misses a shot).
+    Cost: Creates some 'junk' folders (walking) that the Agent must filter out.
+    output_dir: defaults to a fresh per-call workspace (see tools/workspace.py), so
+    concurrent callers never share or delete each other's frames.
+    The MCP server runs the same plan/extract_segment steps in a process pool.
+    """
+    if not os.path.exists(video_path):
+        return {"error": f"Video not found at {video_path}"}
     
-    return {
+    plan = plan_analysis_segments(video_path, frames_per_chunk, chunk_duration_sec)
+    if "error" in plan:
+        return plan
+
+    # Setup: only this call's segment folders are replaced, never the whole directory
+    if output_dir is None:
+        output_dir = get_workspace_manager().create("frames", hold=False).root
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"Video Duration: {plan['duration']:.1f}s. Slicing into {chunk_duration_sec}s chunks...")
+    segments = [extract_segment(video_path, output_dir, segment, plan["fps"]) for segment in plan["segments"]]
+    return build_extraction_result(video_path, output_dir, plan, segments)
+
+def build_extraction_result(video_path, output_dir, plan, segments):
+    """
+    Final result dict; also written to output_dir/manifest.json so frames can
+    be looked up later without re-extracting.
+    """
+    result = {
         "status": "success", 
-        "message": f"Sliced video into {len(saved_summary)} segments.",
+        "message": f"Sliced video into {len(segments)} segments.",
         "structure": "Folders named segment_1, segment_2, etc.",
-        "segments": saved_summary
-    }
\ No newline at end of file
+        "output_dir": output_dir,
+        "video": {
+            "path": video_path,
+            "fps": plan["fps"],
+            "total_frames": plan["total_frames"],
+            "duration_sec": round(plan["duration"], 3),
+            "width": plan["width"],
+            "height": plan["height"],
+        },
+        "frame_count": sum(len(seg["frames"]) for seg in segments),
+        "segments": segments
+    }
+    with open(os.path.join(output_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(result, f)
+    return result